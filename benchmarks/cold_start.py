@@ -0,0 +1,178 @@
+"""
+Benchmark du démarrage à froid et du premier rendu, avec budget de temps.
+
+    python benchmarks/cold_start.py --rows 10000 --backend json --repeat 5
+    python benchmarks/cold_start.py --check --budget app_form=2.5,app_form.render=1.0
+
+Chaque cas est un nouveau processus Python (aucun cache d'import chaud partagé) :
+- import         : `import bon_travail` seul (aucun fichier créé, aucun stockage ouvert)
+- cli            : `python -m bon_travail stats` (import + ouverture du stockage + comptages)
+- app_form       : premier rendu de l'application (AppTest) sur la page Qualité
+- app_dashboard  : premier rendu du tableau de bord (graphiques Pareto)
+- app_pdr        : premier rendu de la page Pièces (PDR) (stock et mouvements)
+Temps médian et minimal du processus complet sur --repeat lancements, sur un
+répertoire de données rempli de --rows bons (datagen.py) ; pour les cas app,
+durée du premier rendu seule (`<cas>.render`) et modules lourds chargés.
+
+Avec --check, le code de sortie vaut 1 si une médiane dépasse son budget (BUDGETS,
+surchargeables par --budget) ou si une page qui ne trace ni n'exporte rien a
+chargé matplotlib / openpyxl, ou si une page n'affiche pas son titre attendu (EXPECTED_TITLES).
+Les mêmes vérifications sur les cas légers (LIGHT_CASES) sont jouées par
+tests/test_cold_start.py avec la suite de tests.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ("matplotlib", "openpyxl")
+
+# budget (s) par cas : processus complet, ou premier rendu seul (suffixe .render)
+BUDGETS = {
+    "import": 1.0,
+    "cli": 2.0,
+    "app_form": 3.0,
+    "app_form.render": 1.5,
+    "app_dashboard": 8.0,
+    "app_dashboard.render": 6.0,
+    "app_pdr": 3.0,
+    "app_pdr.render": 1.5,
+}
+
+# titre (st.header / st.subheader) que le premier rendu doit afficher : la page est bien atteinte
+EXPECTED_TITLES = {"app_pdr": "Mouvements de stock"}
+
+# pages qui ne doivent charger aucun module de HEAVY_MODULES
+LIGHT_CASES = ("import", "app_form", "app_pdr")
+
+_PROBE = ("import json, sys\n"
+          "print(json.dumps({{'heavy': [m for m in {heavy!r} if m in sys.modules]{extra}}}))\n")
+
+_IMPORT = "import bon_travail\n" + _PROBE
+
+_APP = ("import logging, time\n"
+        "logging.disable(logging.WARNING)\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        "at = AppTest.from_file({script!r}, default_timeout=600)\n"
+        "at.session_state['user'], at.session_state['role'], at.session_state['menu'] = 'bench', {role!r}, {page!r}\n"
+        "t0 = time.perf_counter()\n"
+        "at.run()\n"
+        "render = time.perf_counter() - t0\n"
+        "errors = [str(e.value) for e in at.exception]\n"
+        "titles = [h.value for h in at.header] + [h.value for h in at.subheader]\n") + _PROBE
+
+
+def _cases() -> list:
+    app = lambda role, page: ["-c", _APP.format(script=os.path.join(ROOT, "streamlit_app.py"), role=role, page=page,
+                                                heavy=HEAVY_MODULES, extra=", 'render': render, 'errors': errors, 'titles': titles")]
+    return [
+        ("import", ["-c", _IMPORT.format(heavy=HEAVY_MODULES, extra="")]),
+        ("cli", ["-m", "bon_travail", "stats"]),
+        ("app_form", app("qualite", "Qualité")),
+        ("app_dashboard", app("manager", "Dashboard")),
+        ("app_pdr", app("maintenance", "Pièces (PDR)")),
+    ]
+
+
+def _seed(data_dir: str, backend: str, rows: int) -> None:
+    """Remplit le répertoire de données dans un processus séparé (le parent reste froid)."""
+    code = ("import sys; sys.path[:0] = [{root!r}, {bench!r}]\n"
+            "import bon_travail\n"
+            "from datagen import generate_bons\n"
+            "bon_travail.write_bons(list(generate_bons({rows}, postes=bon_travail.INITIAL_POSTES,"
+            " descriptions=bon_travail.INITIAL_DESCRIPTIONS)))\n"
+            "bon_travail.compact_storage()\n").format(root=ROOT, bench=BENCH, rows=rows)
+    subprocess.run([sys.executable, "-c", code], env=_env(data_dir, backend), check=True)
+
+
+def _env(data_dir: str, backend: str) -> dict:
+    env = dict(os.environ, BON_TRAVAIL_DATA_DIR=data_dir, BON_TRAVAIL_BACKEND=backend)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, env.get("PYTHONPATH", "")) if p)
+    return env
+
+
+def _parse_budgets(text: str) -> dict:
+    budgets = dict(BUDGETS)
+    for item in filter(None, text.split(",")):
+        name, _, seconds = item.partition("=")
+        budgets[name.strip()] = float(seconds)
+    return budgets
+
+
+def measure(name: str, argv: list, env: dict, repeat: int) -> tuple:
+    """(durées du processus, durées du premier rendu, modules lourds, anomalies) d'un cas sur `repeat` lancements.
+
+    Anomalies : exception au rendu, titre attendu absent, module lourd chargé par un cas de LIGHT_CASES ;
+    les budgets ne sont pas vérifiés ici.
+    """
+    wall, render, heavy, problems = [], [], set(), []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable] + argv, env=env, cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        wall.append(time.perf_counter() - t0)
+        probe = json.loads(out.strip().splitlines()[-1]) if out.strip().startswith("{") else {}
+        heavy.update(probe.get("heavy", ()))
+        if probe.get("errors"):
+            problems.append(f"{name} : exception {probe['errors'][0]}")
+        if name in EXPECTED_TITLES and EXPECTED_TITLES[name] not in probe.get("titles", ()):
+            problems.append(f"{name} : « {EXPECTED_TITLES[name]} » absent du rendu")
+        if "render" in probe:
+            render.append(probe["render"])
+    if name in LIGHT_CASES and heavy:
+        problems.append(f"{name} : {', '.join(sorted(heavy))} chargé(s) sans graphique ni export")
+    return wall, render, sorted(heavy), problems
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--cases", default="", help="cas à exécuter (virgules), tous par défaut")
+    ap.add_argument("--check", action="store_true", help="code de sortie 1 si un budget est dépassé")
+    ap.add_argument("--budget", default="", help="budgets (s) à surcharger, ex. app_form=2.5,cli=1")
+    args = ap.parse_args()
+    budgets = _parse_budgets(args.budget)
+    wanted = {c for c in args.cases.split(",") if c}
+
+    data_dir = tempfile.mkdtemp(prefix="bon_cold_")
+    t0 = time.perf_counter()
+    _seed(data_dir, args.backend, args.rows)
+    print(f"{args.rows} bons ({args.backend}) préparés en {time.perf_counter() - t0:.2f}s")
+
+    env = _env(data_dir, args.backend)
+    medians, failures = {}, []
+    print(f"{'cas':<22}{'médiane (s)':>13}{'min (s)':>10}{'budget (s)':>12}  modules lourds")
+    for name, argv in _cases():
+        if wanted and name not in wanted:
+            continue
+        wall, render, heavy, problems = measure(name, argv, env, args.repeat)
+        failures += problems
+        rows = [(name, wall)] + ([(f"{name}.render", render)] if render else [])
+        for label, times in rows:
+            medians[label] = statistics.median(times)
+            budget = budgets.get(label)
+            over = budget is not None and medians[label] > budget
+            if over:
+                failures.append(f"{label} : {medians[label]:.3f}s > budget {budget:.3f}s")
+            print(f"{label:<22}{medians[label]:>13.3f}{min(times):>10.3f}"
+                  f"{(f'{budget:.3f}' if budget is not None else '-'):>12}"
+                  f"  {', '.join(heavy) if label == name else ''}{'  <-- hors budget' if over else ''}")
+
+    if "cli" in medians and "app_form" in medians:
+        print(f"\ncli / app_form : {medians['cli'] / medians['app_form']:.2f}")
+    if failures:
+        print("\n" + "\n".join(failures))
+    return 1 if args.check and failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
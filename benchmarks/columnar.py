@@ -0,0 +1,98 @@
+"""
+Benchmark de l'instantané colonnaire face au DataFrame construit depuis les dicts.
+
+    python benchmarks/columnar.py --rows 100000
+
+Compare, sur le même jeu de bons (datagen.py) :
+- dicts    : pd.DataFrame(read_bons()) + avancement (chemin historique)
+- colonnes : read_bons_frame() (catégories, datetime64, int8 ; mmap de l'instantané)
+Pour chacun : durée à chaud, durée à froid (nouveau processus : ouverture du
+stockage comprise), mémoire du DataFrame (memory_usage deep), pic d'allocation
+(tracemalloc) et durée d'une agrégation type (bons par poste et par mois).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+
+_LOAD = {
+    "dicts": ("rows, progress = bt.read_bons_with_progress()\n"
+              "df = pd.DataFrame(rows, columns=bt.BON_COLUMNS)\n"
+              "df['progress'] = progress\n"
+              "month = df['date'].str[:7]\n"),
+    "colonnes": ("df = bt.read_bons_frame()\n"
+                 "month = df['date'].dt.to_period('M')\n"),
+}
+
+_MEASURE = ("import json, time, tracemalloc\n"
+            "t0 = time.perf_counter()\n"
+            "import pandas as pd\n"
+            "import bon_travail as bt\n"
+            "bt.count_bons()\n"
+            "t1 = time.perf_counter()\n"
+            "tracemalloc.start()\n"
+            "{load}"
+            "t2 = time.perf_counter()\n"
+            "peak = tracemalloc.get_traced_memory()[1]\n"
+            "tracemalloc.stop()\n"
+            "mem = int(df.memory_usage(deep=True).sum())\n"
+            "t3 = time.perf_counter()\n"
+            "{load}"
+            "t4 = time.perf_counter()\n"
+            "df.groupby([df['poste_de_charge'], month], observed=True).size()\n"
+            "t5 = time.perf_counter()\n"
+            "print(json.dumps({{'open': t1 - t0, 'cold': t2 - t1, 'warm': t4 - t3, 'groupby': t5 - t4,\n"
+            "                   'mem': mem, 'peak': peak, 'rows': len(df)}}))\n")
+
+
+def _env(data_dir: str) -> dict:
+    env = dict(os.environ, BON_TRAVAIL_DATA_DIR=data_dir, BON_TRAVAIL_BACKEND="json", BON_TRAVAIL_PROFILE="0")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, env.get("PYTHONPATH", "")) if p)
+    return env
+
+
+def _run(data_dir: str, code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], env=_env(data_dir), cwd=ROOT, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bon_columnar_")
+    t0 = time.perf_counter()
+    _run(data_dir, ("import sys; sys.path.insert(0, {bench!r})\n"
+                    "import bon_travail\n"
+                    "from datagen import generate_bons\n"
+                    "bon_travail.write_bons(list(generate_bons({rows}, postes=bon_travail.INITIAL_POSTES,"
+                    " descriptions=bon_travail.INITIAL_DESCRIPTIONS)))\n").format(bench=BENCH, rows=args.rows))
+    print(f"{args.rows} bons préparés en {time.perf_counter() - t0:.2f}s (instantané colonnaire écrit avec le snapshot)")
+
+    results = {}
+    print(f"{'chemin':<10}{'ouverture (s)':>15}{'froid (s)':>11}{'chaud (s)':>11}{'groupby (s)':>13}"
+          f"{'mémoire (Mo)':>14}{'pic (Mo)':>10}")
+    for name, load in _LOAD.items():
+        runs = [json.loads(_run(data_dir, _MEASURE.format(load=load)).strip().splitlines()[-1])
+                for _ in range(args.repeat)]
+        r = {k: min(run[k] for run in runs) for k in ("open", "cold", "warm", "groupby")}
+        r.update(mem=runs[0]["mem"], peak=max(run["peak"] for run in runs))
+        results[name] = r
+        print(f"{name:<10}{r['open']:>15.3f}{r['cold']:>11.3f}{r['warm']:>11.3f}{r['groupby']:>13.3f}"
+              f"{r['mem'] / 2**20:>14.1f}{r['peak'] / 2**20:>10.1f}")
+    a, b = results["dicts"], results["colonnes"]
+    print(f"\nmémoire / {a['mem'] / max(b['mem'], 1):.1f}, chargement à chaud / {a['warm'] / max(b['warm'], 1e-9):.1f}, "
+          f"à froid / {a['cold'] / max(b['cold'], 1e-9):.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Générateur déterministe de bons de travail réalistes (benchmarks).
+
+    from datagen import generate_bons
+    rows = list(generate_bons(100_000, postes=app.INITIAL_POSTES, descriptions=app.INITIAL_DESCRIPTIONS))
+
+Même graine -> mêmes bons : les résultats restent comparables d'un commit à l'autre.
+- dates sur `days` jours se terminant le 2026-06-30, jours ouvrés plus chargés
+- postes et types de problème tirés selon une loi de Zipf (quelques postes / pannes
+  concentrent la majorité des arrêts, comme sur un Pareto réel)
+- les bons anciens sont plus souvent validés par les trois départements
+"""
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+TECHNICIENS = ["Ahmed", "Sara", "Omar", "Yassine", "Khadija", "Mehdi", "Nadia", "Rachid"]
+DECLARANTS = ["Chef d'équipe A", "Chef d'équipe B", "Opérateur", "Régleur"]
+ACTIONS = ["Nettoyage filtre", "Réglage vérin", "Graissage chaîne", "Remplacement courroie",
+           "Remplacement thermocouple défaillant", "Contrôle capteur de pression", "Resserrage vis",
+           "Changement joint", "Remise à zéro automate", "Démontage et nettoyage buse"]
+OBSERVATIONS = ["RAS", "À surveiller", "Pièce usée", "Intervention provisoire", "Prévoir arrêt planifié", ""]
+RESULTATS = ["OK", "OK", "OK", "Partiel", "NOK"]
+PDR_CODES = [f"PDR-{i:03d}" for i in range(60)]
+
+END_DATE = date(2026, 6, 30)
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return [1.0 / (k ** s) for k in range(1, n + 1)]
+
+
+def _statut(rnd: random.Random, p_valide: float) -> str:
+    x = rnd.random()
+    if x < p_valide:
+        return "Valider"
+    if x < p_valide + 0.05:
+        return "Non Valider"
+    return ""
+
+
+def generate_bons(n: int, seed: int = 0, postes: Optional[List[str]] = None,
+                  descriptions: Optional[List[str]] = None, days: int = 730,
+                  code_prefix: str = "BT") -> Iterator[Dict[str, Any]]:
+    """`n` bons (dicts aux colonnes BON_COLUMNS), codes uniques `code_prefix`-000001..."""
+    rnd = random.Random(seed)
+    postes = list(postes or [f"ASL{i:03d}" for i in range(40)])
+    descriptions = list(descriptions or [f"Problème {i}" for i in range(40)])
+    poste_w = _zipf_weights(len(postes))
+    desc_w = _zipf_weights(len(descriptions))
+    # jours ouvrés ~4x plus chargés que le week-end
+    all_days = [END_DATE - timedelta(days=i) for i in range(days)]
+    day_w = [4.0 if d.weekday() < 5 else 1.0 for d in all_days]
+    width = max(6, len(str(n)))
+    for i in range(n):
+        day_idx = rnd.choices(range(days), weights=day_w)[0]
+        d = all_days[day_idx]
+        age = day_idx / days                      # 0 = récent, 1 = ancien
+        h_decl = rnd.randint(6, 21)
+        m_decl = rnd.choice((0, 10, 15, 20, 30, 40, 45, 50))
+        dur = rnd.randint(10, 240)
+        start = h_decl * 60 + m_decl + rnd.randint(5, 45)
+        end = min(start + dur, 23 * 60 + 59)
+        intervenu = rnd.random() < 0.6 + 0.4 * age
+        yield {
+            "code": f"{code_prefix}-{i + 1:0{width}d}",
+            "date": d.isoformat(),
+            "arret_declare_par": rnd.choice(DECLARANTS),
+            "poste_de_charge": rnd.choices(postes, weights=poste_w)[0],
+            "heure_declaration": f"{h_decl:02d}:{m_decl:02d}",
+            "machine_arreter": rnd.choice(["Oui", "Non"]),
+            "heure_debut_intervention": f"{start // 60:02d}:{start % 60:02d}" if intervenu else "",
+            "heure_fin_intervention": f"{end // 60:02d}:{end % 60:02d}" if intervenu else "",
+            "technicien": rnd.choice(TECHNICIENS) if intervenu else "",
+            "description_probleme": rnd.choices(descriptions, weights=desc_w)[0],
+            "action": rnd.choice(ACTIONS) if intervenu else "",
+            "pdr_utilisee": rnd.choice(PDR_CODES) if intervenu and rnd.random() < 0.3 else "",
+            "observation": rnd.choice(OBSERVATIONS) if intervenu else "",
+            "resultat": rnd.choice(RESULTATS) if intervenu else "",
+            "condition_acceptation": "Pièce conforme" if intervenu and rnd.random() < 0.5 else "",
+            "dpt_maintenance": _statut(rnd, 0.3 + 0.65 * age) if intervenu else "",
+            "dpt_qualite": _statut(rnd, 0.2 + 0.7 * age) if intervenu else "",
+            "dpt_production": _statut(rnd, 0.3 + 0.65 * age),
+        }
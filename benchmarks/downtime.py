@@ -0,0 +1,93 @@
+"""
+Benchmark de l'analyse des temps d'arrêt : lecture vectorisée des heures face à une boucle par bon.
+
+    python benchmarks/downtime.py --rows 100000
+
+Sur le même jeu de bons (datagen.py) :
+- boucle       : datetime.strptime par heure et par bon, passage de minuit, durées
+- vectorisé    : bon_travail.downtime.build_events (heures distinctes analysées une fois)
+- tableau      : indicateurs par poste / famille / technicien depuis les événements
+- report (API) : downtime_report sur un store JSON, premier appel puis appel servi par le cache
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("BON_TRAVAIL_DATA_DIR", tempfile.mkdtemp(prefix="bon_downtime_"))
+os.environ.setdefault("BON_TRAVAIL_BACKEND", "json")
+os.environ.setdefault("BON_TRAVAIL_PROFILE", "0")
+
+import pandas as pd  # noqa: E402
+
+import bon_travail as bt  # noqa: E402
+from bon_travail.downtime import SOURCE_COLUMNS, build_events, downtime_stats, window_hours  # noqa: E402
+from datagen import generate_bons  # noqa: E402
+
+
+def _loop(rows):
+    """Référence : une ligne à la fois (ce qu'on écrirait sans pandas)."""
+    out = []
+    for r in rows:
+        stamps = []
+        for col in ("heure_declaration", "heure_debut_intervention", "heure_fin_intervention"):
+            try:
+                stamps.append(datetime.strptime(f"{r['date']} {r[col].strip()}", "%Y-%m-%d %H:%M"))
+            except ValueError:
+                stamps.append(None)
+        decl, debut, fin = stamps
+        if debut and decl and debut < decl:
+            debut += timedelta(days=1)
+        ref = debut or decl
+        if fin and ref and fin < ref:
+            fin += timedelta(days=1)
+        out.append(((debut - decl).total_seconds() / 60 if debut and decl else None,
+                    (fin - debut).total_seconds() / 60 if fin and debut else None))
+    return out
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    rows = list(generate_bons(args.rows, postes=bt.INITIAL_POSTES, descriptions=bt.INITIAL_DESCRIPTIONS))
+    frame = pd.DataFrame(rows, columns=SOURCE_COLUMNS)
+    events = build_events(frame)
+    hours = window_hours(events)
+
+    print(f"{args.rows} bons")
+    print(f"{'étape':<22}{'durée (s)':>12}{'µs / bon':>10}")
+    for name, fn in (("boucle", lambda: _loop(rows)),
+                     ("vectorisé", lambda: build_events(frame)),
+                     ("tableau x3", lambda: [downtime_stats(events, d, hours) for d in bt.DOWNTIME_DIMENSIONS])):
+        s = _best(fn, args.repeat)
+        print(f"{name:<22}{s:>12.3f}{s / args.rows * 1e6:>10.2f}")
+
+    bt.write_bons(rows)
+    t0 = time.perf_counter()
+    bt.downtime_report("poste_de_charge")
+    cold = time.perf_counter() - t0
+    warm = _best(lambda: bt.downtime_report("poste_de_charge"), args.repeat)
+    print(f"\ndowntime_report : premier appel {cold:.3f}s (lecture des bons comprise), "
+          f"en cache {warm * 1e3:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
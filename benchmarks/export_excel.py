@@ -0,0 +1,82 @@
+"""
+Benchmark de l'export Excel en flux (mode write-only openpyxl).
+
+    python benchmarks/export_excel.py --rows 100000 --backend sqlite [--charts] [--legacy]
+
+Mesure le temps puis le pic mémoire Python (tracemalloc) de export_excel(iter_bons(...)).
+Avec --legacy, l'ancien export (Workbook normal, ws.cell() par cellule, liste
+complète des bons) est mesuré sur les mêmes données pour comparaison.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_app(data_dir: str, backend: str):
+    os.environ["BON_TRAVAIL_DATA_DIR"] = data_dir
+    os.environ["BON_TRAVAIL_BACKEND"] = backend
+    sys.path.insert(0, ROOT)
+    import bon_travail
+    return bon_travail
+
+
+def _legacy_export(app, bons) -> bytes:
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+    wb = Workbook()
+    ws = wb.active
+    for col_idx, h in enumerate(app.BON_COLUMNS, start=1):
+        ws.cell(row=1, column=col_idx).value = h
+        ws.cell(row=1, column=col_idx).font = Font(bold=True)
+    for rownum, r in enumerate(bons, start=2):
+        for col_idx, h in enumerate(app.BON_COLUMNS, start=1):
+            ws.cell(row=rownum, column=col_idx).value = r.get(h, "")
+    bio = io.BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def _measure(label: str, fn) -> None:
+    # temps mesuré sans tracemalloc (qui ralentit fortement les allocations), puis pic mémoire
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12}: {dt:6.2f}s, pic mémoire {peak / 2**20:7.1f} Mo, fichier {len(out) / 2**20:5.1f} Mo")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--backend", choices=["json", "sqlite"], default="sqlite")
+    ap.add_argument("--charts", action="store_true", help="ajoute la feuille Pareto")
+    ap.add_argument("--legacy", action="store_true", help="mesure aussi l'ancien export")
+    args = ap.parse_args()
+
+    app = _import_app(tempfile.mkdtemp(prefix="bon_export_"), args.backend)
+    app.api._bons().replace_all([
+        {"code": f"B{i}", "date": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}", "poste_de_charge": f"ASL{i % 40:03d}",
+         "description_probleme": f"Problème {i % 25}", "technicien": "T", "action": "Remplacement pièce",
+         "dpt_production": "Valider", "dpt_maintenance": ("Valider", "", "Non Valider")[i % 3]}
+        for i in range(args.rows)])
+
+    _measure("flux", lambda: app.export_excel(app.iter_bons(), with_charts=args.charts))
+    _measure("flux filtré", lambda: app.export_excel(
+        app.iter_bons(app.BonQuery().eq("dpt_maintenance", "Valider").date_between("2026-03-01", "2026-09-30")),
+        with_charts=args.charts))
+    if args.legacy:
+        _measure("ancien", lambda: _legacy_export(app, app.read_bons()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
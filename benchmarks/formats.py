@@ -0,0 +1,84 @@
+"""
+Benchmark des formats de fichiers de données : taille et durée de relecture du snapshot des bons.
+
+    python benchmarks/formats.py --sizes 10000,100000,1000000
+
+Pour chaque volume (datagen.py), le même snapshot est écrit dans chaque format
+(BON_TRAVAIL_FILE_FORMAT) : durée d'encodage (CPU, hors disque) et de relecture
+depuis le disque (lecture + décodage), meilleur de --repeat :
+- pretty        : JSON indenté, json standard (format historique)
+- json          : JSON compact, json standard
+- json/orjson   : JSON compact, codec orjson (si installé : c'est alors le format "json")
+- binary        : binaire compressé tel qu'écrit ici (msgpack + zstd s'ils sont
+                  installés, sinon JSON + zlib) ; l'en-tête indique la variante
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bon_travail.jsonio import encode_data, decode_data, orjson, _optional  # noqa: E402
+from bon_travail.model import INITIAL_POSTES, INITIAL_DESCRIPTIONS  # noqa: E402
+from datagen import generate_bons  # noqa: E402
+
+
+def _variants():
+    """(nom, encodeur -> octets, décodeur <- octets)."""
+    out = [("pretty", lambda o: json.dumps(o, ensure_ascii=False, indent=2).encode("utf-8"), json.loads),
+           ("json", lambda o: json.dumps(o, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), json.loads)]
+    if orjson is not None:
+        out.append(("json/orjson", orjson.dumps, orjson.loads))
+    binary = ("msgpack" if _optional("msgpack") is not None else "json") + \
+             ("+zstd" if _optional("zstandard") is not None else "+zlib")
+    out.append((f"binary ({binary})", lambda o: encode_data(o, "binary"), decode_data))
+    return out
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="10000,100000,1000000", help="volumes de bons (virgules)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bon_formats_")
+    print(f"{'bons':>9}  {'format':<24}{'taille (Mo)':>12}{'encodage (s)':>14}{'relecture (s)':>15}{'vs pretty':>11}")
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        rows = list(generate_bons(size, postes=INITIAL_POSTES, descriptions=INITIAL_DESCRIPTIONS))
+        base = None
+        for name, encode, decode in _variants():
+            path = os.path.join(tmp, "bon_travail.json")
+
+            def read():
+                with open(path, "rb") as f:
+                    return decode(f.read())
+
+            encoded = _best(lambda: encode(rows), args.repeat)
+            with open(path, "wb") as f:
+                f.write(encode(rows))
+            got = read()
+            assert len(got) == len(rows) and got[:1000] == rows[:1000]
+            del got
+            parse = _best(read, args.repeat)
+            base = base or parse
+            print(f"{size:>9}  {name:<24}{os.path.getsize(path) / 2**20:>12.1f}{encoded:>14.2f}{parse:>15.3f}"
+                  f"{base / parse:>10.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
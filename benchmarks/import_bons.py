@@ -0,0 +1,91 @@
+"""
+Benchmark de l'import en masse des bons (Excel / CSV).
+
+    python benchmarks/import_bons.py --rows 100000 --backend json [--xlsx]
+
+Génère un fichier de `--rows` bons (1 % de lignes invalides), puis mesure la
+validation seule (dry_run) et l'import complet (une seule écriture).
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADERS = ["Code", "Date", "Poste de charge", "Technicien", "Description problème", "PDR utilisée", "Dpt Qualité"]
+
+
+def _import_app(data_dir: str, backend: str):
+    os.environ["BON_TRAVAIL_DATA_DIR"] = data_dir
+    os.environ["BON_TRAVAIL_BACKEND"] = backend
+    sys.path.insert(0, ROOT)
+    import bon_travail
+    return bon_travail
+
+
+def _rows(n: int):
+    rnd = random.Random(0)
+    for i in range(n):
+        d, mo, y = rnd.randint(1, 28), rnd.randint(1, 12), rnd.randint(2019, 2026)
+        date = rnd.choice([f"{y}-{mo:02d}-{d:02d}", f"{d:02d}/{mo:02d}/{y}", f"{y}/{mo:02d}/{d:02d}"])
+        if rnd.random() < 0.01:
+            date = "inconnue"   # ligne invalide
+        yield [f"H{i:06d}", date, f"ASL{rnd.randint(0, 300):03d}", rnd.choice(["Ali", "Sara", "Omar"]),
+               f"Problème {rnd.randint(0, 40)}", rnd.choice(["", "", "", "PDR-1", "PDR-2"]),
+               rnd.choice(["", "Valider", "non valider"])]
+
+
+def _csv(n: int) -> bytes:
+    out = io.StringIO()
+    out.write(";".join(HEADERS) + "\n")
+    for r in _rows(n):
+        out.write(";".join(r) + "\n")
+    return out.getvalue().encode("utf-8")
+
+
+def _xlsx(n: int) -> bytes:
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(HEADERS)
+    for r in _rows(n):
+        ws.append(r)
+    bio = io.BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    ap.add_argument("--xlsx", action="store_true", help="fichier Excel au lieu de CSV")
+    args = ap.parse_args()
+
+    app = _import_app(tempfile.mkdtemp(prefix="bon_import_"), args.backend)
+    for code in ("PDR-1", "PDR-2"):
+        app.upsert_pdr({"code": code, "quantite": 100_000})
+    name = "bons.xlsx" if args.xlsx else "bons.csv"
+    data = _xlsx(args.rows) if args.xlsx else _csv(args.rows)
+    print(f"fichier {name} : {len(data) / 2**20:.1f} Mo, {args.rows} lignes")
+
+    t0 = time.perf_counter()
+    report = app.import_bons(data, name, dry_run=True)
+    print(f"validation : {time.perf_counter() - t0:6.2f}s ({report['valides']} valides, "
+          f"{len(report['erreurs'])} erreurs)")
+    t0 = time.perf_counter()
+    report = app.import_bons(data, name)
+    print(f"import     : {time.perf_counter() - t0:6.2f}s ({report['importes']} bons, "
+          f"stock PDR-1 = {app.pdr_stock('PDR-1')})")
+    t0 = time.perf_counter()
+    n = app.count_bons()
+    print(f"relecture  : {time.perf_counter() - t0:6.2f}s ({n} bons dans le store)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Benchmark de l'archive mensuelle : coût du tableau de bord selon l'historique.
+
+    python benchmarks/partitions.py --rows 20000,80000 --days 730
+
+Pour chaque volume, l'historique (datagen.py, --days jours jusqu'au 30/06/2026) est
+mesuré deux fois : tout dans la fenêtre active, puis après archivage des mois clos
+(mois antérieurs à --before). Chaque mesure est un nouveau processus qui ouvre le
+stockage et sert les lectures du tableau de bord (compte, avancement moyen, rollups
+Pareto, première page triée par date) : durée, pic d'allocation (tracemalloc) et
+partitions lues. Avec l'archive, ces valeurs suivent la fenêtre active et non plus
+la longueur de l'historique.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+
+_DASHBOARD = ("import json, time, tracemalloc\n"
+              "tracemalloc.start()\n"
+              "t0 = time.perf_counter()\n"
+              "import bon_travail as bt\n"
+              "n = bt.count_bons()\n"
+              "bt.mean_progress()\n"
+              "for dim in ('day', 'week', 'month', 'description_probleme'):\n"
+              "    bt.read_rollup(dim)\n"
+              "rows, _, plan = bt.run_query(bt.BonQuery().order('date', descending=True).limit(50), with_progress=True)\n"
+              "elapsed = time.perf_counter() - t0\n"
+              "print(json.dumps({'bons': n, 's': elapsed, 'peak': tracemalloc.get_traced_memory()[1],\n"
+              "                  'partitions': len(plan['partitions']), 'active': len(bt.read_bon_codes())}))\n")
+
+
+def _env(data_dir: str) -> dict:
+    env = dict(os.environ, BON_TRAVAIL_DATA_DIR=data_dir, BON_TRAVAIL_BACKEND="json", BON_TRAVAIL_PROFILE="0")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, env.get("PYTHONPATH", "")) if p)
+    return env
+
+
+def _run(data_dir: str, code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], env=_env(data_dir), cwd=ROOT, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def _seed(data_dir: str, rows: int, days: int) -> None:
+    _run(data_dir, ("import sys; sys.path.insert(0, {bench!r})\n"
+                    "import bon_travail\n"
+                    "from datagen import generate_bons\n"
+                    "bon_travail.write_bons(list(generate_bons({rows}, days={days}, postes=bon_travail.INITIAL_POSTES,"
+                    " descriptions=bon_travail.INITIAL_DESCRIPTIONS)))\n").format(bench=BENCH, rows=rows, days=days))
+
+
+def _measure(data_dir: str, repeat: int) -> dict:
+    runs = [json.loads(_run(data_dir, _DASHBOARD).strip().splitlines()[-1]) for _ in range(repeat)]
+    best = min(runs, key=lambda r: r["s"])
+    return dict(best, peak=max(r["peak"] for r in runs))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", default="20000,80000", help="volumes d'historique (virgules)")
+    ap.add_argument("--days", type=int, default=730, help="profondeur de l'historique en jours")
+    ap.add_argument("--before", default="2026-06", help="premier mois laissé actif (AAAA-MM)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'bons':>8}  {'stockage':<9}{'actifs':>8}{'durée (s)':>11}{'pic (Mo)':>10}{'partitions lues':>17}")
+    for rows in (int(r) for r in args.rows.split(",") if r):
+        data_dir = tempfile.mkdtemp(prefix="bon_partitions_")
+        _seed(data_dir, rows, args.days)
+        for label in ("actif", "archivé"):
+            if label == "archivé":
+                t0 = time.perf_counter()
+                out = _run(data_dir, f"import bon_travail as bt; print(sum(bt.archive_bons({args.before!r}).values()))")
+                print(f"{'':>8}  archivage de {out.strip()} bons en {time.perf_counter() - t0:.2f}s")
+            m = _measure(data_dir, args.repeat)
+            print(f"{m['bons']:>8}  {label:<9}{m['active']:>8}{m['s']:>11.3f}{m['peak'] / 2**20:>10.1f}"
+                  f"{m['partitions']:>17}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Benchmark de la représentation en mémoire des bons : liste de dicts face à BonRecord.
+
+    python benchmarks/records.py --rows 100000
+
+Sur le même jeu de bons (datagen.py, relu depuis du JSON comme le snapshot) :
+- mémoire des lignes (tracemalloc, valeurs comprises) : dicts tels que json.load
+  les rend (ce que le store gardait) contre BonRecord (slots, valeurs internées,
+  date en ordinal)
+- durée des conversions : from_dict (chargement), to_dict (lecture API,
+  load_bon_into_session), export_values (export Excel)
+- mémoire résidente du store JSON ouvert (nouveau processus, tracemalloc)
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH)
+
+from bon_travail.model import BonRecord, INITIAL_POSTES, INITIAL_DESCRIPTIONS  # noqa: E402
+from datagen import generate_bons  # noqa: E402
+
+_STORE = ("import json, tracemalloc\n"
+          "tracemalloc.start()\n"
+          "import bon_travail as bt\n"
+          "base = tracemalloc.get_traced_memory()[0]\n"
+          "bt.count_bons()\n"
+          "current, peak = tracemalloc.get_traced_memory()\n"
+          "print(json.dumps({'resident': current - base, 'peak': peak - base}))\n")
+
+
+def _traced(build):
+    """(résultat, octets alloués et encore vivants après `build()`)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    out = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return out, after - before
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    payload = json.dumps(list(generate_bons(args.rows, postes=INITIAL_POSTES, descriptions=INITIAL_DESCRIPTIONS)),
+                         ensure_ascii=False)
+    dicts, dict_bytes = _traced(lambda: json.loads(payload))
+    records, record_bytes = _traced(lambda: [BonRecord.from_dict(r) for r in json.loads(payload)])
+    assert [r.to_dict() for r in records] == dicts
+
+    per = 100_000 / args.rows / 2**20
+    print(f"{args.rows} bons")
+    print(f"{'représentation':<16}{'Mo / 100k bons':>16}{'octets / bon':>14}")
+    print(f"{'dicts':<16}{dict_bytes * per:>16.1f}{dict_bytes / args.rows:>14.0f}")
+    print(f"{'BonRecord':<16}{record_bytes * per:>16.1f}{record_bytes / args.rows:>14.0f}")
+    print(f"mémoire / {dict_bytes / max(record_bytes, 1):.1f}\n")
+
+    print(f"{'conversion':<16}{'durée (s)':>12}{'µs / bon':>10}")
+    for name, fn in (("from_dict", lambda: [BonRecord.from_dict(r) for r in dicts]),
+                     ("to_dict", lambda: [r.to_dict() for r in records]),
+                     ("export_values", lambda: [r.export_values() for r in records])):
+        s = _timed(fn, args.repeat)
+        print(f"{name:<16}{s:>12.3f}{s / args.rows * 1e6:>10.2f}")
+
+    data_dir = tempfile.mkdtemp(prefix="bon_records_")
+    with open(os.path.join(data_dir, "bon_travail.json"), "w", encoding="utf-8") as f:
+        f.write(payload)
+    env = dict(os.environ, BON_TRAVAIL_DATA_DIR=data_dir, BON_TRAVAIL_BACKEND="json", BON_TRAVAIL_PROFILE="0")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, env.get("PYTHONPATH", "")) if p)
+    out = subprocess.run([sys.executable, "-c", _STORE], env=env, cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    store = json.loads(out.strip().splitlines()[-1])
+    print(f"\nstore JSON ouvert : {store['resident'] / 2**20:.1f} Mo résidents (lignes + index), "
+          f"pic au chargement {store['peak'] / 2**20:.1f} Mo")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
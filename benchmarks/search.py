@@ -0,0 +1,76 @@
+"""
+Benchmark de la recherche indexée et plein texte (panneau Recherche & Liste).
+
+    python benchmarks/search.py --rows 100000 --backend json
+
+Mesure le temps moyen de search_bons pour chaque mode de recherche, sur des
+requêtes sélectives (celles d'un usage normal du panneau).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = [
+    ("Code", "BT-04213"),
+    ("Code", "0421"),
+    ("Date", "2026-03-05"),
+    ("Date", "2026-03-01..2026-03-02"),
+    ("Poste de charge", "asl007"),
+    ("Dpt", "non val"),
+]
+
+ACTIONS = ["Nettoyage filtre", "Réglage vérin", "Graissage chaîne", "Remplacement courroie",
+           "Remplacement thermocouple défaillant", "Contrôle capteur de pression"]
+
+
+def _import_app(data_dir: str, backend: str):
+    os.environ["BON_TRAVAIL_DATA_DIR"] = data_dir
+    os.environ["BON_TRAVAIL_BACKEND"] = backend
+    sys.path.insert(0, ROOT)
+    import bon_travail
+    return bon_travail
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    app = _import_app(tempfile.mkdtemp(prefix="bon_search_"), args.backend)
+    rnd = random.Random(0)
+    t0 = time.perf_counter()
+    app.api._bons().replace_all([
+        {"code": f"BT-{i:05d}", "date": f"{2020 + i % 7}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+         "poste_de_charge": f"ASL{rnd.randint(0, 400):03d}",
+         "dpt_qualite": rnd.choice(["", "Valider", "Non Valider"]) if rnd.random() < 0.01 else "",
+         "action": rnd.choice(ACTIONS), "observation": rnd.choice(["RAS", "À surveiller", "Pièce usée"])}
+        for i in range(args.rows)])
+    print(f"chargement de {args.rows} bons : {time.perf_counter() - t0:.2f}s")
+
+    for mode, term in QUERIES:
+        n = len(app.search_bons(mode, term))
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            app.search_bons(mode, term)
+        dt = (time.perf_counter() - t0) / args.repeat
+        print(f"{mode:<16} {term!r:<28} {n:6d} résultats  {dt * 1e3:8.3f} ms")
+
+    # plein texte classé (top 20) : coût proportionnel aux listes des termes demandés
+    for text in ("thermocouple", "capteur pression usée"):
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            hits = app.search_fulltext(text, k=20)
+        dt = (time.perf_counter() - t0) / args.repeat
+        print(f"{'Texte libre':<16} {text!r:<28} {len(hits):6d} résultats  {dt * 1e3:8.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
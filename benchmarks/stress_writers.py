@@ -0,0 +1,183 @@
+"""
+Stress test des écrivains concurrents du data layer (add_bon / upsert_pdr / update_bon).
+
+    python benchmarks/stress_writers.py --threads 16 --per-thread 50 --processes 3 --backends json,sqlite
+
+Deux scénarios ; à la fin, rien ne doit manquer (aucune mise à jour perdue) :
+- uniques  : chaque écrivain ajoute des bons et des PDR à codes uniques ; tous
+             doivent être présents
+- partagé  : tous les écrivains modifient le même bon (update_bon) et ajoutent des
+             bons qui consomment la même PDR (pdr_utilisee) ; le stock final, le
+             nombre de mouvements de consommation et les cumuls par poste doivent
+             correspondre exactement au nombre d'écritures
+Pour chaque backend et chaque scénario, le jeu est joué deux fois sur un
+répertoire neuf, par le même chemin (api -> écrivain
+unique -> verrou inter-processus -> une écriture + fsync par commit) :
+- sans regroupement : BON_TRAVAIL_GROUP_COMMIT_MS=0, BON_TRAVAIL_GROUP_COMMIT_MAX=1
+  (un commit par mutation)
+- group commit      : fenêtre --window-ms, lots de --max-batch mutations au plus
+Chaque processus écrivain (1 + --processes) démarre ses threads au même signal ;
+débit = mutations validées / durée entre le premier départ et la dernière fin.
+Le gain dépend du coût d'un fsync (--dir : répertoire de données sur un autre disque).
+"""
+import argparse
+import multiprocessing as mp
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ("sans regroupement", "group commit")
+SCENARIOS = ("uniques", "partagé")
+
+SHARED_BON, SHARED_PDR = "BT-PARTAGE", "P-PARTAGE"
+STOCK_LEFT = 100   # stock attendu en fin de scénario partagé : aucune consommation bornée à 0
+
+
+def _import_app(data_dir: str, backend: str, window_ms: float, max_batch: int):
+    os.environ["BON_TRAVAIL_DATA_DIR"] = data_dir
+    os.environ["BON_TRAVAIL_BACKEND"] = backend
+    os.environ["BON_TRAVAIL_GROUP_COMMIT_MS"] = str(window_ms)
+    os.environ["BON_TRAVAIL_GROUP_COMMIT_MAX"] = str(max_batch)
+    os.environ["BON_TRAVAIL_PROFILE"] = "0"
+    sys.path.insert(0, ROOT)
+    import bon_travail
+    return bon_travail
+
+
+def _writer_unique(app, prefix: str, n: int) -> None:
+    for i in range(n):
+        app.add_bon({"code": f"{prefix}-{i}", "date": "2026-01-01", "poste_de_charge": "ASL011"})
+        if i % 5 == 0:
+            app.upsert_pdr({"code": f"P-{prefix}-{i}", "quantite": 1})
+
+
+def _writer_shared(app, prefix: str, n: int) -> None:
+    for i in range(n):
+        app.update_bon(SHARED_BON, {"poste_de_charge": f"{prefix}-{i}"})
+        app.add_bon({"code": f"{prefix}-{i}", "date": "2026-01-01", "poste_de_charge": "ASL011",
+                     "pdr_utilisee": SHARED_PDR})
+
+
+WRITERS = {"uniques": _writer_unique, "partagé": _writer_shared}
+
+
+def _seed_main(data_dir: str, backend: str, stock: int, results) -> None:
+    """Bon et PDR partagés, créés avant le départ des écrivains."""
+    app = _import_app(data_dir, backend, 0, 1)
+    app.add_bon({"code": SHARED_BON, "date": "2026-01-01", "poste_de_charge": "ASL011"})
+    app.upsert_pdr({"code": SHARED_PDR, "quantite": stock})
+    results.put(None)
+
+
+def _process_main(data_dir: str, backend: str, window_ms: float, max_batch: int, scenario: str, tag: str,
+                  threads: int, per_thread: int, start, results) -> None:
+    app = _import_app(data_dir, backend, window_ms, max_batch)
+    app.count_bons()   # stockage ouvert et écrivain démarré avant le signal de départ
+    workers = [threading.Thread(target=WRITERS[scenario], args=(app, f"{tag}{t}", per_thread))
+               for t in range(threads)]
+    start.wait()
+    t0 = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    results.put((t0, time.time(), dict(app.api._backend().writer.stats)))
+
+
+def _count_main(data_dir: str, backend: str, results) -> None:
+    app = _import_app(data_dir, backend, 0, 1)
+    shared = app.get_bon_by_code(SHARED_BON) or {}
+    results.put({"bons": app.count_bons(), "pdr": len(app.read_pdr()), "stock": app.pdr_stock(SHARED_PDR),
+                 "consommations": sum(m["kind"] == "consommation" for m in app.read_pdr_movements(SHARED_PDR, None)),
+                 "cumuls": sum(app.read_rollup("poste_de_charge").values()),
+                 "poste": shared.get("poste_de_charge", "")})
+
+
+def _run(ctx, args, backend: str, scenario: str, mode: str) -> tuple:
+    """(mutations, durée, commits, comptes) d'un scénario sur un répertoire neuf."""
+    window_ms, max_batch = (0, 1) if mode == MODES[0] else (args.window_ms, args.max_batch)
+    data_dir = tempfile.mkdtemp(prefix="bon_stress_", dir=args.dir or None)
+    n = 1 + args.processes
+    start, results = ctx.Barrier(n + 1), ctx.Queue()
+    if scenario == "partagé":
+        seeder = ctx.Process(target=_seed_main, args=(data_dir, backend, args.stock, results))
+        seeder.start()
+        results.get()
+        seeder.join()
+    procs = [ctx.Process(target=_process_main, args=(data_dir, backend, window_ms, max_batch, scenario, f"w{p}-",
+                                                     args.threads, args.per_thread, start, results))
+             for p in range(n)]
+    for p in procs:
+        p.start()
+    start.wait()
+    runs = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    counter = ctx.Process(target=_count_main, args=(data_dir, backend, results))
+    counter.start()
+    counts = results.get()
+    counter.join()
+    elapsed = max(r[1] for r in runs) - min(r[0] for r in runs)
+    return sum(r[2]["mutations"] for r in runs), elapsed, sum(r[2]["commits"] for r in runs), counts
+
+
+def _expected(args, scenario: str) -> dict:
+    """Comptes attendus en fin de scénario (aucune mise à jour perdue)."""
+    writers = (1 + args.processes) * args.threads
+    if scenario == "uniques":
+        return {"bons": writers * args.per_thread, "pdr": writers * len(range(0, args.per_thread, 5))}
+    added = writers * args.per_thread
+    return {"bons": added + 1, "pdr": 1, "stock": STOCK_LEFT, "consommations": added, "cumuls": added + 1}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--threads", type=int, default=16, help="threads écrivains par processus")
+    ap.add_argument("--per-thread", type=int, default=50,
+                    help="bons ajoutés par thread (uniques : + 1 PDR tous les 5 ; partagé : + 1 update_bon chacun)")
+    ap.add_argument("--processes", type=int, default=0, help="processus écrivains supplémentaires")
+    ap.add_argument("--backends", default="json,sqlite")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--window-ms", type=float, default=None, help="fenêtre du group commit (défaut : config)")
+    ap.add_argument("--max-batch", type=int, default=None, help="mutations par commit au plus (défaut : config)")
+    ap.add_argument("--dir", default="", help="répertoire parent des données (défaut : temporaire)")
+    args = ap.parse_args()
+    sys.path.insert(0, ROOT)
+    from bon_travail.config import GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_BATCH
+    args.window_ms = GROUP_COMMIT_WINDOW_MS if args.window_ms is None else args.window_ms
+    args.max_batch = GROUP_COMMIT_MAX_BATCH if args.max_batch is None else args.max_batch
+
+    ctx = mp.get_context("spawn")
+    writers = (1 + args.processes) * args.threads
+    args.stock = writers * args.per_thread + STOCK_LEFT
+    print(f"{1 + args.processes} processus x {args.threads} threads x {args.per_thread} bons ; "
+          f"group commit : fenêtre {args.window_ms:g} ms, {args.max_batch} mutations/commit au plus")
+    print(f"{'backend':<8}{'scénario':<10}{'mode':<20}{'mutations/s':>13}{'commits':>9}{'mut./commit':>13}  vérification")
+    ok = True
+    for backend in filter(None, args.backends.split(",")):
+        for scenario in filter(None, args.scenarios.split(",")):
+            expected, rates = _expected(args, scenario), {}
+            for mode in MODES:
+                mutations, elapsed, commits, counts = _run(ctx, args, backend, scenario, mode)
+                rates[mode] = mutations / elapsed
+                checks = [f"{k} {counts[k]}/{v}" for k, v in expected.items()]
+                complete = all(counts[k] == v for k, v in expected.items())
+                if scenario == "partagé":
+                    # dernière valeur écrite par l'un des écrivains : aucune écriture partielle
+                    complete &= re.fullmatch(r"w\d+-\d+-\d+", counts["poste"]) is not None
+                    checks.append(f"poste {counts['poste'] or '-'}")
+                ok &= complete
+                print(f"{backend:<8}{scenario:<10}{mode:<20}{rates[mode]:>13,.0f}{commits:>9}"
+                      f"{mutations / max(commits, 1):>13.1f}  {', '.join(checks)} "
+                      f"{'OK' if complete else 'MISES À JOUR PERDUES'}")
+            print(f"{backend:<8}{scenario:<10}{'gain':<20}{rates[MODES[1]] / rates[MODES[0]]:>12.2f}x")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
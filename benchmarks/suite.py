@@ -0,0 +1,196 @@
+"""
+Suite de benchmarks du data layer et du tableau de bord.
+
+    python benchmarks/suite.py --sizes 1000,10000,100000 --backend json --out results.json
+    python benchmarks/suite.py --sizes 1000000 --cases read_bons,search --compare results.json
+
+Pour chaque taille, le store est rempli avec des bons générés (datagen.py, graine
+fixe), puis chaque cas est chronométré (meilleur de --repeat passages) et mesuré
+en pic mémoire Python (tracemalloc, passage séparé). Les résultats sont écrits en
+JSON (commit git, machine, cas / taille / secondes / Mo) ; --compare affiche le
+rapport avec un fichier de résultats précédent.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datagen import generate_bons  # noqa: E402
+
+N_WRITES = 100   # mutations par mesure de add_bon / update_bon
+
+SEARCHES = [
+    ("Code", "BT-0004"),
+    ("Date", "2026-03"),
+    ("Poste de charge", "asl01"),
+    ("Dpt", "non val"),
+]
+
+
+def _import_app(data_dir: str, backend: str):
+    os.environ["BON_TRAVAIL_DATA_DIR"] = data_dir
+    os.environ["BON_TRAVAIL_BACKEND"] = backend
+    sys.path.insert(0, ROOT)
+    import bon_travail
+    return bon_travail
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _cases(app, size: int, backend: str):
+    """(nom, fonction, opérations par appel, remise en état hors mesure ou None)."""
+    state = {"round": 0}
+
+    def add_bon():
+        state["round"] += 1
+        prefix = f"ADD{state['round']}"
+        for bon in generate_bons(N_WRITES, seed=state["round"], postes=app.INITIAL_POSTES,
+                                 descriptions=app.INITIAL_DESCRIPTIONS, code_prefix=prefix):
+            app.add_bon(bon)
+
+    def remove_added():
+        app.delete_bons([f"ADD{state['round']}-{i + 1:06d}" for i in range(N_WRITES)])
+
+    codes = [f"BT-{i + 1:0{max(6, len(str(size)))}d}" for i in range(0, size, max(1, size // N_WRITES))][:N_WRITES]
+
+    def update_bon():
+        state["round"] += 1
+        for code in codes:
+            app.update_bon(code, {"observation": f"benchmark {state['round']}"})
+
+    def read_bons_cold():
+        if backend == "json":
+            app.BonStore(app.FILES["bon_travail"], app.FILES["bon_travail_journal"]).all()
+        else:
+            app.SqliteBackend(app.SQLITE_PATH).bons.all()
+
+    rows = app.read_bons()
+
+    def compute_progress():
+        for r in rows:
+            app.compute_progress(r)
+
+    def compute_progress_frame():
+        app.compute_progress_frame(pd.DataFrame(rows, columns=app.BON_COLUMNS))
+
+    def plot_pareto():
+        app.render_pareto(app.read_rollup("day"), "day", 3)
+
+    def plot_paretoo():
+        app.render_paretoo(app.read_rollup("description_probleme"), 5)
+
+    def search():
+        for mode, term in SEARCHES:
+            app.search_bons(mode, term)
+
+    def export_excel():
+        app.export_excel(app.iter_bons())
+
+    return [
+        ("read_bons", app.read_bons, 1, None),
+        ("read_bons_cold", read_bons_cold, 1, None),
+        ("add_bon", add_bon, N_WRITES, remove_added),
+        ("update_bon", update_bon, len(codes), None),
+        ("compute_progress", compute_progress, size, None),
+        ("compute_progress_frame", compute_progress_frame, size, None),
+        ("plot_pareto", plot_pareto, 1, None),
+        ("plot_paretoo", plot_paretoo, 1, None),
+        ("search", search, len(SEARCHES), None),
+        ("export_excel", export_excel, 1, None),
+    ]
+
+
+def _measure(fn, repeat: int, reset=None) -> tuple:
+    """(meilleur temps en s, pic mémoire en octets) ; tracemalloc ralentit : passage séparé."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+        if reset is not None:
+            reset()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if reset is not None:
+        reset()
+    return best, peak
+
+
+def _compare(results: list, baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(r["case"], r["size"]): r for r in baseline["results"]}
+    print(f"\ncomparaison avec {baseline_path} (commit {baseline.get('commit') or '?'}, "
+          f"backend {baseline.get('backend', '?')})")
+    print(f"{'cas':<24}{'taille':>9}{'avant (s)':>12}{'après (s)':>12}{'ratio':>8}")
+    for r in results:
+        o = old.get((r["case"], r["size"]))
+        if o is None:
+            continue
+        ratio = r["seconds"] / o["seconds"] if o["seconds"] else float("inf")
+        flag = "  <-- plus lent" if ratio > 1.2 else ""
+        print(f"{r['case']:<24}{r['size']:>9}{o['seconds']:>12.4f}{r['seconds']:>12.4f}{ratio:>8.2f}{flag}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="1000,10000,100000",
+                    help="tailles séparées par des virgules (jusqu'à 1000000)")
+    ap.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    ap.add_argument("--cases", default="", help="cas à exécuter (virgules), tous par défaut")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="", help="fichier JSON de résultats")
+    ap.add_argument("--compare", default="", help="fichier JSON de résultats de référence")
+    args = ap.parse_args()
+
+    app = _import_app(tempfile.mkdtemp(prefix="bon_suite_"), args.backend)
+    wanted = {c for c in args.cases.split(",") if c}
+    results = []
+    print(f"{'cas':<24}{'taille':>9}{'temps (s)':>12}{'ms / op':>10}{'pic (Mo)':>10}")
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        t0 = time.perf_counter()
+        app.write_bons(list(generate_bons(size, seed=args.seed, postes=app.INITIAL_POSTES,
+                                          descriptions=app.INITIAL_DESCRIPTIONS)))
+        print(f"-- {size} bons chargés en {time.perf_counter() - t0:.2f}s")
+        for name, fn, ops, reset in _cases(app, size, args.backend):
+            if wanted and name not in wanted:
+                continue
+            seconds, peak = _measure(fn, args.repeat, reset)
+            results.append({"case": name, "size": size, "seconds": round(seconds, 6),
+                            "ms_per_op": round(seconds * 1e3 / ops, 6), "peak_mb": round(peak / 2**20, 3)})
+            r = results[-1]
+            print(f"{name:<24}{size:>9}{r['seconds']:>12.4f}{r['ms_per_op']:>10.4f}{r['peak_mb']:>10.1f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"commit": _git_commit(), "date": datetime.now().isoformat(timespec="seconds"),
+                       "backend": args.backend, "python": platform.python_version(),
+                       "machine": platform.platform(), "seed": args.seed, "results": results}, f, indent=2)
+        print(f"\nrésultats écrits dans {args.out}")
+    if args.compare:
+        _compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
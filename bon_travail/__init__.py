@@ -0,0 +1,52 @@
+"""
+Cœur de l'application des bons de travail, utilisable sans Streamlit (scripts,
+tâches planifiées, CLI : python -m bon_travail).
+
+L'import ne crée ni fichier ni répertoire : le stockage est ouvert au premier
+appel de l'API (get_backend), qui crée alors DATA_DIR et les fichiers manquants.
+Export Excel, import et graphiques (openpyxl, matplotlib) ne sont chargés qu'à
+leur premier usage.
+"""
+import importlib
+
+from .config import (DATA_DIR, FILES, SQLITE_PATH, STORAGE_BACKEND, JOURNAL_COMPACT_THRESHOLD,
+                     GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_BATCH, ARCHIVE_DIR, ARCHIVE_KEEP_MONTHS, FILE_FORMAT)
+from .model import (BON_COLUMNS, PDR_COLUMNS, CATEGORICAL_COLUMNS, INITIAL_DESCRIPTIONS, INITIAL_POSTES,
+                    BonRecord, compute_progress, compute_progress_frame, hash_password)
+from .jsonio import (ensure_data_files, load_json, atomic_write, read_options, write_options, json_cache_stats,
+                     FILE_FORMATS, encode_data, decode_data, data_format)
+from .profiling import PROFILER, Profiler, profiled
+from .columnar import FRAME_COLUMNS
+from .downtime import (DOWNTIME_DIMENSIONS, PROBLEM_FAMILIES, STAT_LABELS, build_events, downtime_stats,
+                       get_downtime_cache)
+from .query import BonQuery, BonRollups, ROLLUP_DIMENSIONS, date_query, fold_text, tokenize
+from .storage import (BonStore, BonArchive, PdrLedger, SqliteBackend, JsonBackend, WriteCoordinator, PDR_MOVEMENT_KINDS,
+                      migrate_json_to_sqlite, bon_month)
+from .api import (
+    SEARCH_FIELDS, get_backend,
+    read_bons, write_bons, read_bons_with_progress, read_bons_frame, run_query, query_bons, explain_query, query_stats,
+    read_bons_page, count_bons, mean_progress, get_bon_by_code, bon_exists, read_bon_codes, find_bons, search_query,
+    search_bons, search_fulltext, read_rollup, iter_bons, bons_data_version, downtime_report, count_bons_by,
+    add_bon, update_bon, delete_bon, update_bons, delete_bons, storage_stats, compact_storage,
+    archive_cutoff, archive_bons,
+    read_pdr, get_pdr, pdr_stock, read_pdr_movements, move_pdr, restock_pdr, write_pdr, upsert_pdr,
+    delete_pdr_by_code, read_users, write_users, get_user, create_user,
+)
+
+# nom public -> sous-module chargé au premier accès (dépendances lourdes)
+_LAZY = {
+    "write_excel": "export", "export_excel": "export",
+    "import_bons": "importer", "read_import_chunks": "importer", "validate_import_chunk": "importer",
+    "IMPORT_CHUNK_ROWS": "importer",
+    "render_pareto": "charts", "render_paretoo": "charts", "get_chart_cache": "charts",
+    "chart_cache_stats": "charts", "PERIOD_LABELS": "charts",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,6 @@
+"""python -m bon_travail : voir bon_travail.cli."""
+import sys
+
+from .cli import main
+
+sys.exit(main())
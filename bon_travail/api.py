@@ -0,0 +1,325 @@
+"""
+API des données (bons, PDR, utilisateurs) : fonctions utilisées par l'application
+Streamlit, la CLI et les scripts. Toute écriture passe par l'écrivain unique du backend.
+"""
+import os
+import re
+import threading
+from datetime import date
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator
+
+import pandas as pd
+
+from .config import DATA_DIR, FILES, SQLITE_PATH, STORAGE_BACKEND, ARCHIVE_KEEP_MONTHS
+from .downtime import DOWNTIME_DIMENSIONS, get_downtime_cache
+from .jsonio import ensure_data_files
+from .model import BON_COLUMNS, hash_password
+from .profiling import profiled
+from .query import BonQuery, date_query
+from .storage import (JsonBackend, SqliteBackend, WriteCoordinator, migrate_json_to_sqlite,
+                      _normalize_bon_values)
+
+# ---------------------------
+# Sélection du backend (BON_TRAVAIL_BACKEND = json | sqlite)
+# ---------------------------
+_BACKENDS: Dict[tuple, Any] = {}
+_BACKENDS_LOCK = threading.Lock()
+
+def get_backend(kind: str, data_dir: str):
+    """
+    Backend partagé par toutes les sessions (le module survit aux reruns Streamlit).
+    Ouvert au premier appel : c'est là que DATA_DIR et les fichiers manquants sont créés.
+    """
+    with _BACKENDS_LOCK:
+        backend = _BACKENDS.get((kind, data_dir))
+        if backend is not None:
+            return backend
+        if kind not in ("json", "sqlite"):
+            raise ValueError(f"Backend de stockage inconnu: {kind}")
+        ensure_data_files()
+        if kind == "json":
+            backend = JsonBackend(FILES)
+        else:
+            fresh = not os.path.exists(SQLITE_PATH)
+            backend = SqliteBackend(SQLITE_PATH)
+            if fresh:
+                # première ouverture : reprise automatique des fichiers JSON existants
+                migrate_json_to_sqlite(SQLITE_PATH, FILES)
+        backend.writer = WriteCoordinator(backend)
+        _BACKENDS[(kind, data_dir)] = backend
+        return backend
+
+def _backend():
+    return get_backend(STORAGE_BACKEND, DATA_DIR)
+
+def _write(fn: Callable[[], Any]) -> Any:
+    """
+    Passe une mutation à l'écrivain unique (group commit, verrou inter-processus).
+    `fn` s'exécute dans le thread écrivain : résoudre backend/store avant de l'appeler.
+    """
+    return _backend().writer.submit(fn)
+
+def _bons():
+    return _backend().bons
+
+# Champs couverts par chaque mode de recherche du panneau "Recherche & Liste"
+SEARCH_FIELDS = {
+    "Code": ("code",),
+    "Date": ("date",),
+    "Poste de charge": ("poste_de_charge",),
+    "Dpt": ("dpt_production", "dpt_maintenance", "dpt_qualite"),
+}
+
+@profiled("data.read_bons")
+def read_bons() -> List[Dict[str, Any]]:
+    return _bons().all()
+
+@profiled("data.write_bons")
+def write_bons(arr: List[Dict[str, Any]]):
+    bons = _bons()
+    _write(lambda: bons.replace_all(arr))
+
+@profiled("data.read_bons_frame")
+def read_bons_frame(columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    DataFrame d'analyse des bons (fenêtre active) : colonnes de `columns` parmi
+    FRAME_COLUMNS, catégorielles en "category", date en datetime64, avancement en int8.
+    """
+    return _bons().frame(columns)
+
+@profiled("data.read_bons_with_progress")
+def read_bons_with_progress() -> tuple:
+    """(bons, avancements en %) — avancement tenu à jour par le store à chaque écriture."""
+    return _bons().all_with_progress()
+
+@profiled("data.run_query")
+def run_query(q: BonQuery, with_progress: bool = False) -> tuple:
+    """(bons, avancements ou None, plan) d'une BonQuery ; plan = index utilisé, lignes, durée."""
+    return _bons().execute(q, with_progress)
+
+def query_bons(q: BonQuery) -> List[Dict[str, Any]]:
+    return run_query(q)[0]
+
+def explain_query(q: BonQuery) -> Dict[str, Any]:
+    """Plan d'exécution d'une BonQuery (index choisi, lignes examinées / renvoyées, durée en ms)."""
+    return run_query(q)[2]
+
+def query_stats() -> Dict[str, int]:
+    """Nombre de requêtes servies par chaque index depuis le démarrage."""
+    return dict(_bons().query_stats)
+
+@profiled("data.read_bons_page")
+def read_bons_page(sort_by: str = "date", descending: bool = True, offset: int = 0, limit: int = 50) -> tuple:
+    """(bons, avancements, total) pour une page de tableau, triée côté store."""
+    q = BonQuery().order(sort_by, descending).offset(offset).limit(limit)
+    bons, progress, _ = run_query(q, with_progress=True)
+    return bons, progress, count_bons()
+
+@profiled("data.count_bons")
+def count_bons() -> int:
+    return _bons().count()
+
+@profiled("data.mean_progress")
+def mean_progress() -> float:
+    """Avancement moyen (%) de tous les bons."""
+    return _bons().mean_progress()
+
+@profiled("data.get_bon_by_code")
+def get_bon_by_code(code: str) -> Optional[Dict[str, Any]]:
+    return _bons().get(code)
+
+def bon_exists(code: str) -> bool:
+    return _bons().exists(code)
+
+@profiled("data.read_bon_codes")
+def read_bon_codes() -> List[str]:
+    """Codes des bons modifiables (backend json : fenêtre active, mois archivés exclus)."""
+    return _bons().active_codes()
+
+@profiled("data.find_bons")
+def find_bons(field: str, value: Any) -> List[Dict[str, Any]]:
+    """Recherche exacte via l'index (code, date, poste_de_charge, technicien)."""
+    return _bons().find(field, value)
+
+def search_query(search_by: str, term: str) -> BonQuery:
+    """
+    Requête du panneau Recherche : 'contient' (insensible à la casse) selon un mode de
+    SEARCH_FIELDS ; en mode Date, "2026-01" (préfixe) et "2026-01-01..2026-01-31"
+    (intervalle) deviennent un intervalle servi par l'index trié.
+    """
+    fields = SEARCH_FIELDS[search_by]
+    dq = date_query(term) if fields == ("date",) else None
+    return BonQuery().range("date", *dq) if dq is not None else BonQuery().contains(fields, term)
+
+@profiled("data.search_bons")
+def search_bons(search_by: str, term: str) -> List[Dict[str, Any]]:
+    return query_bons(search_query(search_by, term))
+
+@profiled("data.search_fulltext")
+def search_fulltext(text: str, k: int = 20) -> List[tuple]:
+    """[(bon, score)] : k bons les plus pertinents sur les champs texte libre (FULLTEXT_FIELDS)."""
+    return _bons().fulltext(text, k)
+
+@profiled("data.read_rollup")
+def read_rollup(dimension: str) -> Dict[str, int]:
+    """Comptes matérialisés par bucket pour une dimension de ROLLUP_DIMENSIONS."""
+    return _bons().rollup(dimension)
+
+def iter_bons(q: Optional[BonQuery] = None) -> Iterator[tuple]:
+    """Bons d'une requête en flux (tuples dans l'ordre de BON_COLUMNS), sans liste intermédiaire."""
+    return _bons().iter_values(q or BonQuery())
+
+def bons_data_version() -> tuple:
+    """Jeton qui change à chaque modification des bons (clé des caches de rendu)."""
+    backend = _backend()
+    return (backend.name, backend.bons.version())
+
+@profiled("data.downtime_report")
+def downtime_report(dimension: str = "poste_de_charge", date_from: str = "", date_to: str = "") -> tuple:
+    """
+    (tableau par `dimension` de DOWNTIME_DIMENSIONS, synthèse du parc) : temps de réponse,
+    MTTR, MTBF et temps d'arrêt des bons datés de date_from à date_to inclus (mois
+    archivés compris ; bornes vides = tout l'historique). Cache par version des données.
+    """
+    if dimension not in DOWNTIME_DIMENSIONS:
+        raise KeyError(f"Dimension inconnue: {dimension}")
+    # version lue avant les bons : une écriture concurrente ne peut qu'invalider l'entrée
+    version = bons_data_version()
+    return get_downtime_cache().report(version, dimension, date_from, date_to,
+                                       lambda: iter_bons(BonQuery().date_between(date_from, date_to)))
+
+@profiled("data.count_bons_by")
+def count_bons_by(field: str, **filters) -> Dict[str, int]:
+    """Nombre de bons par valeur de `field` (filtres d'égalité optionnels)."""
+    return _bons().count_by(field, filters or None)
+
+@profiled("data.add_bon")
+def add_bon(bon: Dict[str, Any]) -> None:
+    # --- Normaliser avant stockage (date/datetime -> string) ---
+    entry = _normalize_bon_values({k: bon.get(k, "") for k in BON_COLUMNS})
+
+    backend = _backend()
+    # décrémente la PDR utilisée (si elle existe) dans la même écriture que le bon
+    _write(lambda: backend.bon_add(entry))
+
+@profiled("data.update_bon")
+def update_bon(code: str, updates: Dict[str, Any]) -> None:
+    bons = _bons()
+    _write(lambda: bons.update(code, updates))
+
+@profiled("data.delete_bon")
+def delete_bon(code: str) -> None:
+    bons = _bons()
+    _write(lambda: bons.delete(code))
+
+@profiled("data.update_bons")
+def update_bons(codes: Iterable[str], updates: Dict[str, Any]) -> int:
+    """Applique `updates` à plusieurs bons en une seule écriture (KeyError si un code manque)."""
+    bons, codes = _bons(), list(codes)
+    return _write(lambda: bons.update_many(codes, updates))
+
+@profiled("data.delete_bons")
+def delete_bons(codes: Iterable[str]) -> int:
+    """Supprime plusieurs bons en une seule écriture ; renvoie le nombre de bons supprimés."""
+    bons, codes = _bons(), list(codes)
+    return _write(lambda: bons.delete_many(codes))
+
+@profiled("data.storage_stats")
+def storage_stats() -> Dict[str, Any]:
+    """Backend, volumes (bons, PDR, utilisateurs), avancement moyen et état des fichiers de stockage."""
+    backend = _backend()
+    return {"backend": backend.name, "data_dir": DATA_DIR, "bons": backend.bons.count(),
+            "mean_progress": round(backend.bons.mean_progress(), 1), "pdr": len(backend.pdr_all()),
+            "users": len(backend.users_all()), "storage": backend.storage_info()}
+
+def compact_storage() -> Dict[str, Any]:
+    """
+    Compaction à la demande (json : journal replié dans le snapshot ; sqlite : checkpoint
+    du WAL + VACUUM). Hors écrivain unique : prend elle-même ses verrous.
+    """
+    return _backend().compact()
+
+def archive_cutoff(keep_months: int = ARCHIVE_KEEP_MONTHS, today: Optional[date] = None) -> str:
+    """Premier mois (AAAA-MM) qui reste actif : le mois courant moins `keep_months`."""
+    today = today or date.today()
+    n = today.year * 12 + today.month - 1 - keep_months
+    return f"{n // 12:04d}-{n % 12 + 1:02d}"
+
+def archive_bons(before: Optional[str] = None) -> Dict[str, int]:
+    """
+    Archive les mois clos antérieurs à `before` (AAAA-MM, archive_cutoff() par défaut) :
+    une partition gzip en lecture seule par mois, hors de la mémoire de l'application.
+    Backend json uniquement. Comme compact_storage, prend elle-même ses verrous.
+    Renvoie {mois: bons archivés}.
+    """
+    before = before or archive_cutoff()
+    if not re.fullmatch(r"\d{4}-\d{2}", before):
+        raise ValueError(f"Mois invalide (AAAA-MM attendu) : {before}")
+    return _backend().archive(before)
+
+# ---------------------------
+# PDR CRUD (garde les fonctions si tu veux la page)
+# ---------------------------
+@profiled("data.read_pdr")
+def read_pdr() -> List[Dict[str, Any]]:
+    """PDR du catalogue ; quantite = stock courant (total cumulé des mouvements)."""
+    return _backend().pdr_all()
+
+def get_pdr(code: str) -> Optional[Dict[str, Any]]:
+    return _backend().pdr_get(code)
+
+def pdr_stock(code: str) -> int:
+    p = get_pdr(code)
+    return int(p["quantite"]) if p else 0
+
+@profiled("data.read_pdr_movements")
+def read_pdr_movements(code: Optional[str] = None, limit: Optional[int] = 200) -> List[Dict[str, Any]]:
+    """Mouvements de stock (consommation / reappro / ajustement), du plus récent au plus ancien."""
+    return _backend().pdr_movements(code, limit)
+
+@profiled("data.move_pdr")
+def move_pdr(code: str, delta: int, kind: str = "ajustement") -> int:
+    """Enregistre un mouvement de stock (stock borné à 0) ; renvoie le nouveau stock."""
+    backend = _backend()
+    return _write(lambda: backend.pdr_move(str(code).strip(), int(delta), kind))
+
+def restock_pdr(code: str, quantity: int) -> int:
+    if int(quantity) <= 0:
+        raise ValueError("Quantité de réapprovisionnement invalide")
+    return move_pdr(code, int(quantity), "reappro")
+
+def write_pdr(arr: List[Dict[str, Any]]):
+    backend = _backend()
+    _write(lambda: backend.pdr_replace_all(arr))
+
+@profiled("data.upsert_pdr")
+def upsert_pdr(rec: Dict[str, Any]):
+    code = str(rec.get("code","")).strip()
+    if not code:
+        raise ValueError("Code PDR requis")
+    entry = {"code": code, "remplacement": rec.get("remplacement",""), "nom_composant": rec.get("nom_composant",""), "quantite": int(rec.get("quantite",0))}
+    backend = _backend()
+    _write(lambda: backend.pdr_upsert(entry))
+
+def delete_pdr_by_code(code: str):
+    backend = _backend()
+    _write(lambda: backend.pdr_delete(code))
+
+# ---------------------------
+# Users helpers
+# ---------------------------
+@profiled("data.read_users")
+def read_users() -> List[Dict[str, Any]]:
+    return _backend().users_all()
+
+def write_users(arr: List[Dict[str, Any]]):
+    backend = _backend()
+    _write(lambda: backend.users_replace_all(arr))
+
+def get_user(username: str) -> Optional[Dict[str,Any]]:
+    return _backend().user_get(username)
+
+def create_user(username: str, password: str, role: str):
+    pwd_hash = hash_password(password)
+    backend = _backend()
+    _write(lambda: backend.user_add(username, pwd_hash, role))
@@ -0,0 +1,184 @@
+"""
+Graphiques Pareto rendus en PNG (sans Streamlit) et cache LRU des rendus.
+"""
+import io
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Callable
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from .config import CHART_CACHE_MAX_BYTES, CHART_CACHE_MAX_ENTRIES
+from .profiling import profiled
+
+# ---------------------------
+# Cache des graphiques rendus (PNG)
+# ---------------------------
+class ChartCache:
+    """
+    LRU des graphiques déjà rendus : clé -> (png, top), bornée en nombre d'entrées
+    et en octets. La clé contient la version des données (bons_data_version) :
+    une écriture rend les anciennes entrées inaccessibles, l'LRU les évince.
+    """
+
+    def __init__(self, max_bytes: int = CHART_CACHE_MAX_BYTES, max_entries: int = CHART_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, value: tuple) -> None:
+        size = len(value[0])
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            if size > self.max_bytes:
+                return
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[0])
+
+    def get_or_render(self, key: tuple, render: Callable[[], tuple]) -> tuple:
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.put(key, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._bytes}
+
+_CHART_CACHE = ChartCache()
+
+def get_chart_cache() -> ChartCache:
+    """Cache unique du processus (survit aux reruns Streamlit)."""
+    return _CHART_CACHE
+
+def chart_cache_stats() -> Dict[str, int]:
+    """Compteurs hits / misses / entrées / octets du cache des graphiques."""
+    return get_chart_cache().stats()
+
+def _fig_to_png(fig) -> bytes:
+    """Rend la figure en PNG (mêmes options que st.pyplot) puis la ferme."""
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
+    finally:
+        plt.close(fig)
+    return buf.getvalue()
+
+# ---------------------------
+# Pareto par période (rendu PNG ; affichage : plot_pareto dans l'application)
+# ---------------------------
+PERIOD_LABELS = {"day": "Jour", "week": "Semaine", "month": "Mois"}
+
+@profiled("chart.render_pareto")
+def render_pareto(period_counts: Dict[str, int], period: str = "day", top_n_labels: int = 3) -> tuple:
+    """(png, top) du Pareto par période ; png vide si aucune donnée."""
+    counts = pd.Series(period_counts, dtype="int64").sort_values(ascending=False)
+    total = int(counts.sum())
+    if total == 0:
+        return b"", []
+    xlabel = PERIOD_LABELS.get(period, "Mois")
+    cum_pct = 100 * counts.cumsum() / total
+
+    fig, ax1 = plt.subplots(figsize=(10,4))
+    fig.patch.set_facecolor("#f8fbff")
+    ax1.set_facecolor("#ffffff")
+
+    x = np.arange(len(counts))
+    cmap = plt.get_cmap("viridis")
+    colors = cmap(np.linspace(0.2, 0.8, len(counts)))
+    bars = ax1.bar(x, counts.values, color=colors, edgecolor="#2b2b2b", linewidth=0.2)
+    ax1.set_xticks(x)
+    ax1.set_xticklabels(counts.index.tolist(), rotation=45, ha='right', fontsize=9)
+    ax1.set_ylabel("Nombre d'interventions")
+    ax1.set_xlabel(xlabel)
+    ax1.set_title(f"Pareto ({period}) - total = {total}", fontsize=12, weight="bold")
+    ax1.grid(axis="y", alpha=0.12)
+
+    ax2 = ax1.twinx()
+    ax2.plot(x, cum_pct.values, color='#ff7f0e', marker='o', linewidth=2)
+    ax2.set_ylim(0, 110)
+    ax2.set_ylabel("Pourcentage cumulé (%)", color='#ff7f0e')
+    ax2.tick_params(axis='y', labelcolor='#ff7f0e')
+    ax2.axhline(80, color='grey', linestyle='--', alpha=0.6)
+
+    # annotate top
+    top = counts.head(top_n_labels)
+    for idx, (label, val) in enumerate(counts.items()):
+        if idx < top_n_labels:
+            pct = val/total*100
+            ax1.text(idx, val + max(counts.values)*0.02, f"{val} ({pct:.1f}%)", ha='center', fontsize=9, bbox=dict(boxstyle="round", alpha=0.18))
+
+    fig.tight_layout()
+    return _fig_to_png(fig), [(label, int(val), val/total*100) for label, val in top.items()]
+
+# ---------------------------
+# Pareto par type de problème (rendu PNG ; affichage : plot_paretoo dans l'application)
+# ---------------------------
+@profiled("chart.render_paretoo")
+def render_paretoo(type_counts: Dict[str, int], top_n_labels: int = 5) -> tuple:
+    """(png, top) du Pareto par type de problème ; png vide si aucune donnée."""
+    counts = pd.Series(type_counts, dtype="int64").sort_values(ascending=False)
+    total = int(counts.sum())
+    if total == 0:
+        return b"", []
+
+    cum_pct = 100 * counts.cumsum() / total
+
+    fig, ax1 = plt.subplots(figsize=(10,4))
+    fig.patch.set_facecolor("#f8fbff")
+    ax1.set_facecolor("#ffffff")
+
+    x = np.arange(len(counts))
+    cmap = plt.get_cmap("viridis")
+    colors = cmap(np.linspace(0.2, 0.8, len(counts)))
+    ax1.bar(x, counts.values, color=colors, edgecolor="#2b2b2b", linewidth=0.2)
+
+    ax1.set_xticks(x)
+    ax1.set_xticklabels(counts.index.tolist(), rotation=45, ha='right', fontsize=9)
+    ax1.set_ylabel("Nombre d'occurrences")
+    ax1.set_xlabel("Type de problème")
+    ax1.set_title(f"Pareto des problèmes - total = {total}", fontsize=12, weight="bold")
+    ax1.grid(axis="y", alpha=0.12)
+
+    ax2 = ax1.twinx()
+    ax2.plot(x, cum_pct.values, color='#ff7f0e', marker='o', linewidth=2)
+    ax2.set_ylim(0, 110)
+    ax2.set_ylabel("Pourcentage cumulé (%)", color='#ff7f0e')
+    ax2.tick_params(axis='y', labelcolor='#ff7f0e')
+    ax2.axhline(80, color='grey', linestyle='--', alpha=0.6)
+
+    # --- Annoter les top problèmes ---
+    top = counts.head(top_n_labels)
+    for idx, (label, val) in enumerate(counts.items()):
+        if idx < top_n_labels:
+            pct = val/total*100
+            ax1.text(idx, val + max(counts.values)*0.02,
+                     f"{val} ({pct:.1f}%)",
+                     ha='center', fontsize=9,
+                     bbox=dict(boxstyle="round", alpha=0.18))
+
+    fig.tight_layout()
+    return _fig_to_png(fig), [(label, int(val), val/total*100) for label, val in top.items()]
@@ -0,0 +1,176 @@
+"""
+Ligne de commande (sans Streamlit) : export, import, compaction, archivage, statistiques, temps d'arrêt.
+
+    python -m bon_travail stats [--json]
+    python -m bon_travail export bons.xlsx [--from 2026-01-01] [--to 2026-03-31] [--poste ASL011] [--charts]
+    python -m bon_travail import bons.csv [--dry-run] [--errors erreurs.csv]
+    python -m bon_travail compact
+    python -m bon_travail archive [--before 2026-09]
+    python -m bon_travail downtime [--by poste_de_charge|famille|technicien] [--from 2026-01-01] [--to 2026-03-31] [--csv t.csv]
+
+Répertoire de données et backend : BON_TRAVAIL_DATA_DIR, BON_TRAVAIL_BACKEND (comme l'application).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+from . import api
+from .query import BonQuery
+
+
+def _size(n: int) -> str:
+    return f"{n / 2**20:.1f} Mo" if n >= 2**20 else f"{n / 2**10:.1f} Ko"
+
+
+def cmd_stats(args) -> int:
+    stats = api.storage_stats()
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return 0
+    storage = stats["storage"]
+    print(f"backend          : {stats['backend']} ({stats['data_dir']})")
+    print(f"bons             : {stats['bons']} (avancement moyen {stats['mean_progress']} %)")
+    print(f"pdr              : {stats['pdr']}")
+    print(f"utilisateurs     : {stats['users']}")
+    fmt = f" ({storage['format']})" if storage.get("format") else ""
+    print(f"stockage         : {_size(storage['bytes'])}{fmt}")
+    if "journal_records" in storage:
+        print(f"journal          : {storage['journal_records']} enregistrements, {_size(storage['journal_bytes'])}")
+    if "wal_bytes" in storage:
+        print(f"wal              : {_size(storage['wal_bytes'])}")
+    if "archive_partitions" in storage:
+        print(f"archive          : {storage['archive_bons']} bons en {storage['archive_partitions']} mois, "
+              f"{_size(storage['archive_bytes'])}")
+    return 0
+
+
+def cmd_export(args) -> int:
+    from .export import export_excel
+    q = BonQuery().date_between(args.date_from, args.date_to)
+    if args.poste:
+        q = q.eq("poste_de_charge", args.poste)
+    t0 = time.perf_counter()
+    data = export_excel(api.iter_bons(q), with_charts=args.charts)
+    with open(args.out, "wb") as f:
+        f.write(data)
+    print(f"{args.out} : {_size(len(data))} en {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+def cmd_import(args) -> int:
+    from .importer import import_bons
+    with open(args.file, "rb") as f:
+        data = f.read()
+    res = import_bons(data, os.path.basename(args.file), dry_run=args.dry_run)
+    print(f"lignes : {res['lignes']}, valides : {res['valides']}, importés : {res['importes']}, "
+          f"erreurs : {len(res['erreurs'])}")
+    if res["pdr"]:
+        print("PDR consommées : " + ", ".join(f"{k} x{n}" for k, n in sorted(res["pdr"].items())))
+    if res["pdr_inconnues"]:
+        print("PDR inconnues (stock inchangé) : " + ", ".join(res["pdr_inconnues"]))
+    if len(res["erreurs"]):
+        if args.errors:
+            res["erreurs"].to_csv(args.errors, index=False, sep=";", encoding="utf-8-sig")
+            print(f"erreurs écrites dans {args.errors}")
+        else:
+            print(res["erreurs"].head(20).to_string(index=False))
+    return 1 if len(res["erreurs"]) and not res["valides"] else 0
+
+
+def cmd_compact(args) -> int:
+    t0 = time.perf_counter()
+    res = api.compact_storage()
+    before, after = res["before"], res["after"]
+    print(f"compaction en {time.perf_counter() - t0:.2f}s : {_size(before['bytes'])} -> {_size(after['bytes'])}")
+    if "journal_records" in before:
+        print(f"journal : {before['journal_records']} -> {after['journal_records']} enregistrements")
+    if "wal_bytes" in before:
+        print(f"wal : {_size(before['wal_bytes'])} -> {_size(after['wal_bytes'])}")
+    return 0
+
+
+def cmd_archive(args) -> int:
+    t0 = time.perf_counter()
+    before = args.before or api.archive_cutoff()
+    res = api.archive_bons(before)
+    if not res:
+        print(f"aucun bon actif antérieur à {before}")
+        return 0
+    for month, n in res.items():
+        print(f"{month} : {n} bons archivés")
+    print(f"{sum(res.values())} bons en {len(res)} partition(s), {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+def cmd_downtime(args) -> int:
+    from .downtime import STAT_LABELS
+    table, summary = api.downtime_report(args.by, args.date_from, args.date_to)
+    if args.csv:
+        table.rename(columns=STAT_LABELS).to_csv(args.csv, sep=";", encoding="utf-8-sig", float_format="%.1f")
+        print(f"{args.csv} : {len(table)} lignes")
+    else:
+        print(table.to_string(float_format=lambda v: f"{v:.1f}"))
+
+    def fmt(v, unit):
+        return "-" if v is None else f"{v:.1f} {unit}"
+    print(f"\n{summary['bons']} bons, {summary['arrets']} arrêts sur {summary['postes']} postes "
+          f"({summary['fenetre_h'] / 24:.0f} jours) : réponse {fmt(summary['reponse_moy_min'], 'min')}, "
+          f"MTTR {fmt(summary['mttr_min'], 'min')}, arrêt total {fmt(summary['arret_total_h'], 'h')}, "
+          f"MTBF {fmt(summary['mtbf_h'], 'h')}")
+    if summary["heures_invalides"]:
+        print(f"{summary['heures_invalides']} bons avec une heure illisible ou incohérente (durées ignorées)")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="python -m bon_travail", description=__doc__.splitlines()[1],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter,
+                                 epilog=__doc__.split("\n\n", 2)[2])
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("stats", help="volumes et état du stockage")
+    p.add_argument("--json", action="store_true", help="sortie JSON")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("export", help="export Excel des bons")
+    p.add_argument("out", help="fichier .xlsx à écrire")
+    p.add_argument("--from", dest="date_from", default="", help="date minimale (YYYY-MM-DD)")
+    p.add_argument("--to", dest="date_to", default="", help="date maximale (YYYY-MM-DD)")
+    p.add_argument("--poste", default="", help="poste de charge")
+    p.add_argument("--charts", action="store_true", help="ajoute la feuille Pareto")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="import de bons depuis un fichier .xlsx / .csv")
+    p.add_argument("file")
+    p.add_argument("--dry-run", action="store_true", help="validation seule, rien n'est écrit")
+    p.add_argument("--errors", default="", help="fichier CSV des lignes rejetées")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("compact", help="compaction du stockage (journal json / VACUUM sqlite), conversion"
+                                       " du snapshot json au format BON_TRAVAIL_FILE_FORMAT")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("archive", help="archive les mois clos en partitions compressées (backend json)")
+    p.add_argument("--before", default="", help="premier mois laissé actif (AAAA-MM), "
+                                                 "par défaut le mois précédent")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("downtime", help="temps de réponse, MTTR, MTBF et temps d'arrêt par dimension")
+    p.add_argument("--by", default="poste_de_charge", choices=["poste_de_charge", "famille", "technicien"])
+    p.add_argument("--from", dest="date_from", default="", help="date minimale (YYYY-MM-DD)")
+    p.add_argument("--to", dest="date_to", default="", help="date maximale (YYYY-MM-DD)")
+    p.add_argument("--csv", default="", help="fichier CSV du tableau")
+    p.set_defaults(func=cmd_downtime)
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"erreur : {e}", file=sys.stderr)
+        return 2
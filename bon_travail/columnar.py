@@ -0,0 +1,200 @@
+"""
+Instantané colonnaire des bons pour l'analyse : une colonne par fichier .npy
+(lecture en mmap), colonnes texte encodées par dictionnaire, date en datetime64.
+"""
+import os
+import shutil
+from typing import List, Dict, Any, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+
+from .jsonio import atomic_write, _file_signature, _read_json_file
+from .model import BON_COLUMNS, CATEGORICAL_COLUMNS
+
+# ---------------------------
+# Encodage
+# ---------------------------
+# CATEGORICAL_COLUMNS (bon_travail.model) : dtype "category" dans les DataFrames d'analyse
+# Autres colonnes texte : même encodage sur disque, chaînes (object) dans les DataFrames
+TEXT_COLUMNS = tuple(c for c in BON_COLUMNS if c != "date" and c not in CATEGORICAL_COLUMNS)
+# Colonnes d'un DataFrame d'analyse : BON_COLUMNS (date en datetime64) + avancement
+FRAME_COLUMNS = tuple(BON_COLUMNS) + ("progress",)
+
+def _text(v: Any) -> str:
+    return "" if v is None else str(v)
+
+def _code_dtype(n: int) -> type:
+    """Plus petit entier signé qui indexe un dictionnaire de `n` valeurs."""
+    return np.int8 if n < 2**7 else np.int16 if n < 2**15 else np.int32
+
+def encode_dictionary(values: Iterable[str], base: Optional[List[str]] = None) -> tuple:
+    """
+    (codes, dictionnaire) : dictionnaire = `base` puis les nouvelles valeurs dans
+    l'ordre d'apparition, si bien que des codes déjà calculés sur `base` restent valables.
+    """
+    index = {v: i for i, v in enumerate(base or ())}
+    dictionary = list(base or ())
+    codes = []
+    for v in values:
+        i = index.get(v)
+        if i is None:
+            i = index[v] = len(dictionary)
+            dictionary.append(v)
+        codes.append(i)
+    return np.asarray(codes, dtype=_code_dtype(len(dictionary))), dictionary
+
+def _pack_strings(strings: List[str]) -> tuple:
+    """Dictionnaire -> (octets UTF-8 concaténés, décalages), comme une colonne Arrow."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    return [raw[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+def parse_dates(values: Iterable[str]) -> np.ndarray:
+    """Dates stockées (YYYY-MM-DD) -> datetime64[s] ; NaT si vide ou invalide."""
+    return pd.to_datetime(pd.Series(list(values), dtype=object), format="%Y-%m-%d",
+                          errors="coerce").to_numpy(dtype="datetime64[s]")
+
+def encode_rows(rows: List[Dict[str, Any]], progress: List[int]) -> Dict[str, np.ndarray]:
+    """Tableaux d'un instantané : <col>.codes / <col>.data / <col>.offsets, date, progress."""
+    arrays = {"date": parse_dates(_text(r.get("date")) for r in rows),
+              "progress": np.asarray(progress, dtype=np.int8)}
+    for col in CATEGORICAL_COLUMNS + TEXT_COLUMNS:
+        codes, dictionary = encode_dictionary(_text(r.get(col)) for r in rows)
+        arrays[f"{col}.codes"] = codes
+        arrays[f"{col}.data"], arrays[f"{col}.offsets"] = _pack_strings(dictionary)
+    return arrays
+
+# ---------------------------
+# Instantané sur disque (une génération = un sous-répertoire, current.json = pointeur)
+# ---------------------------
+class ColumnarSnapshot:
+    """
+    Instantané colonnaire en lecture seule. Les tableaux sont ouverts en mmap :
+    l'ouverture ne lit que les en-têtes, les pages sont chargées par le système
+    à l'accès et partagées entre processus. Les dictionnaires des colonnes
+    catégorielles (petits) sont décodés une fois par instantané.
+    `tag` = état des bons qu'il représente ({"snapshot": signature, "journal": octets rejoués}).
+    """
+
+    def __init__(self, directory: str, meta: Dict[str, Any]):
+        self.directory = directory
+        self.tag = meta["tag"]
+        self.rows = meta["rows"]
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._dictionaries: Dict[str, List[str]] = {}
+
+    def array(self, name: str) -> np.ndarray:
+        arr = self._arrays.get(name)
+        if arr is None:
+            arr = self._arrays[name] = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+        return arr
+
+    def dictionary(self, col: str) -> List[str]:
+        d = self._dictionaries.get(col)
+        if d is None:
+            d = self._dictionaries[col] = _unpack_strings(self.array(f"{col}.data"), self.array(f"{col}.offsets"))
+        return d
+
+    def code_mask(self, codes: Iterable[str]) -> Optional[np.ndarray]:
+        """Masque des lignes dont le code N'EST PAS dans `codes` (None si aucune n'est exclue)."""
+        codes = set(codes)
+        if not codes:
+            return None
+        hit = np.fromiter((c in codes for c in self.dictionary("code")), dtype=bool)
+        if not hit.any():
+            return None
+        return ~hit[self.array("code.codes")]
+
+
+def write_snapshot(root: str, arrays: Dict[str, np.ndarray], tag: Dict[str, Any]) -> None:
+    """Écrit une génération complète puis bascule current.json (les lecteurs en cours gardent l'ancienne)."""
+    os.makedirs(root, exist_ok=True)
+    name = f"g{os.getpid()}-{os.urandom(4).hex()}"
+    directory = os.path.join(root, name)
+    os.makedirs(directory)
+    for key, arr in arrays.items():
+        np.save(os.path.join(directory, f"{key}.npy"), arr)
+    rows = len(arrays["progress"])
+    previous = (_read_json_file(os.path.join(root, "current.json")) or {}).get("generation")
+    atomic_write(os.path.join(root, "current.json"), {"generation": name, "tag": tag, "rows": rows})
+    # on garde la génération précédente (lecteur d'un autre processus en cours), pas les autres
+    for entry in os.listdir(root):
+        if entry not in (name, previous, "current.json") and os.path.isdir(os.path.join(root, entry)):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+
+class ColumnarStore:
+    """Génération courante d'un répertoire d'instantanés, rouverte si current.json change."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._signature: Optional[tuple] = None
+        self._snapshot: Optional[ColumnarSnapshot] = None
+
+    def current(self) -> Optional[ColumnarSnapshot]:
+        path = os.path.join(self.root, "current.json")
+        sig = _file_signature(path)
+        if sig != self._signature:
+            meta = _read_json_file(path) if sig else None
+            self._snapshot = ColumnarSnapshot(os.path.join(self.root, meta["generation"]), meta) if meta else None
+            self._signature = sig
+        return self._snapshot
+
+    def write(self, arrays: Dict[str, np.ndarray], tag: Dict[str, Any]) -> None:
+        write_snapshot(self.root, arrays, tag)
+
+# ---------------------------
+# DataFrames d'analyse
+# ---------------------------
+def _check_columns(columns: Optional[Iterable[str]]) -> List[str]:
+    columns = list(columns or FRAME_COLUMNS)
+    unknown = [c for c in columns if c not in FRAME_COLUMNS]
+    if unknown:
+        raise KeyError(f"Colonne(s) inconnue(s): {', '.join(unknown)}")
+    return columns
+
+def build_frame(columns: Optional[Iterable[str]] = None, snapshot: Optional[ColumnarSnapshot] = None,
+                exclude_codes: Iterable[str] = (), rows: Optional[List[Dict[str, Any]]] = None,
+                progress: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    DataFrame d'analyse : lignes de `snapshot` (sauf `exclude_codes`) puis `rows`
+    (bons modifiés depuis l'instantané). Colonnes catégorielles en "category" (un
+    dictionnaire commun aux deux parties), date en datetime64, avancement en int8.
+    Sans filtre, les tableaux numériques de l'instantané sont repris sans copie.
+    """
+    columns = _check_columns(columns)
+    rows, progress = rows or [], progress or []
+    mask = snapshot.code_mask(exclude_codes) if snapshot is not None else None
+
+    def base(name: str) -> np.ndarray:
+        arr = snapshot.array(name)
+        return arr[mask] if mask is not None else arr
+
+    out: Dict[str, Any] = {}
+    for col in columns:
+        if col == "progress":
+            parts = ([base("progress")] if snapshot is not None else []) + [np.asarray(progress, dtype=np.int8)]
+            out[col] = parts[0] if not rows and snapshot is not None else np.concatenate(parts)
+        elif col == "date":
+            new = parse_dates(_text(r.get("date")) for r in rows)
+            out[col] = base("date") if not rows and snapshot is not None else np.concatenate(
+                ([base("date")] if snapshot is not None else []) + [new])
+        else:
+            dictionary = snapshot.dictionary(col) if snapshot is not None else []
+            new_codes, dictionary = encode_dictionary((_text(r.get(col)) for r in rows), dictionary)
+            if snapshot is not None:
+                codes = base(f"{col}.codes")
+                codes = codes if not rows else np.concatenate([codes.astype(new_codes.dtype), new_codes])
+            else:
+                codes = new_codes
+            values = pd.Categorical.from_codes(codes, categories=pd.Index(dictionary, dtype=object))
+            out[col] = values if col in CATEGORICAL_COLUMNS else np.asarray(values, dtype=object)
+    n = len(next(iter(out.values()))) if out else (snapshot.rows if snapshot is not None else 0) + len(rows)
+    return pd.DataFrame(out, columns=columns, index=pd.RangeIndex(n), copy=False)
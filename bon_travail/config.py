@@ -0,0 +1,78 @@
+"""
+Configuration du stockage : chemins des fichiers de données et réglages lus
+dans l'environnement (BON_TRAVAIL_*). Aucun fichier ni répertoire n'est créé à
+l'import : voir ensure_data_files() (bon_travail.jsonio).
+"""
+import os
+
+# ---------------------------
+# Data files
+# ---------------------------
+DATA_DIR = os.environ.get("BON_TRAVAIL_DATA_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+FILES = {
+    "bon_travail": os.path.join(DATA_DIR, "bon_travail.json"),
+    "liste_pdr": os.path.join(DATA_DIR, "liste_pdr.json"),
+    "users": os.path.join(DATA_DIR, "users.json"),
+    "options_description_probleme": os.path.join(DATA_DIR, "options_description_probleme.json"),
+    "options_poste_de_charge": os.path.join(DATA_DIR, "options_poste_de_charge.json"),
+}
+
+# Format d'écriture des fichiers de données (à la lecture, le format est détecté) :
+#   "json"   : JSON compact (défaut ; codec orjson s'il est installé)
+#   "pretty" : JSON indenté, lisible à l'œil (~2x plus gros, plus lent à relire)
+#   "binary" : binaire compressé (msgpack + zstd s'ils sont installés, sinon JSON + zlib)
+# Un changement de format s'applique aux fichiers au fil de leur réécriture
+# (python -m bon_travail compact réécrit le snapshot des bons)
+FILE_FORMAT = os.environ.get("BON_TRAVAIL_FILE_FORMAT", "json").strip().lower()
+
+# Journal append-only des bons (backend json) : compaction dans bon_travail.json
+# dès que le journal atteint ce nombre d'enregistrements (0 = réécrire le snapshot
+# à chaque modification, comme avant le journal)
+FILES["bon_travail_journal"] = os.path.join(DATA_DIR, "bon_travail.journal.jsonl")
+JOURNAL_COMPACT_THRESHOLD = int(os.environ.get("BON_TRAVAIL_JOURNAL_COMPACT", "1000"))
+# Compteurs Pareto matérialisés (jour / semaine / mois / type / poste), rattachés au snapshot
+FILES["bon_travail_rollups"] = os.path.join(DATA_DIR, "bon_travail.rollups.json")
+# Instantané colonnaire des bons (un .npy par colonne, lu en mmap), rattaché au snapshot
+FILES["bon_travail_columns"] = os.path.join(DATA_DIR, "bon_travail.columns")
+# Registre des mouvements de stock PDR déjà archivés (backend json)
+FILES["pdr_mouvements"] = os.path.join(DATA_DIR, "pdr_mouvements.jsonl")
+
+# Archives mensuelles (backend json) : les mois clos sortent du snapshot vers une
+# partition gzip en lecture seule par mois (bons/AAAA-MM.json.gz), décrite par un
+# manifeste (comptes, bornes de dates, rollups) et un index code -> mois
+ARCHIVE_DIR = os.path.join(DATA_DIR, "bons")
+FILES["bons_manifest"] = os.path.join(ARCHIVE_DIR, "manifest.json")
+FILES["bons_codes"] = os.path.join(ARCHIVE_DIR, "codes.json")
+# partitions décompressées gardées en mémoire (les plus récemment lues)
+ARCHIVE_CACHE_PARTITIONS = int(os.environ.get("BON_TRAVAIL_ARCHIVE_CACHE", "4"))
+# mois précédant le mois courant qui restent actifs lors d'un archivage par défaut
+ARCHIVE_KEEP_MONTHS = 1
+
+# Group commit : fenêtre (ms) pendant laquelle l'écrivain unique regroupe les
+# mutations arrivées en même temps avant de les valider en une seule écriture
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("BON_TRAVAIL_GROUP_COMMIT_MS", "2"))
+# Nombre maximal de mutations par commit (1 + fenêtre 0 : un commit par mutation)
+GROUP_COMMIT_MAX_BATCH = max(1, int(os.environ.get("BON_TRAVAIL_GROUP_COMMIT_MAX", "256")))
+
+# Backend de stockage des bons / PDR / utilisateurs : "json" (défaut) ou "sqlite"
+STORAGE_BACKEND = os.environ.get("BON_TRAVAIL_BACKEND", "json").strip().lower()
+SQLITE_PATH = os.path.join(DATA_DIR, "bon_travail.sqlite3")
+
+# ---------------------------
+# Instrumentation : temps (et allocations) par section, pour chaque rerun
+# ---------------------------
+# BON_TRAVAIL_PROFILE=0 désactive les relevés ; BON_TRAVAIL_PROFILE_TRACEMALLOC=1 ajoute
+# l'allocation nette par section (tracemalloc, coûteux : diagnostic ponctuel)
+PROFILE_ENABLED = os.environ.get("BON_TRAVAIL_PROFILE", "1").strip() != "0"
+PROFILE_TRACEMALLOC = os.environ.get("BON_TRAVAIL_PROFILE_TRACEMALLOC", "0").strip() == "1"
+PROFILE_KEEP_RUNS = 20                 # reruns gardés dans le panneau de diagnostic
+PROFILE_MAX_BYTES = 20 * 1024 * 1024   # rotation de profile.jsonl (-> profile.jsonl.1)
+FILES["profile"] = os.path.join(DATA_DIR, "profile.jsonl")
+
+# ---------------------------
+# Cache des graphiques rendus (PNG)
+# ---------------------------
+CHART_CACHE_MAX_BYTES = int(float(os.environ.get("BON_TRAVAIL_CHART_CACHE_MB", "32")) * 1024 * 1024)
+CHART_CACHE_MAX_ENTRIES = 256
@@ -0,0 +1,281 @@
+"""
+Temps d'arrêt et indicateurs de maintenance (temps de réponse, MTTR, MTBF) à partir
+de la date et des heures saisies en texte libre sur les bons. Calculs vectorisés
+(pandas / numpy) ; résultats mis en cache par version des données.
+"""
+import re
+import threading
+from collections import OrderedDict
+from operator import itemgetter
+from typing import Dict, Any, Optional, Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+from .model import BON_COLUMNS
+
+# ---------------------------
+# Lecture des heures (texte libre)
+# ---------------------------
+TIME_COLUMNS = ("heure_declaration", "heure_debut_intervention", "heure_fin_intervention")
+# Colonnes des bons lues pour construire les événements
+SOURCE_COLUMNS = ("date",) + TIME_COLUMNS + ("machine_arreter", "poste_de_charge", "technicien",
+                                             "description_probleme")
+
+# "08:30", "8:30", "8h30", "8 h", "08.30", "08:30:00" (secondes ignorées), "14", "0830"
+_TIME_RE = (r"^\s*(?:(?P<h>\d{1,2})\s*(?:[:hH.]\s*(?P<m>\d{2})?(?:\s*[:.]\s*\d{2})?)?"
+            r"|(?P<hc>\d{1,2})(?P<mc>\d{2}))\s*$")
+
+_DAY = pd.Timedelta(days=1)
+# Écart maximal admis après passage de minuit (au-delà : heures incohérentes, ex. fin 07:00 pour début 08:15)
+MAX_ROLLOVER = pd.Timedelta(hours=12)
+
+def parse_minutes(values: Iterable[Any]) -> tuple:
+    """
+    (minutes depuis minuit en float, NaN si vide ou illisible ; masque des valeurs
+    non vides illisibles). "24:00" = minuit du lendemain. Chaque valeur distincte
+    n'est analysée qu'une fois (les heures saisies se répètent beaucoup).
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna("").astype(str))
+    parts = pd.Series(uniques, dtype=object).str.extract(_TIME_RE)
+    h = pd.to_numeric(parts["h"].fillna(parts["hc"]), errors="coerce")
+    m = pd.to_numeric(parts["m"].fillna(parts["mc"]), errors="coerce").fillna(0)
+    ok = ((h < 24) & (m < 60)) | ((h == 24) & (m == 0))
+    minutes = (h * 60 + m).where(ok).to_numpy(dtype=float)
+    blank = pd.Series(uniques, dtype=object).str.strip().eq("").to_numpy(dtype=bool)
+    return minutes[codes], (np.isnan(minutes) & ~blank)[codes]
+
+# ---------------------------
+# Familles de problème (préfixe du code de description, cf. INITIAL_DESCRIPTIONS)
+# ---------------------------
+PROBLEM_FAMILIES = {
+    "P.M.I": "Mécanique",
+    "P.E.I": "Électrique",
+    "P.H.I": "Hydraulique",
+    "P.P.I": "Pneumatique",
+    "P.T.I": "Thermique",
+}
+OTHER_FAMILY = "Autre"
+NOT_SET = "(non renseigné)"
+
+_FAMILY_RE = re.compile(r"^\s*([A-Za-z](?:\.[A-Za-z])+)")
+
+def problem_families(descriptions: Iterable[Any]) -> np.ndarray:
+    """Famille (PROBLEM_FAMILIES) de chaque description ; OTHER_FAMILY si le préfixe est inconnu."""
+    codes, uniques = pd.factorize(pd.Series(descriptions, dtype=object).fillna("").astype(str))
+    labels = []
+    for text in uniques:
+        m = _FAMILY_RE.match(text)
+        labels.append(PROBLEM_FAMILIES.get(m.group(1).upper(), OTHER_FAMILY) if m else OTHER_FAMILY)
+    return np.asarray(labels, dtype=object)[codes]
+
+def _label(values: Iterable[Any]) -> np.ndarray:
+    s = pd.Series(values, dtype=object).fillna("").astype(str).str.strip()
+    return s.mask(s.eq(""), NOT_SET).to_numpy(dtype=object)
+
+# ---------------------------
+# Événements : un bon = une intervention horodatée
+# ---------------------------
+def _roll(stamp: pd.Series, previous: pd.Series) -> tuple:
+    """
+    (`stamp` reporté au lendemain s'il précède `previous`, masque des reports
+    incohérents) : un report qui donne un écart > MAX_ROLLOVER devient NaT.
+    """
+    rolled = stamp < previous
+    stamp = stamp.mask(rolled, stamp + _DAY)
+    bad = (rolled & (stamp - previous > MAX_ROLLOVER)).to_numpy(dtype=bool)
+    return stamp.mask(bad), bad
+
+def build_events(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Événements à partir d'un DataFrame des SOURCE_COLUMNS (date en texte YYYY-MM-DD
+    ou en datetime64) : horodatages declaration / debut / fin, durées en minutes
+    (reponse_min = début - déclaration, reparation_min = fin - début,
+    arret_min = fin - déclaration si la machine est arrêtée) et dimensions d'analyse.
+
+    Passage de minuit : une heure antérieure à celle de l'étape précédente est
+    comptée le lendemain (début avant déclaration, fin avant début), dans la limite
+    de MAX_ROLLOVER. Une heure vide, illisible ou incohérente donne NaT et les durées
+    qui en dépendent sont ignorées (NaN) ; heures_invalides signale les bons dont
+    une heure saisie est illisible ou incohérente.
+    """
+    day = frame["date"]
+    if not pd.api.types.is_datetime64_any_dtype(day):
+        day = pd.to_datetime(pd.Series(day, dtype=object).fillna(""), format="%Y-%m-%d", errors="coerce")
+    day = pd.Series(day.to_numpy(dtype="datetime64[ns]"))
+
+    stamps, invalid = {}, np.zeros(len(frame), dtype=bool)
+    for col in TIME_COLUMNS:
+        minutes, bad = parse_minutes(frame[col].to_numpy(dtype=object))
+        stamps[col] = day + pd.to_timedelta(minutes, unit="m")
+        invalid |= bad
+    decl = stamps["heure_declaration"]
+    debut, bad = _roll(stamps["heure_debut_intervention"], decl)
+    invalid |= bad
+    fin, bad = _roll(stamps["heure_fin_intervention"], debut.fillna(decl))
+    invalid |= bad
+
+    stopped = pd.Series(frame["machine_arreter"].to_numpy(dtype=object)).fillna("").astype(str) \
+        .str.strip().str.lower().eq("oui").to_numpy(dtype=bool)
+    minute = pd.Timedelta(minutes=1)
+    return pd.DataFrame({
+        "date": day,
+        "declaration": decl,
+        "debut": debut,
+        "fin": fin,
+        "arret": stopped,
+        "reponse_min": (debut - decl) / minute,
+        "reparation_min": (fin - debut) / minute,
+        "arret_min": ((fin - decl) / minute).where(stopped),
+        "heures_invalides": invalid,
+        "poste_de_charge": _label(frame["poste_de_charge"].to_numpy(dtype=object)),
+        "famille": problem_families(frame["description_probleme"].to_numpy(dtype=object)),
+        "technicien": _label(frame["technicien"].to_numpy(dtype=object)),
+    })
+
+def events_from_rows(rows: Iterable[tuple]) -> pd.DataFrame:
+    """build_events sur des tuples dans l'ordre de BON_COLUMNS (iter_bons)."""
+    pick = itemgetter(*(BON_COLUMNS.index(c) for c in SOURCE_COLUMNS))
+    frame = pd.DataFrame.from_records((pick(r) for r in rows), columns=SOURCE_COLUMNS)
+    return build_events(frame)
+
+# ---------------------------
+# Indicateurs par dimension
+# ---------------------------
+DOWNTIME_DIMENSIONS = {
+    "poste_de_charge": "Poste de charge",
+    "famille": "Famille de problème",
+    "technicien": "Technicien",
+}
+# Colonnes des tableaux et libellés affichés
+STAT_LABELS = {
+    "bons": "Bons",
+    "arrets": "Arrêts machine",
+    "reponse_moy_min": "Temps de réponse moyen (min)",
+    "mttr_min": "MTTR (min)",
+    "arret_total_h": "Temps d'arrêt total (h)",
+    "mtbf_h": "MTBF (h)",
+    "heures_invalides": "Heures illisibles",
+}
+
+def window_hours(events: pd.DataFrame, date_from: str = "", date_to: str = "") -> float:
+    """Durée en heures de la fenêtre (jours entiers, bornes incluses) ; bornes absentes = dates extrêmes des bons."""
+    start = pd.Timestamp(date_from) if date_from else events["date"].min()
+    end = pd.Timestamp(date_to) if date_to else events["date"].max()
+    if pd.isna(start) or pd.isna(end) or end < start:
+        return 0.0
+    return (end - start + _DAY) / pd.Timedelta(hours=1)
+
+def downtime_stats(events: pd.DataFrame, dimension: Optional[str] = None, hours: float = 0.0) -> pd.DataFrame:
+    """
+    Indicateurs par valeur de `dimension` (une seule ligne "Total" sans dimension),
+    triés par temps d'arrêt décroissant :
+    - reponse_moy_min : moyenne de début - déclaration
+    - mttr_min        : moyenne de fin - début (durée de réparation)
+    - arret_total_h   : somme de fin - déclaration des bons "machine arrêtée"
+    - mtbf_h          : temps de marche / arrêts, sur `hours` heures de fenêtre ; temps de
+                        marche = hours - arrêts du poste (par poste), sinon heures-postes du
+                        parc (postes présents) - arrêts de tout le parc
+    Les durées non mesurables (heure vide ou illisible) sont exclues des moyennes et sommes.
+    """
+    if dimension is not None and dimension not in DOWNTIME_DIMENSIONS:
+        raise KeyError(f"Dimension inconnue: {dimension}")
+    key = events[dimension] if dimension else pd.Series("Total", index=events.index, dtype=object)
+    g = events.groupby(key, sort=False)
+    out = pd.DataFrame({
+        "bons": g.size(),
+        "arrets": g["arret"].sum(),
+        "reponse_moy_min": g["reponse_min"].mean(),
+        "mttr_min": g["reparation_min"].mean(),
+        "arret_total_h": g["arret_min"].sum() / 60,
+        "heures_invalides": g["heures_invalides"].sum(),
+    })
+    if dimension == "poste_de_charge":
+        uptime = hours - out["arret_total_h"]
+    else:
+        fleet = max(events["poste_de_charge"].nunique(), 1)
+        uptime = pd.Series(hours * fleet - events["arret_min"].sum() / 60, index=out.index)
+    out["mtbf_h"] = (uptime.clip(lower=0) / out["arrets"]).where(out["arrets"] > 0)
+    out.index.name = dimension
+    return out[list(STAT_LABELS)].sort_values(["arret_total_h", "bons"], ascending=False)
+
+def downtime_summary(events: pd.DataFrame, hours: float) -> Dict[str, Any]:
+    """Indicateurs de tout le parc sur la fenêtre (mêmes clés que STAT_LABELS, plus fenetre_h et postes)."""
+    row = downtime_stats(events, None, hours).iloc[0] if len(events) else pd.Series(dtype=float)
+    out = {k: (float(row[k]) if k in row and pd.notna(row[k]) else None) for k in STAT_LABELS}
+    for k in ("bons", "arrets", "heures_invalides"):
+        out[k] = int(out[k] or 0)
+    out["fenetre_h"] = hours
+    out["postes"] = int(events["poste_de_charge"].nunique())
+    return out
+
+def report_from_events(events: pd.DataFrame, dimension: str, date_from: str = "", date_to: str = "") -> tuple:
+    """(tableau par `dimension`, synthèse) des événements d'une fenêtre de dates."""
+    hours = window_hours(events, date_from, date_to)
+    return downtime_stats(events, dimension, hours), downtime_summary(events, hours)
+
+# ---------------------------
+# Cache (événements par fenêtre, tableaux par fenêtre et dimension)
+# ---------------------------
+class DowntimeCache:
+    """
+    LRU en mémoire, clés préfixées par la version des données (bons_data_version) :
+    une modification des bons change la clé, les entrées d'une version antérieure
+    sont retirées dès qu'une version plus récente est stockée. Les événements d'une
+    fenêtre sont partagés par les trois dimensions.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[tuple] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _get_or_compute(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()   # hors verrou : les autres sessions ne sont pas bloquées
+        with self._lock:
+            version = key[1]
+            if version != self._version:
+                for k in [k for k in self._entries if k[1] != version]:
+                    del self._entries[k]
+                self._version = version
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def report(self, version: tuple, dimension: str, date_from: str, date_to: str,
+               load: Callable[[], Iterable[tuple]]) -> tuple:
+        """
+        (tableau, synthèse) de report_from_events ; `load()` fournit les bons de la
+        fenêtre (tuples BON_COLUMNS) quand les événements ne sont pas en cache.
+        """
+        if dimension not in DOWNTIME_DIMENSIONS:
+            raise KeyError(f"Dimension inconnue: {dimension}")
+        events = self._get_or_compute(("events", version, date_from, date_to),
+                                      lambda: events_from_rows(load()))
+        table, summary = self._get_or_compute(("report", version, dimension, date_from, date_to),
+                                              lambda: report_from_events(events, dimension, date_from, date_to))
+        return table.copy(), dict(summary)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+_DOWNTIME_CACHE = DowntimeCache()
+
+def get_downtime_cache() -> DowntimeCache:
+    """Cache unique du processus (survit aux reruns Streamlit)."""
+    return _DOWNTIME_CACHE
@@ -0,0 +1,74 @@
+"""
+Export Excel des bons en flux (openpyxl write-only), avec feuille Pareto optionnelle.
+"""
+import io
+from typing import List, Iterable, Optional, Callable
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.drawing.image import Image as XLImage
+
+from .model import BON_COLUMNS
+from .profiling import profiled
+from .query import BonRollups
+
+# ---------------------------
+# Export Excel en flux (page d'export, CLI)
+# ---------------------------
+def write_excel(rows: Iterable[tuple], out, charts: Optional[Callable[[], List[bytes]]] = None) -> int:
+    """
+    Écrit un classeur en mode write-only : les lignes (ordre BON_COLUMNS) sont
+    sérialisées au fil de l'eau, sans garder de cellules en mémoire.
+    `charts` est appelé une fois les lignes écrites ; les PNG qu'il renvoie sont
+    ajoutés dans une feuille "Pareto". Retourne le nombre de lignes écrites.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Bon de travail")
+    header = []
+    for h in BON_COLUMNS:
+        cell = WriteOnlyCell(ws, value=h)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    ws.append(header)
+    n = 0
+    for values in rows:
+        ws.append(values)
+        n += 1
+    if charts is not None:
+        wc = wb.create_sheet("Pareto")
+        anchor_row = 1
+        for png in charts():
+            if not png:
+                continue
+            img = XLImage(io.BytesIO(png))
+            img.width, img.height = 900, int(img.height * 900 / img.width)
+            img.anchor = f"A{anchor_row}"
+            wc.add_image(img)
+            anchor_row += img.height // 20 + 2    # ~20 px par ligne Excel
+    wb.save(out)
+    return n
+
+@profiled("export.export_excel")
+def export_excel(rows: Iterable[tuple], with_charts: bool = False, top_n_labels: int = 5) -> bytes:
+    """
+    Export Excel des bons en flux (iter_bons(...)) ; avec `with_charts`, les Pareto
+    par jour et par type de problème des lignes exportées sont ajoutés en images.
+    """
+    charts = None
+    if with_charts:
+        from .charts import render_pareto, render_paretoo   # matplotlib : seulement si demandé
+        counts = BonRollups()
+        date_idx, desc_idx = BON_COLUMNS.index("date"), BON_COLUMNS.index("description_probleme")
+
+        def counted(rows_in):
+            for values in rows_in:
+                counts.add({"date": values[date_idx], "description_probleme": values[desc_idx]})
+                yield values
+
+        rows = counted(rows)
+        charts = lambda: [render_pareto(counts.counts["day"], "day", top_n_labels)[0],
+                          render_paretoo(counts.counts["description_probleme"], top_n_labels)[0]]
+    bio = io.BytesIO()
+    write_excel(rows, bio, charts)
+    return bio.getvalue()
@@ -0,0 +1,149 @@
+"""
+Import en masse de bons depuis un fichier Excel / CSV : lecture par blocs,
+validation vectorisée, écriture en un seul enregistrement.
+"""
+import io
+import re
+from datetime import datetime, date
+from typing import Dict, Any, Iterator
+
+import pandas as pd
+
+from .api import _backend, _bons, _write
+from .model import BON_COLUMNS
+from .profiling import profiled
+from .query import fold_text
+
+# ---------------------------
+# Import en masse (Excel / CSV) : lecture par blocs, validation vectorisée
+# ---------------------------
+IMPORT_CHUNK_ROWS = 10_000
+# formats acceptés par _to_date_obj, plus les variantes courantes des exports Excel / CSV
+IMPORT_DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S")
+IMPORT_STATUTS = {"": "", "valider": "Valider", "non valider": "Non Valider"}
+
+def _import_column(header: Any) -> str:
+    """En-tête de fichier -> nom de colonne ("Poste de charge" / "poste-de-charge" -> poste_de_charge)."""
+    return re.sub(r"[^a-z0-9]+", "_", fold_text(header)).strip("_")
+
+def _import_cell(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date)):
+        return v.strftime("%Y-%m-%d")
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+def read_import_chunks(data: bytes, filename: str, chunk_rows: int = IMPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Blocs de `chunk_rows` lignes (valeurs en texte) d'un fichier .xlsx / .csv."""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook   # seulement pour les classeurs (CSV : pandas)
+        wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [_import_cell(h) for h in next(rows, ())]
+            width, chunk = len(header), []
+            for r in rows:
+                cells = [_import_cell(v) for v in r[:width]]
+                chunk.append(cells + [""] * (width - len(cells)))
+                if len(chunk) >= chunk_rows:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header)
+        finally:
+            wb.close()
+        return
+    if not data.strip():
+        return
+    first = data[:4096].decode("utf-8-sig", errors="ignore").splitlines()[0]
+    sep = ";" if first.count(";") > first.count(",") else ","   # CSV Excel FR : point-virgule
+    yield from pd.read_csv(io.BytesIO(data), sep=sep, dtype=str, keep_default_na=False,
+                           encoding="utf-8-sig", chunksize=chunk_rows)
+
+def validate_import_chunk(df: pd.DataFrame, first_line: int, seen: set) -> tuple:
+    """
+    (bons valides, erreurs) d'un bloc. Colonnes ramenées à BON_COLUMNS, dates normalisées
+    en YYYY-MM-DD, statuts des départements normalisés ; codes manquants, en double
+    (dans le fichier : `seen` = codes des blocs précédents, mis à jour) ou déjà présents
+    dans le store rejetés, de même que les dates d'un mois archivé (clos).
+    `first_line` = numéro de ligne du fichier de la 1re ligne du bloc.
+    """
+    df = df.rename(columns=_import_column)
+    df = df.loc[:, ~df.columns.duplicated()]
+    frame = df.reindex(columns=BON_COLUMNS).fillna("").astype(str).apply(lambda col: col.str.strip())
+    frame.index = pd.RangeIndex(first_line, first_line + len(frame), name="ligne")
+    frame = frame[frame.ne("").any(axis=1)]   # lignes vides (fin de feuille)
+
+    checks = []
+    code = frame["code"]
+    checks.append((code.eq(""), "code manquant"))
+    # isin() sur les seuls codes du bloc déjà vus : coût proportionnel au bloc, pas au fichier
+    in_file = code.ne("") & (code.duplicated() | code.isin(seen.intersection(code.unique())))
+    checks.append((in_file, "code en double dans le fichier"))
+    existing = _bons().existing_codes(code[code.ne("")].unique())
+    checks.append((code.isin(existing), "code déjà présent"))
+    seen.update(code[code.ne("")])
+
+    raw = frame["date"]
+    parsed = pd.Series(pd.NaT, index=frame.index, dtype="datetime64[ns]")
+    for fmt in IMPORT_DATE_FORMATS:
+        parsed = parsed.fillna(pd.to_datetime(raw, format=fmt, errors="coerce"))
+    checks.append((raw.eq(""), "date manquante"))
+    checks.append((raw.ne("") & parsed.isna(), "date invalide"))
+    frame["date"] = parsed.dt.strftime("%Y-%m-%d").fillna("")
+    closed = _bons().closed_months()
+    if closed:
+        checks.append((frame["date"].str[:7].isin(closed), "mois archivé (clos)"))
+
+    for col in ("dpt_maintenance", "dpt_qualite", "dpt_production"):
+        statut = frame[col].str.lower().map(IMPORT_STATUTS)
+        checks.append((statut.isna(), f"{col} : statut invalide"))
+        frame[col] = statut.fillna(frame[col])
+
+    bad = pd.Series(False, index=frame.index)
+    parts = []
+    for mask, message in checks:
+        bad |= mask
+        if mask.any():
+            parts.append(pd.DataFrame({"code": code[mask], "erreur": message}))
+    errors = pd.concat(parts) if parts else pd.DataFrame(columns=["code", "erreur"])
+    if not errors.empty:
+        # une ligne par ligne du fichier, erreurs jointes
+        errors = errors.groupby(level=0, sort=True).agg({"code": "first", "erreur": "; ".join})
+    return frame[~bad], errors.rename_axis("ligne").reset_index()
+
+@profiled("import.import_bons")
+def import_bons(data: bytes, filename: str, dry_run: bool = False,
+                chunk_rows: int = IMPORT_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Importe les bons valides d'un fichier .xlsx / .csv en UNE écriture (un enregistrement
+    du journal / une transaction), PDR utilisées décrémentées en agrégé.
+    Retourne {"lignes", "valides", "importes", "erreurs" (DataFrame ligne / code / erreur), "pdr",
+    "pdr_inconnues"} ; lignes = lignes non vides lues = valides + lignes d'erreurs ; pdr = {code: n}
+    des seules PDR du catalogue (décrémentées), pdr_inconnues = codes absents du catalogue
+    (gardés sur les bons, stock inchangé, comme pour un bon saisi).
+    Avec dry_run, rien n'est écrit (validation seule).
+    """
+    valid, errors, seen, total = [], [], set(), 0
+    line = 2   # ligne 1 = en-têtes
+    for chunk in read_import_chunks(data, filename, chunk_rows):
+        ok, bad = validate_import_chunk(chunk, line, seen)
+        line += len(chunk)
+        total += len(ok) + len(bad)   # lignes non vides : une erreur = une ligne rejetée
+        valid.append(ok)
+        errors.append(bad)
+    frame = pd.concat(valid) if valid else pd.DataFrame(columns=BON_COLUMNS)
+    pdr = frame["pdr_utilisee"]
+    used = pdr[pdr.ne("")].value_counts()
+    known = {str(p["code"]) for p in _backend().pdr_all()} if len(used) else set()
+    consume = {str(k): int(n) for k, n in used.items() if str(k) in known}
+    if not dry_run and len(frame):
+        rows = frame.to_dict("records")
+        backend = _backend()
+        _write(lambda: backend.bons_import(rows, consume))
+    errors = [e for e in errors if not e.empty]
+    return {"lignes": total, "valides": len(frame), "importes": 0 if dry_run else len(frame),
+            "erreurs": pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=["ligne", "code", "erreur"]),
+            "pdr": consume, "pdr_inconnues": sorted(str(k) for k in used.index if str(k) not in known)}
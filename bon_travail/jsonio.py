@@ -0,0 +1,320 @@
+"""
+Fichiers de données : formats (JSON compact / indenté / binaire compressé, détectés
+à la lecture), écriture atomique, cache process-wide des fichiers parsés (vues en
+lecture seule), verrou inter-processus, options des listes déroulantes.
+"""
+import importlib
+import json
+import os
+import threading
+import zlib
+from typing import List, Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import orjson   # codec JSON rapide, optionnel
+except ImportError:
+    orjson = None
+
+from .config import DATA_DIR, FILES, FILE_FORMAT
+from .model import INITIAL_DESCRIPTIONS, INITIAL_POSTES
+from .profiling import profiled
+
+# ---------------------------
+# Formats des fichiers de données
+# ---------------------------
+FILE_FORMATS = ("json", "pretty", "binary")
+# En-tête du format binaire : octet 0x93 (jamais au début d'un JSON UTF-8), "BTD", puis
+# codec de la charge utile (b"M" msgpack / b"J" JSON) et compression (b"S" zstd / b"Z" zlib)
+_BINARY_MAGIC = b"\x93BTD"
+_OPTIONAL: Dict[str, Any] = {}
+
+def _optional(name: str) -> Any:
+    """Module optionnel importé au premier usage (None s'il n'est pas installé)."""
+    if name not in _OPTIONAL:
+        try:
+            _OPTIONAL[name] = importlib.import_module(name)
+        except ImportError:
+            _OPTIONAL[name] = None
+    return _OPTIONAL[name]
+
+def dumps_json(obj: Any) -> bytes:
+    """JSON compact en UTF-8 (orjson s'il est installé)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass   # type hors orjson (entier > 64 bits, clé non chaîne...) : json standard
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def loads_json(data: bytes) -> Any:
+    """Inverse de dumps_json (ValueError si le JSON est invalide)."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def encode_data(obj: Any, fmt: Optional[str] = None) -> bytes:
+    """Contenu d'un fichier de données au format `fmt` (FILE_FORMAT par défaut)."""
+    fmt = fmt or FILE_FORMAT
+    if fmt == "json":
+        return dumps_json(obj)
+    if fmt == "pretty":
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    if fmt != "binary":
+        raise ValueError(f"Format de fichier inconnu: {fmt} (attendu : {', '.join(FILE_FORMATS)})")
+    msgpack, zstd = _optional("msgpack"), _optional("zstandard")
+    codec, payload = (b"M", msgpack.packb(obj, use_bin_type=True)) if msgpack is not None else (b"J", dumps_json(obj))
+    if zstd is not None:
+        return _BINARY_MAGIC + codec + b"S" + zstd.ZstdCompressor(level=3).compress(payload)
+    return _BINARY_MAGIC + codec + b"Z" + zlib.compress(payload, 6)
+
+def decode_data(data: bytes) -> Any:
+    """Contenu d'un fichier de données, format détecté (JSON compact ou indenté, binaire)."""
+    if not data.startswith(_BINARY_MAGIC):
+        return loads_json(data)
+    codec, compression, body = data[4:5], data[5:6], data[6:]
+    if compression == b"S":
+        zstd = _optional("zstandard")
+        if zstd is None:
+            raise ValueError("Fichier compressé en zstd : le module zstandard est requis pour le lire")
+        payload = zstd.ZstdDecompressor().decompress(body)
+    elif compression == b"Z":
+        payload = zlib.decompress(body)
+    else:
+        raise ValueError("Fichier binaire : compression inconnue")
+    if codec == b"J":
+        return loads_json(payload)
+    msgpack = _optional("msgpack")
+    if codec != b"M" or msgpack is None:
+        raise ValueError("Fichier binaire msgpack : le module msgpack est requis pour le lire")
+    return msgpack.unpackb(payload, raw=False)
+
+def data_format(path: str) -> Optional[str]:
+    """"binary" ou "json" selon l'en-tête du fichier (None s'il n'existe pas)."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(len(_BINARY_MAGIC))
+    except FileNotFoundError:
+        return None
+    return "binary" if head == _BINARY_MAGIC else "json"
+
+def needs_rewrite(path: str) -> bool:
+    """Le fichier existe dans un autre format que FILE_FORMAT (JSON indenté et compact confondus)."""
+    fmt = data_format(path)
+    return fmt is not None and fmt != ("binary" if FILE_FORMAT == "binary" else "json")
+
+# ---------------------------
+# Fichiers utilitaires atomiques
+# ---------------------------
+def _fsync_dir(path: str) -> None:
+    """Rend durable un os.replace (POSIX ; sans effet sous Windows)."""
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _file_signature(path: str) -> Optional[tuple]:
+    """(mtime_ns, taille) du fichier, ou None s'il n'existe pas."""
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+def atomic_write(path: str, obj: Any, fmt: Optional[str] = None) -> None:
+    """Écrit `obj` au format `fmt` (FILE_FORMAT par défaut) puis remplace `path` d'un coup."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode_data(obj, fmt))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+    get_json_cache().invalidate(path)
+
+# ---------------------------
+# Cache des fichiers JSON (partagé par toutes les sessions, vues en lecture seule)
+# ---------------------------
+def _read_only(*_args, **_kwargs):
+    raise TypeError("Donnée en lecture seule (cache) : en faire une copie avant de la modifier")
+
+class ReadOnlyDict(dict):
+    """dict non modifiable (toujours utilisable par json, pandas, st.json...)."""
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _read_only
+
+    def __reduce__(self):
+        return (ReadOnlyDict, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+class ReadOnlyList(list):
+    """list non modifiable."""
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return (ReadOnlyList, (list(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+def freeze_json(obj: Any) -> Any:
+    """Convertit récursivement listes / dicts JSON en vues en lecture seule."""
+    if isinstance(obj, dict):
+        return ReadOnlyDict((k, freeze_json(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return ReadOnlyList(freeze_json(v) for v in obj)
+    return obj
+
+class JsonFileCache:
+    """
+    Cache des fichiers JSON parsés, clé = chemin, validité = signature (mtime_ns, taille).
+    Invalidé par atomic_write ; une écriture d'un autre processus change la
+    signature et provoque une relecture.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str) -> Any:
+        sig = _file_signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if sig is not None and entry is not None and entry[0] == sig:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        if sig is None:
+            self.invalidate(path)
+            return None
+        obj = freeze_json(_read_json_file(path))
+        with self._lock:
+            self._entries[path] = (sig, obj)
+        return obj
+
+    def invalidate(self, path: str) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+_JSON_CACHE = JsonFileCache()
+
+def get_json_cache() -> JsonFileCache:
+    """Cache unique du processus (survit aux reruns Streamlit)."""
+    return _JSON_CACHE
+
+def json_cache_stats() -> Dict[str, int]:
+    """Compteurs hits / misses / entrées du cache load_json."""
+    return get_json_cache().stats()
+
+class FileLock:
+    """
+    Verrou exclusif inter-processus sur un fichier .lock (flock / msvcrt),
+    réentrant pour le thread qui le détient.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tlock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def __enter__(self) -> "FileLock":
+        self._tlock.acquire()
+        if self._depth == 0:
+            try:
+                fh = open(self.path, "a+b")
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                else:
+                    fh.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue   # LK_LOCK abandonne après ~10 s : on réessaie
+            except BaseException:
+                self._tlock.release()
+                raise
+            self._fh = fh
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            self._fh.close()
+            self._fh = None
+        self._tlock.release()
+
+@profiled("json.parse")
+def _read_json_file(path: str) -> Any:
+    """Lecture brute (sans cache, format détecté) ; None si le fichier n'existe pas."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return decode_data(data)
+
+def load_json(path: str) -> Any:
+    """
+    Lecture via le cache process-wide (JsonFileCache) : le fichier n'est re-parsé
+    que si sa signature a changé. Le résultat est une vue en lecture seule
+    (ReadOnlyList / ReadOnlyDict) : copier avant de modifier.
+    """
+    return get_json_cache().get(path)
+
+def ensure_data_files():
+    """Crée DATA_DIR et les fichiers JSON manquants (appelé à l'ouverture du backend, jamais à l'import)."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    if not os.path.exists(FILES["bon_travail"]):
+        atomic_write(FILES["bon_travail"], [])
+    if not os.path.exists(FILES["liste_pdr"]):
+        atomic_write(FILES["liste_pdr"], [])
+    if not os.path.exists(FILES["users"]):
+        atomic_write(FILES["users"], [])
+    if not os.path.exists(FILES["options_description_probleme"]):
+        atomic_write(FILES["options_description_probleme"], INITIAL_DESCRIPTIONS.copy())
+    if not os.path.exists(FILES["options_poste_de_charge"]):
+        atomic_write(FILES["options_poste_de_charge"], INITIAL_POSTES.copy())
+
+
+def read_options(name: str) -> List[str]:
+    path = FILES.get(name)
+    if path and os.path.exists(path):
+        return list(load_json(path) or [])
+    return []
+
+def write_options(name: str, opts: List[str]):
+    path = FILES.get(name)
+    if path:
+        atomic_write(path, opts)
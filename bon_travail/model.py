@@ -0,0 +1,301 @@
+"""
+Modèle de données : colonnes des bons et des PDR, listes initiales, avancement.
+"""
+import hashlib
+import sys
+from collections.abc import Mapping
+from datetime import datetime, date
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+from typing import Iterator, List, Dict, Any
+
+import pandas as pd
+
+# ---------- Helpers : normalisation dates & sanitization ----------
+def _to_date_obj(val):
+    """
+    Retourne un datetime.date à partir de:
+      - datetime.date (retourné tel quel)
+      - datetime.datetime (on prend .date())
+      - str (formats courants : 'YYYY-MM-DD' ou 'YYYY/MM/DD')
+      - None / autre -> date.today()
+    """
+    if isinstance(val, date) and not isinstance(val, datetime):
+        return val
+    if isinstance(val, datetime):
+        return val.date()
+    if isinstance(val, str):
+        for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y"):
+            try:
+                return datetime.strptime(val, fmt).date()
+            except Exception:
+                pass
+    return date.today()
+
+def _sanitize_row_for_storage(row: dict) -> dict:
+    """
+    Transforme toute valeur date/datetime en string 'YYYY-MM-DD' pour éviter
+    erreurs de sérialisation JSON lors de l'écriture en fichier / base.
+    """
+    sanitized = {}
+    for k, v in row.items():
+        if isinstance(v, (datetime, date)):
+            sanitized[k] = v.strftime("%Y-%m-%d")
+        else:
+            sanitized[k] = v
+    return sanitized
+
+# ---------------------------
+# Listes initiales (options du formulaire)
+# ---------------------------
+# Initial values (copiées depuis ta Version Final)
+INITIAL_DESCRIPTIONS = [
+    'P.M.I.01-Panne au niveau du capos',"P.M.I.02-problème d'éjecteur de moule",'P.M.I.03-Blocage  moule',
+    'P.M.I.04-Problème de tiroir','P.M.I.05-Cassure vis sortie plaque carotte','P.M.I.06-Blocage de la plaque carotte',
+    'P.M.I.07-Vis de noyaux endommagé','P.M.I.08-Problème noyau',"P.M.I.09-Problème vis d'injection",'P.M.I.10-Réducteur',
+    'P.M.I.11-Roue dentée ','P.M.I.12-PB grenouillère','P.M.I.13-Vis de pied endommagé','P.M.I.14-Colonnes de guidage ',
+    "P.M.I.15-Fuite matiére au niveau de la buse d'injection",
+    'P.E.I.01-PB capteur ','P.E.I.02-PB galet (fin de course)','P.E.I.03-PB moteur électrique','P.E.I.04-Capteur linéaire',
+    'P.E.I.05-Armoire électrique ','P.E.I.06-Écran/tactile',"P.E.I.07-Machine s'allume pas","P.E.I.08-PB d'électrovanne",
+    'P.E.I.09-PB connecteur ','P.E.I.10-Système magnétique',
+    'P.H.I.01-PB flexible','P.H.I.02-PB raccord','P.H.I.03-PB vérin','P.H.I.04-PB distributeur','P.H.I.05-PB pompe',
+    'P.H.I.06-PB filtre','P.H.I.07-PB au niveau huile','P.H.I.08-PB fuite huile','P.H.I.09-PB préchauffage',
+    'P.H.I.10-PB lubrification du canalisation de grenouillère',
+    'P.P.I.01-PB de pression','P.P.I.02-Remplissage matière ','P.P.I.03-Alimentation matiére ',
+    'P.P.I.04-Flexible pneumatique','P.P.I.05-PB raccord',
+    'P.T.I.01-PB collier chauffante','P.T.I.02-PB de thermocouple','P.T.I.03-Zone de chauffage en arrêt',
+    'P.T.I.04-PB refroidisseur',"P.T.I.05-PB pression d'eau",'P.T.I.06-PB température sécheur',
+    'P.T.I.07-Variation de la température (trop élever/trop bas )'
+]
+
+INITIAL_POSTES = [
+    'ASL011','ASL021','ASL031','ASL041','ASL051','ASL061','ASL071',
+    'ASL012','ASL022','ASL032','ASL042','ASL052','ASL062','ASL072',
+    'ACL011','ACL021','ACL031','ACL041','ACL051','ACL061','ACL071','APCL011','APCL021','APCL031',
+    'CL350-01 HOUSING','CL350-02 HOUSING','CL350-03 BRAKET ','CL120-01 SUR MOULAGE (LEVIET)','CL120-02 SUR MOULAGE (LEVIET)',
+    'M. Shifter Ball', 'M. Knob clip-lever MA','M. Knob clip-lever MB6', 'M. Guides for trigger', 'M. Damper',
+    'M. MB6-HIGH HOUSING', 'M. MB6-LOW HOUSING','M. MA-HIGH HOUSING', 'M. MA-LOW HOUSING', 'M. BRAKET MA'
+]
+
+# ---------------------------
+# Hash mot de passe
+# ---------------------------
+def hash_password(pwd: str) -> str:
+    return hashlib.sha256((pwd or "").encode("utf-8")).hexdigest()
+
+# ---------------------------
+# CRUD Bons (colonnes originales)
+# ---------------------------
+BON_COLUMNS = [
+    "code","date","arret_declare_par","poste_de_charge","heure_declaration","machine_arreter",
+    "heure_debut_intervention","heure_fin_intervention","technicien","description_probleme",
+    "action","pdr_utilisee","observation","resultat","condition_acceptation","dpt_maintenance","dpt_qualite","dpt_production"
+]
+
+def compute_progress(bon: Dict[str, Any]) -> int:
+    """
+    Retourne un pourcentage d'avancement (int 0..100) basé sur les colonnes:
+      dpt_production, dpt_maintenance, dpt_qualite (logique inchangée mais sécurisée).
+    - 100% si les 3 dpt == "Valider"
+    - Sinon, % = (nombre de champs non vides parmi BON_COLUMNS / len(BON_COLUMNS)) * 100
+      (les clés hors BON_COLUMNS ne sont pas comptées)
+    Toujours renvoie un int entre 0 et 100.
+    """
+    try:
+        # Si les 3 validations sont 'Valider' => 100%
+        if bon.get("dpt_production") == "Valider" and \
+           bon.get("dpt_maintenance") == "Valider" and \
+           bon.get("dpt_qualite") == "Valider":
+            return 100
+
+        # Comptage sécurisé des champs non vides
+        filled = sum(1 for k in BON_COLUMNS if bon.get(k) not in ("", None))
+        progress = filled * 100 // len(BON_COLUMNS)
+
+        # Borner la valeur entre 0 et 100
+        return max(0, min(100, progress))
+    except Exception:
+        # En cas d'erreur imprévue, retourner 0 (sécurité)
+        return 0
+
+def compute_progress_frame(df: pd.DataFrame) -> pd.Series:
+    """Version vectorisée de compute_progress sur un DataFrame (colonnes BON_COLUMNS uniquement)."""
+    if df.empty:
+        return pd.Series([], index=df.index, dtype="int64")
+    cols = df.reindex(columns=BON_COLUMNS)
+    filled = (cols.notna() & cols.ne("")).sum(axis=1)
+    progress = (filled * 100 // len(BON_COLUMNS)).clip(0, 100)
+    validated = (cols[["dpt_production", "dpt_maintenance", "dpt_qualite"]] == "Valider").all(axis=1)
+    return progress.where(~validated, 100).astype("int64")
+
+# en dessous, la construction d'un DataFrame coûte plus que le calcul ligne à ligne
+_PROGRESS_FRAME_MIN_ROWS = 64
+
+def compute_progress_rows(rows: List[Dict[str, Any]]) -> List[int]:
+    """compute_progress de chaque ligne : ligne à ligne pour quelques bons, vectorisé au-delà."""
+    if len(rows) < _PROGRESS_FRAME_MIN_ROWS:
+        return [compute_progress(r) for r in rows]
+    return compute_progress_frame(pd.DataFrame(rows, columns=BON_COLUMNS)).tolist()
+
+# ---------------------------
+# Bon en mémoire : enregistrement compact (store JSON)
+# ---------------------------
+# Colonnes à faible cardinalité (listes du formulaire, statuts, personnes) :
+# valeurs internées dans BonRecord, dtype "category" dans les DataFrames d'analyse
+CATEGORICAL_COLUMNS = ("poste_de_charge", "description_probleme", "technicien", "arret_declare_par",
+                       "machine_arreter", "resultat", "condition_acceptation",
+                       "dpt_maintenance", "dpt_qualite", "dpt_production")
+# Heures saisies (HH:MM) et pièces utilisées : peu de valeurs distinctes, internées aussi
+_INTERNED = CATEGORICAL_COLUMNS + ("heure_declaration", "heure_debut_intervention", "heure_fin_intervention",
+                                   "pdr_utilisee")
+_INTERNED_POS = tuple(BON_COLUMNS.index(c) for c in _INTERNED)
+_DATE_POS = BON_COLUMNS.index("date")
+_FIELDS = frozenset(BON_COLUMNS)
+_ITEMS = itemgetter(*BON_COLUMNS)
+_ABSENT = object()          # colonne absente du dict d'origine (fichiers anciens)
+_ORDINALS: Dict[str, int] = {}
+
+def _date_ordinal(value: Any) -> Any:
+    """'YYYY-MM-DD' -> ordinal (int partagé entre les lignes) ; toute autre valeur est gardée telle quelle."""
+    o = _ORDINALS.get(value) if value.__class__ is str else None
+    if o is None and value.__class__ is str and len(value) == 10:
+        try:
+            d = date.fromisoformat(value)
+        except ValueError:
+            return value
+        if d.isoformat() != value:
+            return value    # forme ISO tolérée par fromisoformat mais pas au format de stockage
+        o = _ORDINALS[value] = d.toordinal()
+    return value if o is None else o
+
+@lru_cache(maxsize=65536)
+def _iso_date(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+class BonRecord(Mapping):
+    """
+    Bon tel que le garde le store JSON : un slot par colonne de BON_COLUMNS au lieu
+    d'un dict à 18 clés (~180 octets par ligne hors valeurs, contre ~1,2 Ko).
+    - valeurs des colonnes à faible cardinalité internées (sys.intern) : une seule
+      chaîne par poste, type de problème, statut, heure... pour tout le store
+    - date au format de stockage gardée en ordinal (date.toordinal), rendue en
+      'YYYY-MM-DD' à la lecture ; une date non conforme est gardée telle quelle
+    - colonnes absentes et clés hors BON_COLUMNS conservées (_extra) : to_dict()
+      rend exactement le dict d'origine
+    Interface Mapping en lecture seule (get, [], in, items) : index, requêtes et
+    rollups le lisent comme un dict. Conversions : from_dict / to_dict (formulaire,
+    load_bon_into_session, JSON), export_values() (export Excel, ordre BON_COLUMNS).
+    Un enregistrement n'est jamais modifié : replace() en construit un nouveau.
+    """
+    __slots__ = tuple(BON_COLUMNS) + ("_extra",)
+
+    def __init__(self, code, date, arret_declare_par, poste_de_charge, heure_declaration, machine_arreter,
+                 heure_debut_intervention, heure_fin_intervention, technicien, description_probleme,
+                 action, pdr_utilisee, observation, resultat, condition_acceptation, dpt_maintenance,
+                 dpt_qualite, dpt_production, _extra=None):
+        self.code = code
+        self.date = date
+        self.arret_declare_par = arret_declare_par
+        self.poste_de_charge = poste_de_charge
+        self.heure_declaration = heure_declaration
+        self.machine_arreter = machine_arreter
+        self.heure_debut_intervention = heure_debut_intervention
+        self.heure_fin_intervention = heure_fin_intervention
+        self.technicien = technicien
+        self.description_probleme = description_probleme
+        self.action = action
+        self.pdr_utilisee = pdr_utilisee
+        self.observation = observation
+        self.resultat = resultat
+        self.condition_acceptation = condition_acceptation
+        self.dpt_maintenance = dpt_maintenance
+        self.dpt_qualite = dpt_qualite
+        self.dpt_production = dpt_production
+        self._extra = _extra    # None, ou {clé hors BON_COLUMNS: valeur} si le dict n'avait pas la forme standard
+
+    @classmethod
+    def from_dict(cls, row: Dict[str, Any]) -> "BonRecord":
+        if row.__class__ is cls:
+            return row
+        try:
+            values = list(_ITEMS(row))
+            extra = {k: v for k, v in row.items() if k not in _FIELDS} if len(row) != len(BON_COLUMNS) else None
+        except KeyError:
+            values = [row.get(k, _ABSENT) for k in BON_COLUMNS]
+            extra = {k: v for k, v in row.items() if k not in _FIELDS}
+        for i in _INTERNED_POS:
+            v = values[i]
+            if v.__class__ is str:
+                values[i] = sys.intern(v)
+        values[_DATE_POS] = _date_ordinal(values[_DATE_POS])
+        return cls(*values, extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Bon sous forme de dict (nouveau à chaque appel, modifiable par l'appelant)."""
+        row = dict(zip(BON_COLUMNS, _VALUES(self)))
+        if self.date.__class__ is int:
+            row["date"] = _iso_date(self.date)
+        if self._extra is not None:
+            for k in [k for k, v in row.items() if v is _ABSENT]:
+                del row[k]
+            row.update(self._extra)
+        return row
+
+    def export_values(self) -> tuple:
+        """Valeurs dans l'ordre de BON_COLUMNS, None et colonnes absentes -> ""."""
+        values = ["" if v is None or v is _ABSENT else v for v in _VALUES(self)]
+        if self.date.__class__ is int:
+            values[_DATE_POS] = _iso_date(self.date)
+        return tuple(values)
+
+    def replace(self, changes: Dict[str, Any]) -> "BonRecord":
+        """Copie du bon avec `changes` appliqués."""
+        return BonRecord.from_dict({**self.to_dict(), **changes})
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELDS:
+            v = getattr(self, key)
+            if v is _ABSENT:
+                return default
+            if key == "date" and v.__class__ is int:
+                return _iso_date(v)
+            return v
+        return self._extra.get(key, default) if self._extra else default
+
+    def __getitem__(self, key: str) -> Any:
+        v = self.get(key, _ABSENT)
+        if v is _ABSENT:
+            raise KeyError(key)
+        return v
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _ABSENT) is not _ABSENT
+
+    def __iter__(self) -> Iterator[str]:
+        for k in BON_COLUMNS:
+            if getattr(self, k) is not _ABSENT:
+                yield k
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __reduce__(self):
+        return (BonRecord.from_dict, (self.to_dict(),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        return f"BonRecord({self.to_dict()!r})"
+
+_VALUES = attrgetter(*BON_COLUMNS)
+
+# ---------------------------
+# Catalogue PDR (quantite = stock courant)
+# ---------------------------
+PDR_COLUMNS = ["code","remplacement","nom_composant","quantite"]
@@ -0,0 +1,100 @@
+"""
+Instrumentation des reruns : durée (et allocation) par section, relevés en JSONL.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Any, Optional
+
+from .config import FILES, PROFILE_MAX_BYTES, PROFILE_TRACEMALLOC
+
+class Profiler:
+    """
+    Relevé du rerun en cours (thread du script Streamlit) :
+    - section(name) / @profiled(name) cumulent durée, nombre d'appels et, avec
+      tracemalloc, allocation nette par nom de section (sections imbriquées : durées inclusives)
+    - hors rerun (thread écrivain, benchmarks, scripts) : appel direct, sans mesure
+    - end_run() renvoie le relevé et l'ajoute (une ligne JSON) à profile.jsonl
+    """
+
+    def __init__(self, path: str, use_tracemalloc: bool = False):
+        self.path = path
+        self.use_tracemalloc = use_tracemalloc
+        self._local = threading.local()
+        self._file_lock = threading.Lock()
+
+    def begin_run(self, user: str = "") -> None:
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()   # au premier rerun mesuré, pas à l'import
+        self._local.run = {"ts": datetime.now().isoformat(timespec="seconds"), "user": user or "",
+                           "t0": time.perf_counter(), "sections": {}}
+        self._local.depth = 0
+
+    @contextmanager
+    def section(self, name: str):
+        run = getattr(self._local, "run", None)
+        if run is None:
+            yield
+            return
+        mem0 = tracemalloc.get_traced_memory()[0] if self.use_tracemalloc else 0
+        depth = self._local.depth
+        self._local.depth = depth + 1
+        # créée à l'entrée : une section apparaît avant les sections qu'elle contient
+        s = run["sections"].setdefault(name, {"name": name, "depth": depth, "calls": 0, "ms": 0.0, "kb": 0.0})
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            s["calls"] += 1
+            s["ms"] += (time.perf_counter() - t0) * 1000
+            if self.use_tracemalloc:
+                s["kb"] += (tracemalloc.get_traced_memory()[0] - mem0) / 1024
+
+    def profiled(self, name: Optional[str] = None):
+        """Décorateur : la fonction est mesurée comme une section (nom par défaut : son nom)."""
+        def deco(fn):
+            label = name or fn.__name__
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if getattr(self._local, "run", None) is None:
+                    return fn(*args, **kwargs)
+                with self.section(label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return deco
+
+    def end_run(self, page: str = "") -> Optional[Dict[str, Any]]:
+        run = getattr(self._local, "run", None)
+        if run is None:
+            return None
+        self._local.run = None
+        rec = {"ts": run["ts"], "user": run["user"], "page": page,
+               "total_ms": round((time.perf_counter() - run["t0"]) * 1000, 2),
+               "tracemalloc": self.use_tracemalloc,
+               "sections": [dict(s, ms=round(s["ms"], 2), kb=round(s["kb"], 1))
+                            for s in run["sections"].values()]}
+        try:
+            self._append(rec)
+        except OSError:
+            pass   # diagnostic : ne jamais faire échouer la page
+        return rec
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        line = json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._file_lock:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > PROFILE_MAX_BYTES:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+# Profiler unique du processus : le module reste dans sys.modules d'un rerun à
+# l'autre, le backend, les stores et le rerun courant voient donc le même
+PROFILER = Profiler(FILES["profile"], PROFILE_TRACEMALLOC)
+profiled = PROFILER.profiled
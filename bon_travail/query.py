@@ -0,0 +1,342 @@
+"""
+Requêtes sur les bons : index de recherche (trigrammes, plein texte), BonQuery, rollups Pareto.
+"""
+import heapq
+import itertools
+import math
+import re
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Iterable
+
+# ---------------------------
+# Index de recherche (panneau Recherche & Liste)
+# ---------------------------
+# Champs couverts par l'index de recherche "contient" (panneau Recherche & Liste)
+SEARCH_INDEX_FIELDS = ("code", "date", "poste_de_charge", "dpt_production", "dpt_maintenance", "dpt_qualite")
+
+def _trigrams(value: str) -> set:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+_DATE_PREFIX = re.compile(r"^\d{4}(-\d{0,2}(-\d{0,2})?)?$")
+
+def _prefix_upper(prefix: str) -> str:
+    """Plus petite chaîne supérieure à toutes celles qui commencent par `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else ""
+
+def date_query(term: str) -> Optional[tuple]:
+    """
+    Requête de date -> bornes (début inclus, fin exclue ; "" = non borné) :
+      "2026-01-15" exacte / "2026-01" préfixe / "2026-01-01..2026-02-15" intervalle inclusif.
+    None si le terme n'est pas une requête de date (recherche "contient" classique).
+    """
+    term = (term or "").strip()
+    if ".." in term:
+        lo, hi = (t.strip() for t in term.split("..", 1))
+        if all(not t or _DATE_PREFIX.match(t) for t in (lo, hi)) and (lo or hi):
+            return lo, _prefix_upper(hi)
+        return None
+    if _DATE_PREFIX.match(term):
+        return term, _prefix_upper(term)
+    return None
+
+class SearchIndex:
+    """
+    Index de la recherche "contient" (insensible à la casse), par champ :
+    valeur distincte (minuscules) -> rids, et trigramme -> valeurs distinctes.
+    Un terme de 3 caractères ou plus ne vérifie que les valeurs qui contiennent
+    tous ses trigrammes ; les valeurs distinctes sont peu nombreuses (postes, statuts).
+    """
+
+    def __init__(self, fields: tuple = SEARCH_INDEX_FIELDS):
+        self.values: Dict[str, Dict[str, Dict[int, None]]] = {f: {} for f in fields}
+        self.grams: Dict[str, Dict[str, set]] = {f: {} for f in fields}
+
+    @staticmethod
+    def _key(row: Dict[str, Any], field: str) -> str:
+        v = row.get(field)
+        return "" if v is None else str(v).lower()
+
+    def add(self, rid: int, row: Dict[str, Any]) -> None:
+        for f, values in self.values.items():
+            v = self._key(row, f)
+            bucket = values.get(v)
+            if bucket is None:
+                bucket = values[v] = {}
+                grams = self.grams[f]
+                for g in _trigrams(v):
+                    grams.setdefault(g, set()).add(v)
+            bucket[rid] = None
+
+    def remove(self, rid: int, row: Dict[str, Any]) -> None:
+        for f, values in self.values.items():
+            v = self._key(row, f)
+            bucket = values.get(v)
+            if bucket is None:
+                continue
+            bucket.pop(rid, None)
+            if not bucket:
+                del values[v]
+                grams = self.grams[f]
+                for g in _trigrams(v):
+                    vs = grams.get(g)
+                    if vs is not None:
+                        vs.discard(v)
+                        if not vs:
+                            del grams[g]
+
+    def lookup(self, field: str, term: str) -> set:
+        """rids dont `field` contient `term` (déjà en minuscules)."""
+        values = self.values[field]
+        if len(term) >= 3:
+            grams = self.grams[field]
+            sets = sorted((grams.get(g, set()) for g in _trigrams(term)), key=len)
+            candidates = set.intersection(*sets) if sets[0] else set()
+        else:
+            candidates = values.keys()
+        rids: set = set()
+        for v in candidates:
+            if term in v:
+                rids.update(values[v])
+        return rids
+
+# Champs en texte libre couverts par la recherche plein texte classée (BM25)
+FULLTEXT_FIELDS = ("action", "observation", "condition_acceptation", "arret_declare_par")
+FULLTEXT_STOPWORDS = frozenset(
+    "au aux avec ce ces dans de des du en est et il la le les leur mais ne ou par pas pour "
+    "qui que sa se ses son sur un une".split()
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def fold_text(text: Any) -> str:
+    """Texte en minuscules sans accents ("Défaillant" -> "defaillant")."""
+    if text is None:
+        return ""
+    folded = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(ch for ch in folded if not unicodedata.combining(ch))
+
+def tokenize(text: Any) -> List[str]:
+    """Mots indexés d'un texte (sans accents ni casse, mots vides et lettres isolées retirés)."""
+    return [t for t in _TOKEN_RE.findall(fold_text(text)) if len(t) > 1 and t not in FULLTEXT_STOPWORDS]
+
+class FullTextIndex:
+    """
+    Index inversé des FULLTEXT_FIELDS (un document par bon) avec classement BM25.
+    Une requête ne parcourt que les listes des termes demandés, pas les lignes.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, fields: tuple = FULLTEXT_FIELDS):
+        self.fields = fields
+        self.postings: Dict[str, Dict[int, int]] = {}   # terme -> rid -> fréquence
+        self.doc_len: Dict[int, int] = {}
+        self.total_len = 0
+
+    def _terms(self, row: Dict[str, Any]) -> List[str]:
+        return [t for f in self.fields for t in tokenize(row.get(f))]
+
+    def add(self, rid: int, row: Dict[str, Any]) -> None:
+        terms = self._terms(row)
+        if not terms:
+            return
+        for t in terms:
+            posting = self.postings.setdefault(t, {})
+            posting[rid] = posting.get(rid, 0) + 1
+        self.doc_len[rid] = len(terms)
+        self.total_len += len(terms)
+
+    def remove(self, rid: int, row: Dict[str, Any]) -> None:
+        n = self.doc_len.pop(rid, None)
+        if n is None:
+            return
+        self.total_len -= n
+        for t in set(self._terms(row)):
+            posting = self.postings.get(t)
+            if posting is not None:
+                posting.pop(rid, None)
+                if not posting:
+                    del self.postings[t]
+
+    def query(self, text: str, k: int = 20) -> List[tuple]:
+        """[(rid, score)] des k meilleurs documents pour `text`, score décroissant."""
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return []
+        base = self.K1 * (1 - self.B)
+        per_len = self.K1 * self.B * n_docs / self.total_len
+        doc_len = self.doc_len
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for t in set(tokenize(text)):
+            posting = self.postings.get(t)
+            if not posting:
+                continue
+            weight = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5)) * (self.K1 + 1)
+            for rid, tf in posting.items():
+                scores[rid] = get(rid, 0.0) + weight * tf / (tf + base + per_len * doc_len[rid])
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+# ---------------------------
+# Requêtes composables sur les bons (pages, dashboard, export)
+# ---------------------------
+DPT_FIELDS = ("dpt_production", "dpt_maintenance", "dpt_qualite")
+
+def _text(val: Any) -> str:
+    return "" if val is None else str(val)
+
+class BonQuery:
+    """
+    Requête sur les bons : prédicats combinés en ET, tri, décalage et limite.
+    Les méthodes renvoient la requête (chaînage) :
+        BonQuery().in_("poste_de_charge", ["ASL011"]).date_between("2026-01-01", "2026-01-31")
+                  .not_validated("dpt_qualite").order("date", descending=True).limit(50)
+    Le store choisit l'index le plus sélectif (voir explain_query) ; les autres
+    prédicats sont vérifiés ligne à ligne sur les candidats.
+    """
+
+    def __init__(self):
+        self.predicates: List[tuple] = []   # (op, champ(s), argument)
+        self.order_by: Optional[str] = None
+        self.descending = False
+        self.offset_n = 0
+        self.limit_n: Optional[int] = None
+
+    # --- prédicats ---
+    def eq(self, field: str, value: Any) -> "BonQuery":
+        self.predicates.append(("eq", field, _text(value)))
+        return self
+
+    def in_(self, field: str, values: Iterable[Any]) -> "BonQuery":
+        self.predicates.append(("in", field, frozenset(_text(v) for v in values)))
+        return self
+
+    def prefix(self, field: str, prefix: str) -> "BonQuery":
+        return self.range(field, prefix, _prefix_upper(prefix)) if prefix else self
+
+    def range(self, field: str, lo: str = "", hi: str = "") -> "BonQuery":
+        """lo <= valeur < hi (bornes vides = non bornées) ; les valeurs vides sont exclues."""
+        self.predicates.append(("range", field, (lo or "", hi or "")))
+        return self
+
+    def date_between(self, date_from: str = "", date_to: str = "") -> "BonQuery":
+        """Dates (YYYY-MM-DD) comprises entre date_from et date_to inclus."""
+        if not date_from and not date_to:
+            return self
+        return self.range("date", date_from, _prefix_upper(date_to))
+
+    def contains(self, fields: Any, term: str) -> "BonQuery":
+        """L'un des `fields` contient `term` (insensible à la casse)."""
+        fields = (fields,) if isinstance(fields, str) else tuple(fields)
+        term = (term or "").lower()
+        if term:
+            self.predicates.append(("contains", fields, term))
+        return self
+
+    def not_validated(self, field: str) -> "BonQuery":
+        """Département pas encore validé (valeur différente de "Valider")."""
+        self.predicates.append(("not_validated", field, "Valider"))
+        return self
+
+    # --- tri / pagination ---
+    def order(self, field: str, descending: bool = False) -> "BonQuery":
+        self.order_by, self.descending = field, descending
+        return self
+
+    def offset(self, n: int) -> "BonQuery":
+        self.offset_n = max(0, int(n))
+        return self
+
+    def limit(self, n: Optional[int]) -> "BonQuery":
+        self.limit_n = None if n is None else max(0, int(n))
+        return self
+
+    # --- évaluation ---
+    def matches(self, row: Dict[str, Any]) -> bool:
+        for op, field, arg in self.predicates:
+            if op == "contains":
+                if not any(arg in _text(row.get(f)).lower() for f in field):
+                    return False
+                continue
+            v = _text(row.get(field))
+            if op == "eq":
+                ok = v == arg
+            elif op == "in":
+                ok = v in arg
+            elif op == "range":
+                lo, hi = arg
+                ok = bool(v) and v >= lo and (not hi or v < hi)
+            else:   # not_validated
+                ok = v != arg
+            if not ok:
+                return False
+        return True
+
+    def describe(self) -> str:
+        parts = []
+        for op, field, arg in self.predicates:
+            if op == "in":
+                arg = sorted(arg)
+            parts.append(f"{op}({', '.join(field) if isinstance(field, tuple) else field}, {arg!r})")
+        if self.order_by:
+            parts.append(f"order({self.order_by}{' desc' if self.descending else ''})")
+        if self.offset_n:
+            parts.append(f"offset({self.offset_n})")
+        if self.limit_n is not None:
+            parts.append(f"limit({self.limit_n})")
+        return " ; ".join(parts) or "tous les bons"
+
+# ---------------------------
+# Rollups Pareto (comptes par bucket, maintenus à chaque écriture)
+# ---------------------------
+ROLLUP_DIMENSIONS = ("day", "week", "month", "description_probleme", "poste_de_charge")
+
+@lru_cache(maxsize=8192)
+def _date_buckets(val: str) -> tuple:
+    """Buckets jour / semaine ISO / mois d'une date stockée ; () si la date est invalide."""
+    s = val.strip()[:10]
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y"):
+        try:
+            d = datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+        year, week, _ = d.isocalendar()
+        return (("day", d.strftime("%Y-%m-%d")), ("week", f"{year}-W{week:02d}"), ("month", d.strftime("%Y-%m")))
+    return ()
+
+def _sort_key(val: Any) -> str:
+    """Clé de tri d'une valeur de bon (comme le tri pandas sur des chaînes, None en tête)."""
+    return "" if val is None else str(val)
+
+def rollup_keys(row: Dict[str, Any]) -> tuple:
+    """(dimension, bucket) auxquels une ligne contribue."""
+    desc = row.get("description_probleme")
+    poste = row.get("poste_de_charge")
+    return _date_buckets(str(row.get("date") or "")) + (
+        ("description_probleme", "" if desc is None else str(desc)),
+        ("poste_de_charge", "" if poste is None else str(poste)),
+    )
+
+# Versions des données de bons : uniques dans le processus, changent à chaque ligne modifiée
+_BON_VERSIONS = itertools.count(1)
+
+class BonRollups:
+    """Comptes matérialisés par dimension de ROLLUP_DIMENSIONS, mis à jour ligne par ligne."""
+
+    def __init__(self, counts: Optional[Dict[str, Dict[str, int]]] = None):
+        counts = counts or {}
+        self.counts: Dict[str, Dict[str, int]] = {d: dict(counts.get(d, {})) for d in ROLLUP_DIMENSIONS}
+
+    def add(self, row: Dict[str, Any], sign: int = 1) -> None:
+        for dim, key in rollup_keys(row):
+            bucket = self.counts[dim]
+            n = bucket.get(key, 0) + sign
+            if n > 0:
+                bucket[key] = n
+            else:
+                bucket.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {d: dict(c) for d, c in self.counts.items()}
+
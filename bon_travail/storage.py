@@ -0,0 +1,2089 @@
+"""
+Stockage des bons, du stock PDR et des utilisateurs : store JSON indexé (snapshot
++ journal append-only), backend SQLite, écrivain unique (group commit).
+"""
+import bisect
+import gzip
+import heapq
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, date
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator
+
+import pandas as pd
+
+from .config import (FILES, SQLITE_PATH, JOURNAL_COMPACT_THRESHOLD, GROUP_COMMIT_WINDOW_MS,
+                     GROUP_COMMIT_MAX_BATCH, ARCHIVE_CACHE_PARTITIONS)
+from .columnar import ColumnarSnapshot, ColumnarStore, build_frame, encode_rows
+from .jsonio import (ReadOnlyDict, FileLock, atomic_write, load_json, encode_data, dumps_json, loads_json,
+                     data_format, needs_rewrite, _file_signature, _fsync_dir, _read_json_file)
+from .model import BON_COLUMNS, PDR_COLUMNS, BonRecord, compute_progress, compute_progress_frame, compute_progress_rows
+from .query import (SEARCH_INDEX_FIELDS, FULLTEXT_FIELDS, SearchIndex, FullTextIndex, BonQuery, BonRollups,
+                    tokenize, fold_text, _sort_key, _BON_VERSIONS)
+
+# ---------------------------
+# Store indexé des bons (évite de relire / rescanner le JSON à chaque appel)
+# ---------------------------
+BON_INDEXED_FIELDS = ("date", "poste_de_charge", "technicien")
+
+def _file_size(path: str) -> int:
+    sig = _file_signature(path)
+    return sig[1] if sig else 0
+
+def _normalize_bon_values(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Convertit les date/datetime en 'YYYY-MM-DD' (format de stockage)."""
+    out = {}
+    for k, v in values.items():
+        if isinstance(v, (datetime, date)):
+            v = v.strftime("%Y-%m-%d")
+        out[k] = v
+    return out
+
+# ---------------------------
+# Stock PDR : catalogue indexé par code + registre des mouvements
+# ---------------------------
+# Types de mouvement de stock
+PDR_MOVEMENT_KINDS = ("consommation", "reappro", "ajustement")
+
+class PdrLedger:
+    """
+    Stock des PDR (backend json), tenu par le BonStore : les enregistrements PDR
+    passent par le journal des bons, si bien que la consommation d'une pièce est
+    écrite dans LE MÊME enregistrement que le bon qui la consomme.
+    - catalogue indexé par code (plus de scan linéaire de liste_pdr.json)
+    - stock courant = total cumulé, mis à jour à chaque mouvement (O(1))
+    - chaque mouvement porte le stock résultant (qte) : rejouer le journal est idempotent
+    - liste_pdr.json n'est réécrit qu'avec le snapshot des bons ; les mouvements
+      repliés sont alors ajoutés à pdr_mouvements.jsonl (historique append-only)
+    """
+
+    def __init__(self, path: str, history_path: Optional[str] = None):
+        self.path = path
+        self.history_path = history_path
+        self._items: Dict[str, Dict[str, Any]] = {}   # code -> ligne PDR_COLUMNS (quantite = stock)
+        self._movements: List[Dict[str, Any]] = []    # mouvements pas encore archivés
+
+    def load(self) -> None:
+        self._items = {}
+        self._movements = []
+        for p in _read_json_file(self.path) or []:
+            code = str(p.get("code", "")).strip()
+            if code and code not in self._items:   # première occurrence, comme l'ancien scan
+                self._items[code] = ReadOnlyDict(
+                    {"code": code, "remplacement": p.get("remplacement", ""),
+                     "nom_composant": p.get("nom_composant", ""), "quantite": int(p.get("quantite", 0) or 0)})
+
+    # --- lecture ---
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._items.values())
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        return self._items.get(str(code).strip())
+
+    def stock(self, code: str) -> int:
+        item = self.get(code)
+        return int(item["quantite"]) if item is not None else 0
+
+    def movements(self, code: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Mouvements (archivés + en cours), du plus récent au plus ancien."""
+        seen, out = set(), []
+        archived = []
+        if self.history_path and os.path.exists(self.history_path):
+            with open(self.history_path, "rb") as f:
+                for line in f:
+                    try:
+                        archived.append(loads_json(line))
+                    except ValueError:
+                        continue   # ligne incomplète (archivage interrompu)
+        for mv in reversed(archived + self._movements):
+            # une compaction interrompue peut archiver deux fois le même mouvement
+            if mv.get("id") in seen or (code is not None and mv.get("code") != str(code).strip()):
+                continue
+            seen.add(mv.get("id"))
+            out.append(mv)
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+
+    # --- construction des enregistrements (sous verrou, état à jour) ---
+    def movement(self, code: str, delta: int, kind: str, bon: str = "") -> Optional[Dict[str, Any]]:
+        """Mouvement de `delta` pièces (stock borné à 0) ; None si la PDR n'existe pas."""
+        if kind not in PDR_MOVEMENT_KINDS:
+            raise ValueError(f"Type de mouvement inconnu: {kind}")
+        item = self.get(code)
+        if item is None:
+            return None
+        qte = max(0, int(item["quantite"]) + int(delta))
+        return {"id": os.urandom(8).hex(), "ts": datetime.now().isoformat(timespec="seconds"),
+                "code": item["code"], "delta": qte - int(item["quantite"]), "qte": qte, "kind": kind, "bon": bon}
+
+    @staticmethod
+    def reset_record(arr: List[Dict[str, Any]]) -> Dict[str, Any]:
+        items = [{"code": str(p.get("code", "")).strip(), "remplacement": p.get("remplacement", ""),
+                  "nom_composant": p.get("nom_composant", ""), "quantite": int(p.get("quantite", 0) or 0)}
+                 for p in arr]
+        return {"op": "pdr_reset", "items": [p for p in items if p["code"]]}
+
+    def upsert_record(self, rec: Dict[str, Any]) -> Dict[str, Any]:
+        """Enregistrement de mise à jour du catalogue ; l'écart de quantité devient un ajustement."""
+        code = str(rec["code"]).strip()
+        out = {"op": "pdr", "set": {"code": code, "remplacement": rec.get("remplacement", ""),
+                                    "nom_composant": rec.get("nom_composant", "")}}
+        target = int(rec.get("quantite", 0) or 0)
+        current = self.stock(code)
+        if target != current:
+            out["stock"] = [{"id": os.urandom(8).hex(), "ts": datetime.now().isoformat(timespec="seconds"),
+                             "code": code, "delta": target - current, "qte": target,
+                             "kind": "ajustement", "bon": ""}]
+        return out
+
+    # --- application (rejeu du journal) ---
+    def apply(self, rec: Dict[str, Any]) -> None:
+        op = rec.get("op")
+        if op == "pdr":
+            s = rec["set"]
+            old = self._items.get(s["code"])
+            self._items[s["code"]] = ReadOnlyDict(s, quantite=old["quantite"] if old is not None else 0)
+        elif op == "pdr_delete":
+            self._items.pop(str(rec["code"]).strip(), None)
+        elif op == "pdr_reset":
+            self._items = {}
+            for p in rec["items"]:
+                self._items.setdefault(p["code"], ReadOnlyDict(p))
+        for mv in rec.get("stock", ()):
+            item = self._items.get(mv["code"])
+            if item is not None:
+                self._items[mv["code"]] = ReadOnlyDict(item, quantite=mv["qte"])
+                self._movements.append(mv)
+
+    # --- persistance (appelée par le BonStore, sous verrou) ---
+    def take_movements(self) -> List[Dict[str, Any]]:
+        movements, self._movements = self._movements, []
+        return movements
+
+    def archive(self, movements: List[Dict[str, Any]]) -> None:
+        if not movements or not self.history_path:
+            return
+        payload = b"".join(dumps_json(mv) + b"\n" for mv in movements)
+        with open(self.history_path, "ab") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save(self, items: List[Dict[str, Any]], movements: List[Dict[str, Any]]) -> None:
+        """Archive les mouvements repliés puis écrit le catalogue (avant le snapshot des bons)."""
+        self.archive(movements)
+        atomic_write(self.path, items)
+
+def _record_weight(rec: Dict[str, Any]) -> int:
+    """Poids d'un enregistrement pour le seuil de compaction (un import compte pour ses bons)."""
+    return len(rec.get("bons") or ()) or 1
+
+# ---------------------------
+# Archives mensuelles (mois clos, partitions gzip en lecture seule)
+# ---------------------------
+_MONTH = re.compile(r"^(\d{4}-\d{2})-\d{2}")
+
+def bon_month(row: Dict[str, Any]) -> Optional[str]:
+    """Mois de partition (AAAA-MM) d'un bon ; None si la date n'est pas au format de stockage."""
+    m = _MONTH.match(str(row.get("date") or ""))
+    return m.group(1) if m else None
+
+class BonArchive:
+    """
+    Mois clos sortis du BonStore : une partition par mois (AAAA-MM.json.gz, gzip,
+    lecture seule) avec les bons et leur avancement.
+    - le manifeste (petit, relu si sa signature change) donne pour chaque mois le
+      nombre de bons, les bornes de dates, la somme des avancements et les rollups :
+      comptes, moyenne et Pareto couvrent tout l'historique sans lire de partition
+    - une partition n'est lue que si une requête touche ses dates ; seules les
+      `cache_size` dernières lues restent en mémoire
+    - l'index code -> mois (codes.json) n'est chargé qu'au premier contrôle de code
+    - aucune écriture sur un bon archivé : un mois archivé est clos
+    Le manifeste est le point de validation d'un archivage : partitions et index
+    des codes sont écrits avant lui, le snapshot des bons est réécrit après.
+    Utilisé sous le verrou du BonStore (pas de verrou propre).
+    """
+
+    def __init__(self, directory: str, manifest_path: str, codes_path: str,
+                 cache_size: int = ARCHIVE_CACHE_PARTITIONS):
+        self.directory = directory
+        self.manifest_path = manifest_path
+        self.codes_path = codes_path
+        self.cache_size = max(1, cache_size)
+        self.partitions: Dict[str, Dict[str, Any]] = {}   # mois -> entrée du manifeste, ordre chronologique
+        self.loads = 0                                   # partitions lues sur disque depuis le démarrage
+        self._signature: Optional[tuple] = None
+        self._rollups = BonRollups()
+        self._codes: Optional[Dict[str, str]] = None
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()   # mois -> (lignes, avancements)
+
+    def refresh(self) -> bool:
+        """Relit le manifeste s'il a changé ; True si l'ensemble des mois archivés a changé."""
+        sig = _file_signature(self.manifest_path)
+        if sig == self._signature:
+            return False
+        data = _read_json_file(self.manifest_path) or {}
+        self.partitions = dict(sorted((data.get("partitions") or {}).items()))
+        rollups = BonRollups()
+        for meta in self.partitions.values():
+            for dim, counts in meta["rollups"].items():
+                bucket = rollups.counts[dim]
+                for key, n in counts.items():
+                    bucket[key] = bucket.get(key, 0) + n
+        self._rollups = rollups
+        self._codes = None
+        self._cache.clear()
+        self._signature = sig
+        return True
+
+    # --- résumé (manifeste seul) ---
+    def holds(self, row: Dict[str, Any]) -> bool:
+        """Le bon tombe-t-il dans un mois archivé (donc clos) ?"""
+        return bool(self.partitions) and bon_month(row) in self.partitions
+
+    def count(self) -> int:
+        return sum(meta["count"] for meta in self.partitions.values())
+
+    def progress_sum(self) -> int:
+        return sum(meta["progress_sum"] for meta in self.partitions.values())
+
+    def rollup(self, dimension: str) -> Dict[str, int]:
+        return self._rollups.counts[dimension]
+
+    def stats(self) -> Dict[str, int]:
+        return {"partitions": len(self.partitions), "bons": self.count(),
+                "bytes": sum(meta["bytes"] for meta in self.partitions.values()),
+                "cached": len(self._cache), "loads": self.loads}
+
+    def months_for(self, predicates: Iterable[tuple]) -> List[str]:
+        """Mois archivés dont les bornes de dates sont compatibles avec les prédicats sur la date."""
+        months = []
+        for month, meta in self.partitions.items():
+            lo_m, hi_m = meta["min"], meta["max"]
+            for op, field, arg in predicates:
+                if field != "date":
+                    continue
+                if op == "range":
+                    lo, hi = arg
+                    ok = hi_m >= lo and (not hi or lo_m < hi)
+                elif op == "eq":
+                    ok = lo_m <= arg <= hi_m
+                elif op == "in":
+                    ok = any(lo_m <= v <= hi_m for v in arg)
+                else:
+                    continue
+                if not ok:
+                    break
+            else:
+                months.append(month)
+        return months
+
+    # --- partitions ---
+    def _path(self, month: str) -> str:
+        return os.path.join(self.directory, f"{month}.json.gz")
+
+    def partition(self, month: str) -> tuple:
+        """(lignes, avancements) d'un mois archivé, lus au premier accès (cache LRU)."""
+        cached = self._cache.get(month)
+        if cached is not None:
+            self._cache.move_to_end(month)
+            return cached
+        with gzip.open(os.path.join(self.directory, self.partitions[month]["file"]), "rb") as f:
+            data = loads_json(f.read())
+        cached = ([BonRecord.from_dict(r) for r in data["bons"]], data["progress"])
+        self.loads += 1
+        self._cache[month] = cached
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return cached
+
+    def _code_index(self) -> Dict[str, str]:
+        if self._codes is None:
+            self._codes = (_read_json_file(self.codes_path) or {}) if self.partitions else {}
+        return self._codes
+
+    def month_of(self, code: str) -> Optional[str]:
+        """Mois archivé qui contient `code` (None s'il n'est pas archivé)."""
+        if not self.partitions:
+            return None
+        month = self._code_index().get(str(code))
+        return month if month in self.partitions else None   # index en avance sur le manifeste ignoré
+
+    def get(self, code: str) -> Optional[BonRecord]:
+        month = self.month_of(code)
+        if month is None:
+            return None
+        return next((r for r in self.partition(month)[0] if str(r.get("code", "")) == str(code)), None)
+
+    # --- écriture (sous le verrou d'écriture du BonStore) ---
+    def _write_partition(self, month: str, rows: List[BonRecord], progress: List[int]) -> int:
+        path = self._path(month)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+                gz.write(dumps_json({"month": month, "bons": [r.to_dict() for r in rows], "progress": progress}))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, path)
+        return os.path.getsize(path)
+
+    def write(self, groups: Dict[str, tuple]) -> None:
+        """
+        Archive des mois (mois -> (lignes, avancements)) : partitions, index des codes,
+        puis manifeste. Un mois déjà archivé n'est jamais réécrit.
+        """
+        self.refresh()
+        if any(month in self.partitions for month in groups):
+            raise ValueError("Mois déjà archivé")
+        os.makedirs(self.directory, exist_ok=True)
+        partitions = dict(self.partitions)
+        codes = dict(self._code_index())
+        for month, (rows, progress) in sorted(groups.items()):
+            size = self._write_partition(month, rows, progress)
+            rollups = BonRollups()
+            for r in rows:
+                rollups.add(r)
+                codes.setdefault(str(r.get("code", "")), month)
+            dates = [str(r.get("date")) for r in rows]
+            partitions[month] = {"file": os.path.basename(self._path(month)), "count": len(rows),
+                                 "min": min(dates), "max": max(dates), "progress_sum": int(sum(progress)),
+                                 "rollups": {d: c for d, c in rollups.snapshot().items() if c}, "bytes": size}
+        _fsync_dir(self.manifest_path)   # partitions durables avant l'index et le manifeste
+        atomic_write(self.codes_path, codes)
+        atomic_write(self.manifest_path, {"partitions": partitions})
+        self.refresh()
+
+    def clear(self) -> None:
+        """Supprime toutes les partitions (réécriture complète des bons) : manifeste d'abord."""
+        self.refresh()
+        files = [meta["file"] for meta in self.partitions.values()]
+        for path in (self.manifest_path, self.codes_path):
+            if os.path.exists(path):
+                os.remove(path)
+        for name in files:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        self.refresh()
+
+def _json_archive(files: Dict[str, str]) -> Optional[BonArchive]:
+    """Archive mensuelle décrite par FILES (None si les chemins ne sont pas configurés)."""
+    if "bons_manifest" not in files:
+        return None
+    return BonArchive(os.path.dirname(files["bons_manifest"]), files["bons_manifest"], files["bons_codes"])
+
+class BonStore:
+    """
+    Store en mémoire des bons, adossé à bon_travail.json (+ journal JSONL).
+    - index de hachage par code (première occurrence, comme l'ancien scan linéaire)
+    - index secondaires sur BON_INDEXED_FIELDS (date, poste_de_charge, technicien)
+    - avancement (compute_progress) calculé une fois par ligne écrite, pas à l'affichage
+    - rollups Pareto (BonRollups) mis à jour ligne par ligne et persistés avec le
+      snapshot (rollups_path) : pas de recalcul au rechargement si le snapshot n'a pas changé
+    - index trié par date (_by_date) pour la pagination ; les autres colonnes de tri
+      sont triées à la demande et gardées jusqu'à la prochaine modification
+    - chaque add/update/delete ajoute UN enregistrement compact au journal (fsync),
+      le snapshot n'est réécrit qu'à la compaction (seuil compact_threshold)
+    - les écritures se font sous write_lock (verrou inter-processus) ; entre
+      begin_batch() et end_batch() elles sont regroupées en un seul append
+    - avec un PdrLedger, le stock PDR est journalisé au même endroit : un bon et la
+      consommation de sa pièce forment un seul enregistrement (tout ou rien)
+    - le snapshot n'est relu que si sa signature (mtime/taille) a changé ; sinon
+      seule la fin du journal non encore rejouée est lue
+    - avec une BonArchive, les mois clos sont sortis du snapshot (archive_before) :
+      la mémoire et les index ne portent que sur la fenêtre active ; comptes, rollups
+      et contrôles de code couvrent aussi les mois archivés, et une requête ne lit que
+      les partitions que ses bornes de dates touchent (bons archivés en lecture seule)
+    - instantané colonnaire (columns_path, voir bon_travail.columnar) écrit à la
+      compaction : frame() le relit en mmap et n'y ajoute que les bons modifiés depuis ;
+      au rechargement, l'avancement est repris de l'instantané au lieu d'être recalculé
+    Les lignes sont gardées en BonRecord (slots, valeurs internées, date en ordinal ;
+    voir bon_travail.model), immuables : une écriture remplace l'enregistrement. Les
+    lectures renvoient des dicts neufs (to_dict) que l'appelant peut modifier.
+    """
+
+    def __init__(self, path: str, journal_path: Optional[str] = None,
+                 compact_threshold: int = JOURNAL_COMPACT_THRESHOLD,
+                 write_lock: Optional[FileLock] = None, rollups_path: Optional[str] = None,
+                 ledger: Optional[PdrLedger] = None, archive: Optional[BonArchive] = None,
+                 columns_path: Optional[str] = None):
+        self.path = path
+        self.journal_path = journal_path
+        self.rollups_path = rollups_path
+        self.compact_threshold = compact_threshold
+        self.ledger = ledger
+        self.archive = archive
+        self.columns = ColumnarStore(columns_path) if columns_path else None
+        # ordre d'acquisition : write_lock (inter-processus) puis _lock (mémoire)
+        self.write_lock = write_lock or FileLock(path + ".lock")
+        self._lock = threading.RLock()
+        self._pending: Optional[List[Dict[str, Any]]] = None   # enregistrements du lot en cours
+        self._signature: Optional[tuple] = None
+        self._loaded = False
+        self._generation = 0            # incrémenté à chaque rechargement complet
+        self._journal_offset = 0        # octets du journal déjà rejoués
+        self._journal_records = 0
+        self._compacting = False
+        self._next_rid = 0
+        # lignes par identifiant interne (ordre d'insertion = ordre du fichier)
+        self._rows: Dict[int, BonRecord] = {}
+        self._progress: Dict[int, int] = {}   # avancement dérivé, tenu à jour à chaque écriture
+        self._rollups = BonRollups()
+        self._version = next(_BON_VERSIONS)
+        self._by_code: Dict[str, List[int]] = {}
+        self._by_field: Dict[str, Dict[str, Dict[int, None]]] = {f: {} for f in BON_INDEXED_FIELDS}
+        self._by_date: Optional[List[tuple]] = []   # (date, rid) trié ; None pendant un chargement
+        self._search = SearchIndex()
+        self._fulltext = FullTextIndex()
+        self._sorted: Dict[str, tuple] = {}         # colonne -> (version, rids triés)
+        self.query_stats: Dict[str, int] = {}       # index choisi -> nombre de requêtes
+        # codes modifiés depuis le point _dirty_from (octets du journal) : ce que l'instantané
+        # colonnaire ne contient pas encore (sur-ensemble : un code en trop est simplement relu)
+        self._dirty: set = set()
+        self._dirty_from = 0
+
+    # --- chargement / index ---
+    def _refresh(self) -> None:
+        if self.archive is not None and self.archive.refresh():
+            self._loaded = False   # mois archivés ailleurs : leurs lignes quittent la mémoire
+        sig = _file_signature(self.path)
+        if not self._loaded or sig != self._signature:
+            if self.ledger is not None:
+                self.ledger.load()
+            rows = _read_json_file(self.path) or []
+            self._load_rows(rows, self._read_persisted_rollups(sig), self._read_persisted_progress(sig, len(rows)))
+            self._signature = sig
+            self._loaded = True
+            self._generation += 1
+            self._journal_offset = 0
+            self._journal_records = 0
+        self._replay_journal()
+
+    def _load_rows(self, rows: List[Dict[str, Any]], rollups: Optional[BonRollups] = None,
+                   progress: Optional[List[int]] = None) -> None:
+        self._rows = {}
+        self._progress = {}
+        self._by_code = {}
+        self._by_field = {f: {} for f in BON_INDEXED_FIELDS}
+        self._rollups = BonRollups()
+        self._search = SearchIndex()
+        self._fulltext = FullTextIndex()
+        self._by_date = None    # reconstruit en une fois ci-dessous (pas d'insertion triée ligne à ligne)
+        if self.archive is not None and self.archive.partitions:
+            kept = [r for r in rows if not self.archive.holds(r)]
+            if len(kept) != len(rows):
+                # archivage interrompu avant la réécriture du snapshot : lignes déjà en partition
+                rows, rollups, progress = kept, None, None
+        if progress is None:
+            progress = compute_progress_rows(rows)
+        for r, pct in zip(rows, progress):
+            self._insert_row(BonRecord.from_dict(r), pct)
+        self._by_date = sorted((_sort_key(r.get("date")), rid) for rid, r in self._rows.items())
+        if rollups is not None:
+            self._rollups = rollups
+        self._dirty, self._dirty_from = set(), 0   # le rejeu du journal qui suit marque ses codes
+
+    def _read_persisted_rollups(self, sig: Optional[tuple]) -> Optional[BonRollups]:
+        """Rollups persistés, s'ils ont été calculés pour ce snapshot exact."""
+        if not self.rollups_path or sig is None:
+            return None
+        try:
+            data = _read_json_file(self.rollups_path)
+        except ValueError:
+            return None
+        if not data or tuple(data.get("snapshot") or ()) != tuple(sig):
+            return None
+        return BonRollups(data.get("counts"))
+
+    def _read_persisted_progress(self, sig: Optional[tuple], n: int) -> Optional[List[int]]:
+        """Avancements de l'instantané colonnaire, s'il a été écrit pour ce snapshot exact."""
+        snap = self.columns.current() if self.columns is not None else None
+        if (snap is None or sig is None or snap.rows != n or snap.tag["journal"] != 0
+                or tuple(snap.tag["snapshot"]) != tuple(sig)):
+            return None
+        return snap.array("progress").tolist()
+
+    def _persist_rollups(self, counts: Dict[str, Dict[str, int]]) -> None:
+        """Écrit les rollups correspondant au snapshot courant (self._signature)."""
+        if self.rollups_path and self._signature is not None:
+            atomic_write(self.rollups_path, {"snapshot": list(self._signature), "counts": counts})
+
+    def _replay_journal(self) -> None:
+        """Rejoue les enregistrements du journal ajoutés depuis le dernier passage."""
+        if not self.journal_path:
+            return
+        size = (_file_signature(self.journal_path) or (0, 0))[1]
+        if size == self._journal_offset:
+            return
+        if size < self._journal_offset:
+            # journal réécrit par ailleurs sans changement de snapshot visible : tout relire
+            self._loaded = False
+            self._refresh()
+            return
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._journal_offset)
+            data = f.read()
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break   # dernière ligne incomplète (écriture interrompue) : ignorée
+            try:
+                rec = loads_json(line)
+            except ValueError:
+                break
+            self._apply(rec)
+            self._journal_offset += len(line)
+            self._journal_records += _record_weight(rec)
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        """
+        Applique un enregistrement du journal. Idempotent : rejouer un enregistrement
+        déjà présent dans le snapshot (compaction interrompue) ne change rien.
+        """
+        op = rec.get("op")
+        if op == "add":
+            row = BonRecord.from_dict(rec["bon"])
+            rids = self._by_code.get(str(row.get("code", "")))
+            if self._archived(row):
+                pass   # déjà dans une partition (journal antérieur à l'archivage)
+            elif rids:
+                self._replace_row(rids[0], row)
+            else:
+                self._insert_row(row)
+        elif op in ("update", "update_many"):
+            for code in rec.get("codes") or (rec["code"],):
+                rids = self._by_code.get(str(code))
+                if rids:
+                    old = self._rows[rids[0]]
+                    self._replace_row(rids[0], old.replace(rec["set"]))
+        elif op in ("delete", "delete_many"):
+            for code in rec.get("codes") or (rec["code"],):
+                for rid in list(self._by_code.get(str(code), ())):
+                    self._remove_row(rid)
+        elif op == "import":
+            rows = [r for r in rec["bons"] if not self._archived(r)]
+            progress = compute_progress_rows(rows)
+            by_date, self._by_date = self._by_date, None   # index trié reconstruit en une passe
+            for row, pct in zip(map(BonRecord.from_dict, rows), progress):
+                rids = self._by_code.get(str(row.get("code", "")))
+                if rids:
+                    self._replace_row(rids[0], row)
+                else:
+                    self._insert_row(row, pct)
+            if by_date is not None:
+                self._by_date = sorted((_sort_key(r.get("date")), rid) for rid, r in self._rows.items())
+        if self.ledger is not None:
+            self.ledger.apply(rec)   # enregistrements PDR et mouvements de stock joints
+
+    def _archived(self, row: Dict[str, Any]) -> bool:
+        return self.archive is not None and self.archive.holds(row)
+
+    # Toute modification des lignes passe par ces trois méthodes (index maintenus ici)
+    def _insert_row(self, row: BonRecord, progress: Optional[int] = None) -> int:
+        rid = self._next_rid
+        self._next_rid += 1
+        self._rows[rid] = row
+        self._progress[rid] = compute_progress(row) if progress is None else progress
+        self._index_row(rid, row)
+        return rid
+
+    def _replace_row(self, rid: int, row: BonRecord) -> None:
+        self._unindex_row(rid, self._rows[rid])
+        self._rows[rid] = row
+        self._progress[rid] = compute_progress(row)
+        self._index_row(rid, row)
+
+    def _remove_row(self, rid: int) -> None:
+        self._progress.pop(rid, None)
+        self._unindex_row(rid, self._rows.pop(rid))
+
+    def _index_row(self, rid: int, row: BonRecord) -> None:
+        self._version = next(_BON_VERSIONS)
+        self._dirty.add(str(row.get("code", "")))
+        self._rollups.add(row)
+        self._search.add(rid, row)
+        self._fulltext.add(rid, row)
+        rids = self._by_code.setdefault(str(row.get("code", "")), [])
+        rids.append(rid)
+        rids.sort()   # la première occurrence (ordre du fichier) reste en tête
+        for f in BON_INDEXED_FIELDS:
+            self._by_field[f].setdefault(str(row.get(f, "")), {})[rid] = None
+        if self._by_date is not None:
+            bisect.insort(self._by_date, (_sort_key(row.get("date")), rid))
+
+    def _unindex_row(self, rid: int, row: BonRecord) -> None:
+        self._version = next(_BON_VERSIONS)
+        self._dirty.add(str(row.get("code", "")))
+        self._rollups.add(row, -1)
+        self._search.remove(rid, row)
+        self._fulltext.remove(rid, row)
+        code = str(row.get("code", ""))
+        rids = self._by_code.get(code)
+        if rids is not None:
+            rids.remove(rid)
+            if not rids:
+                del self._by_code[code]
+        for f in BON_INDEXED_FIELDS:
+            key = str(row.get(f, ""))
+            bucket = self._by_field[f].get(key)
+            if bucket is not None:
+                bucket.pop(rid, None)
+                if not bucket:
+                    del self._by_field[f][key]
+        if self._by_date is not None:
+            entry = (_sort_key(row.get("date")), rid)
+            i = bisect.bisect_left(self._by_date, entry)
+            if i < len(self._by_date) and self._by_date[i] == entry:
+                del self._by_date[i]
+
+    # --- persistance ---
+    def _commit(self, records: List[Dict[str, Any]]) -> None:
+        """Applique les enregistrements en mémoire puis les écrit (ou les garde pour le lot)."""
+        for rec in records:
+            self._apply(rec)
+        if self._pending is not None:
+            self._pending.extend(records)
+        else:
+            self._flush(records)
+
+    def _flush(self, records: List[Dict[str, Any]]) -> None:
+        """Écrit les enregistrements dans le journal en un seul append + fsync."""
+        if not records:
+            return
+        try:
+            if not self.journal_path:
+                self._write_snapshot()
+                return
+            payload = b"".join(dumps_json(rec) + b"\n" for rec in records)
+            with open(self.journal_path, "ab") as f:
+                if f.tell() != self._journal_offset:
+                    f.truncate(self._journal_offset)   # supprime une fin de ligne incomplète
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            self._loaded = False   # la mémoire est en avance sur le disque : relecture complète
+            raise
+        self._journal_offset += len(payload)
+        self._journal_records += sum(_record_weight(rec) for rec in records)
+        if self._journal_records >= self.compact_threshold:
+            if self.compact_threshold <= 0:
+                self._write_snapshot()
+            elif not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self.compact, name="bon-journal-compaction", daemon=True).start()
+
+    def begin_batch(self) -> None:
+        """Ouvre un lot : verrous pris jusqu'à end_batch(), un seul append à la fin."""
+        self.write_lock.__enter__()
+        self._lock.acquire()
+        try:
+            self._refresh()
+        except BaseException:
+            self._lock.release()
+            self.write_lock.__exit__(None, None, None)
+            raise
+        self._pending = []
+
+    def end_batch(self, commit: bool = True) -> None:
+        records, self._pending = self._pending or [], None
+        try:
+            if commit:
+                self._flush(records)
+            elif records:
+                self._loaded = False   # lot abandonné : on relit le disque
+        finally:
+            self._lock.release()
+            self.write_lock.__exit__(None, None, None)
+
+    def _write_snapshot(self) -> None:
+        """Réécrit le snapshot complet et vide le journal (appelé sous verrou)."""
+        if self.ledger is not None:
+            self.ledger.save(self.ledger.all(), self.ledger.take_movements())
+        atomic_write(self.path, [r.to_dict() for r in self._rows.values()])
+        self._signature = _file_signature(self.path)
+        self._persist_rollups(self._rollups.snapshot())
+        if self.columns is not None and self.compact_threshold > 0:
+            # réécriture ponctuelle (write_bons, archivage) : instantané colonnaire du même état
+            self.columns.write(encode_rows(list(self._rows.values()), [self._progress[rid] for rid in self._rows]),
+                               {"snapshot": list(self._signature), "journal": 0})
+            self._dirty, self._dirty_from = set(), 0
+        if self.journal_path and os.path.exists(self.journal_path):
+            with open(self.journal_path, "wb") as f:
+                os.fsync(f.fileno())
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    def compact(self) -> None:
+        """
+        Replie le journal dans un nouveau snapshot. Le snapshot est sérialisé hors
+        verrou ; seuls le remplacement du fichier et la recopie de la fin du journal
+        (écrite pendant la compaction) bloquent les écrivains. L'instantané colonnaire
+        du nouveau snapshot est encodé hors verrou lui aussi. Journal vide : le snapshot
+        n'est réécrit que s'il n'est pas au format FILE_FORMAT (conversion).
+        """
+        dirty, done = set(), False
+        try:
+            with self._lock:
+                self._refresh()
+                if not self.journal_path or (not self._journal_offset and not needs_rewrite(self.path)):
+                    return
+                rows = list(self._rows.values())   # enregistrements immuables : dicts construits hors verrou
+                progress = [self._progress[rid] for rid in self._rows]
+                counts = self._rollups.snapshot()
+                pdr = (self.ledger.all(), self.ledger.take_movements()) if self.ledger is not None else None
+                offset, generation = self._journal_offset, self._generation
+                dirty, self._dirty = self._dirty, set()   # suivi repris au point capturé
+            tmp = f"{self.path}.{os.getpid()}.compact.tmp"
+            with open(tmp, "wb") as f:
+                f.write(encode_data([r.to_dict() for r in rows]))
+                f.flush()
+                os.fsync(f.fileno())
+            arrays = encode_rows(rows, progress) if self.columns is not None else None
+            with self.write_lock, self._lock:
+                if pdr is not None:
+                    # archivés même si la compaction est abandonnée : ils ne sont plus en attente
+                    self.ledger.archive(pdr[1])
+                self._refresh()
+                if generation != self._generation:
+                    os.remove(tmp)   # snapshot remplacé entre-temps (write_bons, autre processus)
+                    return
+                tail = b""
+                if self._journal_offset > offset:
+                    with open(self.journal_path, "rb") as f:
+                        f.seek(offset)
+                        tail = f.read(self._journal_offset - offset)
+                if pdr is not None:
+                    atomic_write(self.ledger.path, pdr[0])
+                os.replace(tmp, self.path)
+                _fsync_dir(self.path)
+                # le journal peut encore contenir des enregistrements déjà repliés :
+                # le rejeu étant idempotent, un arrêt ici ne perd rien
+                jtmp = f"{self.journal_path}.{os.getpid()}.tmp"
+                with open(jtmp, "wb") as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(jtmp, self.journal_path)
+                _fsync_dir(self.journal_path)
+                self._signature = _file_signature(self.path)
+                self._persist_rollups(counts)
+                self._journal_offset = len(tail)
+                self._journal_records = tail.count(b"\n")
+                if arrays is not None:
+                    # instantané = nouveau snapshot (journal vide) ; self._dirty = la fin recopiée
+                    self.columns.write(arrays, {"snapshot": list(self._signature), "journal": 0})
+                    self._dirty_from = 0
+                done = True
+        finally:
+            if not done:
+                with self._lock:
+                    self._dirty |= dirty
+            self._compacting = False
+
+    # --- instantané colonnaire ---
+    def _columnar(self) -> Optional[ColumnarSnapshot]:
+        """
+        Instantané colonnaire cohérent avec self._dirty (sous verrou) ; réécrit depuis la
+        mémoire s'il manque, s'il date d'un autre snapshot ou si trop de bons ont changé.
+        """
+        if self.columns is None:
+            return None
+        snap = self.columns.current()
+        if (snap is not None and self._signature is not None and tuple(snap.tag["snapshot"]) == self._signature
+                and snap.tag["journal"] >= self._dirty_from and len(self._dirty) <= max(1000, len(self._rows) // 10)):
+            return snap
+        self.columns.write(encode_rows(list(self._rows.values()), [self._progress[rid] for rid in self._rows]),
+                           {"snapshot": list(self._signature or ()), "journal": self._journal_offset})
+        self._dirty, self._dirty_from = set(), self._journal_offset
+        return self.columns.current()
+
+    def frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        DataFrame d'analyse de la fenêtre active (colonnes catégorielles, date datetime64,
+        avancement) : instantané colonnaire en mmap + bons modifiés depuis son écriture.
+        """
+        with self._lock:
+            self._refresh()
+            snap = self._columnar()
+            if snap is None:
+                return build_frame(columns, rows=list(self._rows.values()),
+                                   progress=[self._progress[rid] for rid in self._rows])
+            rids = sorted(rid for code in self._dirty for rid in self._by_code.get(code, ()))
+            return build_frame(columns, snap, self._dirty, [self._rows[rid] for rid in rids],
+                               [self._progress[rid] for rid in rids])
+
+    # --- lecture ---
+    def _archived_months(self) -> List[str]:
+        return list(self.archive.partitions) if self.archive is not None else []
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Tout l'historique : partitions archivées (ordre des mois) puis fenêtre active."""
+        with self._lock:
+            self._refresh()
+            rows = [r.to_dict() for m in self._archived_months() for r in self.archive.partition(m)[0]]
+            return rows + [r.to_dict() for r in self._rows.values()]
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            rids = self._by_code.get(str(code))
+            if rids:
+                return self._rows[rids[0]].to_dict()
+            row = self.archive.get(code) if self.archive is not None else None
+            return row.to_dict() if row is not None else None
+
+    def rollup(self, dimension: str) -> Dict[str, int]:
+        with self._lock:
+            self._refresh()
+            counts = dict(self._rollups.counts[dimension])
+            if self.archive is not None:
+                for key, n in self.archive.rollup(dimension).items():
+                    counts[key] = counts.get(key, 0) + n
+            return counts
+
+    def version(self) -> int:
+        """Version des données (change dès qu'une ligne est ajoutée, modifiée ou retirée)."""
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def all_with_progress(self) -> tuple:
+        """(lignes, avancements) alignés, sans recalcul pour les lignes inchangées."""
+        with self._lock:
+            self._refresh()
+            rows, progress = [], []
+            for m in self._archived_months():
+                part = self.archive.partition(m)
+                rows.extend(r.to_dict() for r in part[0])
+                progress.extend(part[1])
+            rows.extend(r.to_dict() for r in self._rows.values())
+            return rows, progress + [self._progress[rid] for rid in self._rows]
+
+    def _exists(self, code: str) -> bool:
+        return code in self._by_code or (self.archive is not None and self.archive.month_of(code) is not None)
+
+    def exists(self, code: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return self._exists(str(code))
+
+    def existing_codes(self, codes: Iterable[str]) -> set:
+        """Codes de `codes` déjà présents, mois archivés compris (contrôle de doublons d'un import)."""
+        with self._lock:
+            self._refresh()
+            return {str(c) for c in codes if self._exists(str(c))}
+
+    def active_codes(self) -> List[str]:
+        """Codes des bons de la fenêtre active (modifiables), dans l'ordre du fichier."""
+        with self._lock:
+            self._refresh()
+            return [str(r.get("code", "")) for r in self._rows.values()]
+
+    def closed_months(self) -> set:
+        """Mois archivés (AAAA-MM) : aucun bon ne peut y être ajouté ni modifié."""
+        with self._lock:
+            self._refresh()
+            return set(self._archived_months())
+
+    def archive_stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._refresh()
+            return self.archive.stats() if self.archive is not None else {}
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows) + (self.archive.count() if self.archive is not None else 0)
+
+    def journal_stats(self) -> Dict[str, int]:
+        """Enregistrements et octets du journal pas encore repliés dans le snapshot."""
+        with self._lock:
+            self._refresh()
+            return {"records": self._journal_records, "bytes": self._journal_offset}
+
+    def mean_progress(self) -> float:
+        with self._lock:
+            self._refresh()
+            total, n = sum(self._progress.values()), len(self._progress)
+            if self.archive is not None:
+                total, n = total + self.archive.progress_sum(), n + self.archive.count()
+            return total / n if n else 0.0
+
+    # --- requêtes (BonQuery) ---
+    def _index_candidates(self, pred: tuple) -> Optional[tuple]:
+        """(estimation, fonction -> rids candidats, nom de l'index) si le prédicat est indexable."""
+        op, field, arg = pred
+        if op in ("eq", "in"):
+            values = (arg,) if op == "eq" else tuple(arg)
+            if field == "code":
+                buckets = [self._by_code.get(v, ()) for v in values]
+                name = "code"
+            elif field in BON_INDEXED_FIELDS:
+                buckets = [self._by_field[field].get(v, {}) for v in values]
+                name = field
+            elif field in self._search.values:
+                # clés en minuscules : sur-ensemble, la casse est revérifiée par matches()
+                buckets = [self._search.values[field].get(k, {}) for k in {v.lower() for v in values}]
+                name = f"{field} (valeurs)"
+            else:
+                return None
+            return sum(map(len, buckets)), lambda: [rid for b in buckets for rid in b], name
+        if op == "range" and field == "date":
+            lo, hi = arg
+            start = bisect.bisect_left(self._by_date, (lo, -1))
+            end = bisect.bisect_left(self._by_date, (hi, -1)) if hi else len(self._by_date)
+            return end - start, lambda: [rid for _, rid in self._by_date[start:end]], "date (trié)"
+        if op == "contains" and all(f in self._search.values for f in field):
+            rids = set().union(*(self._search.lookup(f, arg) for f in field))
+            return len(rids), lambda: rids, "trigrammes"
+        if op == "not_validated" and field in self._search.values:
+            # statuts saisis par selectbox ("", "Valider", "Non Valider") : pas de variante de casse
+            buckets = [b for k, b in self._search.values[field].items() if k != arg.lower()]
+            return sum(map(len, buckets)), lambda: [rid for b in buckets for rid in b], f"{field} (statut)"
+        return None
+
+    def _order_key(self, order_by: str) -> Callable[[int], tuple]:
+        if order_by == "progress":
+            return lambda rid: (self._progress[rid], rid)
+        if order_by not in BON_COLUMNS:
+            raise KeyError(f"Colonne de tri inconnue: {order_by}")
+        return lambda rid: (_sort_key(self._rows[rid].get(order_by)), rid)
+
+    def _sorted_rids(self, sort_by: str) -> List[int]:
+        cached = self._sorted.get(sort_by)
+        if cached is None or cached[0] != self._version:
+            cached = (self._version, sorted(self._rows, key=self._order_key(sort_by)))
+            self._sorted[sort_by] = cached
+        return cached[1]
+
+    def _select(self, q: BonQuery, offset: int, stop: Optional[int]) -> tuple:
+        """(rids, nom de l'index, lignes examinées) de la fenêtre active, positions offset:stop."""
+        if q.order_by:
+            key = self._order_key(q.order_by)
+        best = None
+        for pred in q.predicates:
+            cand = self._index_candidates(pred)
+            if cand is not None and (best is None or cand[0] < best[0]):
+                best = cand
+        if best is not None:
+            index = best[2]
+            candidates = sorted(set(best[1]()))   # ordre du fichier
+            examined = len(candidates)
+            rids = [rid for rid in candidates if q.matches(self._rows[rid])]
+            if q.order_by:
+                rids.sort(key=key, reverse=q.descending)
+            return rids[offset:stop], index, examined
+        if q.order_by == "date":
+            index, seq, at = "date (trié)", self._by_date, lambda i: self._by_date[i][1]
+        elif q.order_by:
+            seq = self._sorted_rids(q.order_by)
+            index, at = f"tri {q.order_by}", seq.__getitem__
+        else:
+            seq = list(self._rows)
+            index, at = "parcours", seq.__getitem__
+        n = len(seq)
+        positions = range(n - 1, -1, -1) if q.descending else range(n)
+        if not q.predicates:
+            rids = [at(i) for i in positions[offset:stop]]
+            return rids, index, len(rids)
+        rids, examined = [], 0
+        for i in positions:
+            examined += 1
+            rid = at(i)
+            if q.matches(self._rows[rid]):
+                rids.append(rid)
+                if stop is not None and len(rids) >= stop:
+                    break
+        return rids[offset:], index, examined
+
+    def _merge_archive(self, q: BonQuery, months: List[str], rids: List[int], stop: Optional[int]) -> tuple:
+        """
+        Lignes de la fenêtre active (`rids`, déjà triées, sans décalage) complétées par
+        celles des partitions `months`. Ordre sans tri : mois archivés puis fenêtre
+        active. Avec un tri par date, les partitions sont lues en s'éloignant de la
+        fenêtre active et la lecture s'arrête dès que `stop` lignes précèdent toutes
+        les dates d'une partition. Renvoie (lignes, avancements, lignes examinées, mois lus).
+        """
+        read, examined = [], 0
+        if not q.order_by:
+            rows, progress = [], []
+            for month in months:
+                if stop is not None and len(rows) >= stop:
+                    break
+                part_rows, part_progress = self.archive.partition(month)
+                read.append(month)
+                examined += len(part_rows)
+                for r, p in zip(part_rows, part_progress):
+                    if q.matches(r):
+                        rows.append(r)
+                        progress.append(p)
+            rows.extend(self._rows[rid] for rid in rids)
+            progress.extend(self._progress[rid] for rid in rids)
+            return rows[q.offset_n:stop], progress[q.offset_n:stop], examined, read
+
+        field = q.order_by
+        value = (lambda r, p: p) if field == "progress" else (lambda r, p: _sort_key(r.get(field)))
+        src = {m: i for i, m in enumerate(self._archived_months())}
+        hot = len(src)   # départage des égalités : ordre des mois, puis fenêtre active (rid)
+        entries = [(value(self._rows[rid], self._progress[rid]), hot, rid, self._rows[rid], self._progress[rid])
+                   for rid in rids]
+        best = heapq.nlargest if q.descending else heapq.nsmallest
+        order = list(reversed(months)) if q.descending else months
+        for month in order:
+            if field == "date" and stop is not None and len(entries) >= stop:
+                meta, kth = self.archive.partitions[month], entries[stop - 1][0]
+                if (meta["max"] <= kth) if q.descending else (meta["min"] > kth):
+                    break   # partitions suivantes entièrement au-delà de la page demandée
+            part_rows, part_progress = self.archive.partition(month)
+            read.append(month)
+            examined += len(part_rows)
+            entries.extend((value(r, p), src[month], i, r, p)
+                           for i, (r, p) in enumerate(zip(part_rows, part_progress)) if q.matches(r))
+            entries = best(stop, entries) if stop is not None else entries
+        if stop is None:
+            entries.sort(reverse=q.descending)
+        entries = entries[q.offset_n:stop]
+        return [e[3] for e in entries], [e[4] for e in entries], examined, read
+
+    def execute(self, q: BonQuery, with_progress: bool = False) -> tuple:
+        """
+        (bons, avancements ou None, plan) d'une BonQuery. Plan d'exécution :
+        - index le plus sélectif parmi code / date / poste / technicien / statuts dpt /
+          trigrammes, puis vérification des autres prédicats sur les candidats ;
+        - sinon parcours dans l'ordre demandé (index trié par date, tri mis en cache)
+          avec arrêt dès que offset + limit lignes correspondent ;
+        - sans prédicat, la page est lue directement par position dans l'ordre trié ;
+        - partitions archivées : seules celles compatibles avec les bornes de dates
+          sont lues (voir _merge_archive), et listées dans le plan.
+        """
+        rows, progress, plan = self._execute(q, with_progress)
+        return [r.to_dict() for r in rows], progress, plan
+
+    def _execute(self, q: BonQuery, with_progress: bool) -> tuple:
+        """execute() sans conversion : (BonRecord, avancements ou None, plan)."""
+        t0 = time.perf_counter()
+        with self._lock:
+            self._refresh()
+            if q.order_by:
+                self._order_key(q.order_by)   # colonne de tri inconnue : KeyError avant toute lecture
+            stop = None if q.limit_n is None else q.offset_n + q.limit_n
+            months = self.archive.months_for(q.predicates) if self.archive is not None else []
+            read = []
+            if not months:
+                rids, index, examined = self._select(q, q.offset_n, stop)
+                rows = [self._rows[rid] for rid in rids]
+                progress = [self._progress[rid] for rid in rids] if with_progress else None
+            else:
+                rids, index, examined = self._select(q, 0, stop)
+                rows, progress, scanned, read = self._merge_archive(q, months, rids, stop)
+                examined += scanned
+                if read:
+                    index += " + partitions"
+                if not with_progress:
+                    progress = None
+            self.query_stats[index] = self.query_stats.get(index, 0) + 1
+        plan = {"index": index, "examined": examined, "returned": len(rows),
+                "ms": (time.perf_counter() - t0) * 1000, "query": q.describe(), "partitions": read}
+        return rows, progress, plan
+
+    def iter_values(self, q: BonQuery) -> Iterator[tuple]:
+        """Valeurs (ordre BON_COLUMNS) des bons de la requête, produites une à une."""
+        rows = self._execute(q, False)[0]   # enregistrements immuables, convertis un à un
+        for r in rows:
+            yield r.export_values()
+
+    def find(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        if field == "code":
+            r = self.get(value)
+            return [r] if r is not None else []
+        if field not in BON_INDEXED_FIELDS:
+            raise KeyError(f"Champ non indexé: {field}")
+        with self._lock:
+            self._refresh()
+            rows = [self._rows[rid] for rid in sorted(self._by_field[field].get(str(value), ()))]
+            return [r.to_dict() for r in self._archive_matches(BonQuery().eq(field, value)) + rows]
+
+    def _archive_matches(self, q: BonQuery) -> List[BonRecord]:
+        """Lignes archivées qui vérifient `q` (partitions compatibles seulement, ordre des mois)."""
+        if self.archive is None:
+            return []
+        return [r for m in self.archive.months_for(q.predicates) for r in self.archive.partition(m)[0]
+                if q.matches(r)]
+
+    def fulltext(self, text: str, k: int = 20) -> List[tuple]:
+        """
+        [(bon, score BM25)] des k bons les plus pertinents sur FULLTEXT_FIELDS, dans la
+        fenêtre active : l'index plein texte ne couvre pas les mois archivés.
+        """
+        with self._lock:
+            self._refresh()
+            return [(self._rows[rid].to_dict(), score) for rid, score in self._fulltext.query(text, k)]
+
+    def count_by(self, field: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        with self._lock:
+            self._refresh()
+            rows = self._rows.values()
+            if filters and len(filters) == 1 and next(iter(filters)) in BON_INDEXED_FIELDS:
+                (f, v), = filters.items()
+                rows = [self._rows[rid] for rid in self._by_field[f].get(str(v), ())]
+            q = BonQuery()
+            for k, v in (filters or {}).items():
+                q.eq(k, v)
+            counts: Dict[str, int] = {}
+            for part in (rows, self._archive_matches(q)):
+                for r in part:
+                    if filters and any(str(r.get(k, "")) != str(v) for k, v in filters.items()):
+                        continue
+                    key = str(r.get(field, ""))
+                    counts[key] = counts.get(key, 0) + 1
+            return counts
+
+    # --- écriture ---
+    def _check_writable(self, codes: Iterable[str] = (), rows: Iterable[Dict[str, Any]] = ()) -> None:
+        """ValueError si l'écriture touche un bon archivé ou place un bon dans un mois archivé."""
+        if self.archive is None or not self.archive.partitions:
+            return
+        closed = [c for c in codes if c not in self._by_code and self.archive.month_of(c) is not None]
+        if closed:
+            raise ValueError(f"Bon(s) archivé(s), lecture seule : {', '.join(closed[:10])}")
+        months = sorted({bon_month(r) for r in rows if self.archive.holds(r)})
+        if months:
+            raise ValueError(f"Mois archivé(s) (clos) : {', '.join(months)}")
+
+    def replace_all(self, rows: List[Dict[str, Any]]) -> None:
+        """Remplace tout l'historique : les partitions archivées sont supprimées."""
+        with self.write_lock, self._lock:
+            self._refresh()   # stock PDR à jour avant la réécriture du snapshot
+            if self.archive is not None:
+                self.archive.clear()
+            self._load_rows(rows)
+            self._write_snapshot()
+            self._loaded = True
+            self._generation += 1
+
+    def add(self, entry: Dict[str, Any], consume: Optional[str] = None) -> None:
+        """Ajoute un bon ; `consume` = code PDR décrémenté d'une pièce dans le même enregistrement."""
+        with self.write_lock, self._lock:
+            self._refresh()
+            if self._exists(str(entry.get("code", ""))):
+                raise ValueError("Code déjà présent")
+            self._check_writable(rows=[entry])
+            rec = {"op": "add", "bon": dict(entry)}
+            if consume and self.ledger is not None:
+                mv = self.ledger.movement(consume, -1, "consommation", bon=str(entry.get("code", "")))
+                if mv is not None:
+                    rec["stock"] = [mv]
+            self._commit([rec])
+
+    def add_many(self, entries: List[Dict[str, Any]], consume: Optional[Dict[str, int]] = None) -> None:
+        """
+        Import en masse : UN enregistrement du journal pour tous les bons (tout ou rien),
+        PDR décrémentées en agrégé (`consume` = code PDR -> nombre de pièces).
+        """
+        with self.write_lock, self._lock:
+            self._refresh()
+            dups = sum(1 for e in entries if self._exists(str(e.get("code", ""))))
+            if dups:
+                raise ValueError(f"{dups} code(s) déjà présent(s)")
+            self._check_writable(rows=entries)
+            rec = {"op": "import", "bons": [dict(e) for e in entries]}
+            if consume and self.ledger is not None:
+                mvs = [self.ledger.movement(code, -n, "consommation", bon="import") for code, n in consume.items()]
+                rec["stock"] = [mv for mv in mvs if mv is not None]
+            self._commit([rec])
+
+    def update(self, code: str, updates: Dict[str, Any]) -> None:
+        with self.write_lock, self._lock:
+            self._refresh()
+            changes = _normalize_bon_values({k: updates[k] for k in BON_COLUMNS if k in updates})
+            self._check_writable([str(code)], [changes] if "date" in changes else ())
+            if str(code) not in self._by_code:
+                raise KeyError("Code introuvable")
+            self._commit([{"op": "update", "code": str(code), "set": changes}])
+
+    def delete(self, code: str) -> None:
+        with self.write_lock, self._lock:
+            self._refresh()
+            self._check_writable([str(code)])
+            self._commit([{"op": "delete", "code": str(code)}])
+
+    def update_many(self, codes: Iterable[str], updates: Dict[str, Any]) -> int:
+        """Mêmes modifications sur plusieurs bons : un seul enregistrement (tout ou rien)."""
+        codes = list(dict.fromkeys(str(c) for c in codes))
+        with self.write_lock, self._lock:
+            self._refresh()
+            changes = _normalize_bon_values({k: updates[k] for k in BON_COLUMNS if k in updates})
+            self._check_writable(codes, [changes] if "date" in changes else ())
+            missing = [c for c in codes if c not in self._by_code]
+            if missing:
+                raise KeyError(f"Code(s) introuvable(s) : {', '.join(missing[:10])}")
+            if codes and changes:
+                self._commit([{"op": "update_many", "codes": codes, "set": changes}])
+            return len(codes)
+
+    def delete_many(self, codes: Iterable[str]) -> int:
+        """Supprime plusieurs bons en un seul enregistrement ; renvoie le nombre de lignes retirées."""
+        codes = list(dict.fromkeys(str(c) for c in codes))
+        with self.write_lock, self._lock:
+            self._refresh()
+            self._check_writable(codes)
+            n = sum(len(self._by_code.get(c, ())) for c in codes)
+            if n:
+                self._commit([{"op": "delete_many", "codes": codes}])
+            return n
+
+    def archive_before(self, month: str) -> Dict[str, int]:
+        """
+        Archive les mois antérieurs à `month` (AAAA-MM) : une partition en lecture seule
+        par mois (BonArchive.write), puis snapshot réécrit sans ces bons et journal vidé.
+        Les bons sans date au format AAAA-MM-JJ restent dans la fenêtre active.
+        Renvoie {mois: bons archivés}.
+        """
+        if self.archive is None:
+            raise ValueError("Archivage non configuré pour ce stockage")
+        with self.write_lock, self._lock:
+            self._refresh()
+            groups: Dict[str, List[int]] = {}
+            for rid, row in self._rows.items():
+                m = bon_month(row)
+                if m is not None and m < month:
+                    groups.setdefault(m, []).append(rid)
+            if not groups:
+                return {}
+            self.archive.write({m: ([self._rows[rid] for rid in rids], [self._progress[rid] for rid in rids])
+                                for m, rids in groups.items()})
+            by_date, self._by_date = self._by_date, None   # index trié reconstruit en une passe
+            for rids in groups.values():
+                for rid in rids:
+                    self._remove_row(rid)
+            if by_date is not None:
+                self._by_date = sorted((_sort_key(r.get("date")), rid) for rid, r in self._rows.items())
+            self._write_snapshot()
+            return {m: len(rids) for m, rids in sorted(groups.items())}
+
+    # --- stock PDR (PdrLedger) ---
+    def read_ledger(self, fn: Callable[[PdrLedger], Any]) -> Any:
+        with self._lock:
+            self._refresh()
+            return fn(self.ledger)
+
+    def commit_ledger(self, build: Callable[[PdrLedger], Optional[Dict[str, Any]]]) -> Any:
+        """Construit un enregistrement PDR sur l'état à jour (sous verrou) et le journalise."""
+        with self.write_lock, self._lock:
+            self._refresh()
+            rec = build(self.ledger)
+            if rec is not None:
+                self._commit([rec])
+            return rec
+
+# ---------------------------
+# Backend SQLite (WAL, écritures ligne à ligne, filtres poussés en SQL)
+# ---------------------------
+def _q(col: str) -> str:
+    """Identifiant SQL quoté (certaines colonnes comme 'action' sont des mots-clés)."""
+    return '"' + col.replace('"', '""') + '"'
+
+class SqliteBonStore:
+    """Même interface que BonStore, servie par la table 'bons' de SqliteBackend."""
+
+    def __init__(self, backend: "SqliteBackend"):
+        self.backend = backend
+        self._select = "SELECT " + ", ".join(_q(c) for c in BON_COLUMNS) + " FROM bons"
+        self.query_stats: Dict[str, int] = {}
+
+    def _rows(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        cur = self.backend.conn().execute(sql, params)
+        return [dict(zip(BON_COLUMNS, r)) for r in cur.fetchall()]
+
+    def all(self) -> List[Dict[str, Any]]:
+        return self._rows(self._select + " ORDER BY id")
+
+    def all_with_progress(self) -> tuple:
+        cur = self.backend.conn().execute(self._select.replace(" FROM bons", ", progress FROM bons") + " ORDER BY id")
+        rows, progress = [], []
+        for r in cur.fetchall():
+            rows.append(dict(zip(BON_COLUMNS, r)))
+            progress.append(r[-1])
+        return rows, progress
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        rows = self._rows(self._select + " WHERE code = ? ORDER BY id LIMIT 1", (str(code),))
+        return rows[0] if rows else None
+
+    def exists(self, code: str) -> bool:
+        cur = self.backend.conn().execute("SELECT 1 FROM bons WHERE code = ? LIMIT 1", (str(code),))
+        return cur.fetchone() is not None
+
+    def existing_codes(self, codes: Iterable[str], c: Optional[sqlite3.Connection] = None) -> set:
+        c = c or self.backend.conn()
+        codes = list(dict.fromkeys(str(x) for x in codes))
+        found = set()
+        for i in range(0, len(codes), 500):   # limite de paramètres SQLite
+            part = codes[i:i + 500]
+            found.update(r[0] for r in c.execute(
+                f"SELECT DISTINCT code FROM bons WHERE code IN ({', '.join('?' for _ in part)})", part))
+        return found
+
+    def count(self) -> int:
+        return self.backend.conn().execute("SELECT COUNT(*) FROM bons").fetchone()[0]
+
+    def active_codes(self) -> List[str]:
+        return [r[0] for r in self.backend.conn().execute("SELECT code FROM bons ORDER BY id")]
+
+    def closed_months(self) -> set:
+        return set()   # pas d'archive mensuelle : les requêtes par date passent par l'index SQL
+
+    def archive_stats(self) -> Dict[str, int]:
+        return {}
+
+    def frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """DataFrame d'analyse (mêmes types que BonStore.frame), construit depuis la table."""
+        rows, progress = self.all_with_progress()
+        return build_frame(columns, rows=rows, progress=progress)
+
+    def mean_progress(self) -> float:
+        return self.backend.conn().execute("SELECT COALESCE(AVG(progress), 0) FROM bons").fetchone()[0]
+
+    # --- requêtes (BonQuery) ---
+    def _compile(self, q: BonQuery, with_progress: bool = False) -> tuple:
+        """(sql, paramètres) d'une BonQuery ; le choix de l'index est laissé à SQLite."""
+        clauses, params = [], []
+        for op, field, arg in q.predicates:
+            if op == "contains":
+                if self.backend.fts and len(arg) >= 3 and all(f in SEARCH_INDEX_FIELDS for f in field):
+                    clauses.append("id IN (SELECT rowid FROM bons_fts WHERE bons_fts MATCH ?)")
+                    params.append("{" + " ".join(field) + "} : \"" + arg.replace('"', '""') + "\"")
+                else:
+                    clauses.append("(" + " OR ".join(f"instr(py_lower({_q(f)}), ?) > 0" for f in field) + ")")
+                    params.extend([arg] * len(field))
+                continue
+            if field not in BON_COLUMNS:
+                raise KeyError(f"Champ inconnu: {field}")
+            col = _q(field)
+            if op == "eq":
+                clauses.append(f"{col} = ?")
+                params.append(arg)
+            elif op == "in":
+                clauses.append(f"{col} IN ({', '.join('?' * len(arg))})" if arg else "0")
+                params.extend(sorted(arg))
+            elif op == "range":
+                lo, hi = arg
+                clauses.append(f"{col} <> '' AND {col} >= ?" + (f" AND {col} < ?" if hi else ""))
+                params.extend([lo, hi] if hi else [lo])
+            else:   # not_validated
+                clauses.append(f"{col} <> ?")
+                params.append(arg)
+        select = self._select.replace(" FROM bons", ", progress FROM bons") if with_progress else self._select
+        sql = select + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        if q.order_by:
+            if q.order_by not in BON_COLUMNS and q.order_by != "progress":
+                raise KeyError(f"Colonne de tri inconnue: {q.order_by}")
+            direction = "DESC" if q.descending else "ASC"
+            sql += f" ORDER BY {_q(q.order_by)} {direction}, id {direction}"
+        else:
+            sql += " ORDER BY id"
+        if q.limit_n is not None or q.offset_n:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if q.limit_n is None else q.limit_n, q.offset_n])
+        return sql, params
+
+    def execute(self, q: BonQuery, with_progress: bool = False) -> tuple:
+        """Comme BonStore.execute ; le plan est celui d'EXPLAIN QUERY PLAN."""
+        t0 = time.perf_counter()
+        sql, params = self._compile(q, with_progress)
+        c = self.backend.conn()
+        rows, progress = [], ([] if with_progress else None)
+        for r in c.execute(sql, params).fetchall():
+            rows.append(dict(zip(BON_COLUMNS, r)))
+            if with_progress:
+                progress.append(r[-1])
+        ms = (time.perf_counter() - t0) * 1000
+        details = [d[-1] for d in c.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+        used = [m.group(1) for d in details for m in [re.search(r"USING (?:COVERING )?INDEX (\w+)", d)] if m]
+        if any("bons_fts" in d for d in details):
+            used.append("bons_fts")
+        index = ", ".join(used) or "parcours"
+        self.query_stats[index] = self.query_stats.get(index, 0) + 1
+        plan = {"index": index, "examined": None, "returned": len(rows), "ms": ms,
+                "query": q.describe(), "sqlite": " | ".join(details)}
+        return rows, progress, plan
+
+    def iter_values(self, q: BonQuery, chunk_size: int = 1000) -> Iterator[tuple]:
+        """Comme BonStore.iter_values, lu par paquets (fetchmany) : mémoire bornée."""
+        sql, params = self._compile(q)
+        cur = self.backend.conn().execute(sql, params)
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                return
+            for r in chunk:
+                yield tuple("" if v is None else v for v in r)
+
+    def find(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        if field == "code":
+            r = self.get(value)
+            return [r] if r is not None else []
+        if field not in BON_INDEXED_FIELDS:
+            raise KeyError(f"Champ non indexé: {field}")
+        return self._rows(self._select + f" WHERE {_q(field)} = ? ORDER BY id", (str(value),))
+
+    def fulltext(self, text: str, k: int = 20) -> List[tuple]:
+        """
+        Comme BonStore.fulltext : table FTS5 bons_text (unicode61 sans accents), classée
+        par bm25() (négatif dans SQLite : le signe est inversé pour le score renvoyé).
+        Sans FTS5 : bons contenant l'un des termes, non classés.
+        """
+        terms = sorted(set(tokenize(text)))
+        if not terms:
+            return []
+        if not self.backend.fts:
+            doc = " || ' ' || ".join(_q(f) for f in FULLTEXT_FIELDS)
+            expr = " OR ".join(f"instr(py_fold({doc}), ?) > 0" for _ in terms)
+            return [(r, 0.0) for r in self._rows(self._select + f" WHERE {expr} ORDER BY id LIMIT ?",
+                                                 (*terms, int(k)))]
+        cur = self.backend.conn().execute(
+            self._select.replace(" FROM bons", ", -t.rank FROM bons")
+            + " JOIN (SELECT rowid AS rid, bm25(bons_text) AS rank FROM bons_text WHERE bons_text MATCH ? "
+              "ORDER BY rank LIMIT ?) AS t ON t.rid = bons.id ORDER BY t.rank",
+            (" OR ".join(f'"{t}"' for t in terms), int(k)))
+        return [(dict(zip(BON_COLUMNS, r)), r[-1]) for r in cur.fetchall()]
+
+    def rollup(self, dimension: str) -> Dict[str, int]:
+        cur = self.backend.conn().execute("SELECT bucket, n FROM rollups WHERE dim = ?", (dimension,))
+        return dict(cur.fetchall())
+
+    def version(self) -> int:
+        row = self.backend.conn().execute("SELECT value FROM meta WHERE key = 'bons_version'").fetchone()
+        return row[0] if row else 0
+
+    def count_by(self, field: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        where, params = "", []
+        if filters:
+            where = " WHERE " + " AND ".join(f"{_q(k)} = ?" for k in filters)
+            params = [str(v) for v in filters.values()]
+        cur = self.backend.conn().execute(
+            f"SELECT {_q(field)}, COUNT(*) FROM bons{where} GROUP BY {_q(field)}", params)
+        return {("" if k is None else str(k)): n for k, n in cur.fetchall()}
+
+    def replace_all(self, rows: List[Dict[str, Any]]) -> None:
+        with self.backend.tx() as c:
+            c.execute("DELETE FROM bons")
+            c.execute("DELETE FROM rollups")
+            self.backend.insert_bons(c, rows)
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self.backend.tx() as c:
+            if c.execute("SELECT 1 FROM bons WHERE code = ? LIMIT 1", (str(entry.get("code", "")),)).fetchone():
+                raise ValueError("Code déjà présent")
+            self.backend.insert_bons(c, [entry])
+
+    def add_many(self, entries: List[Dict[str, Any]]) -> None:
+        with self.backend.tx() as c:
+            dups = self.existing_codes((e.get("code", "") for e in entries), c)
+            if dups:
+                raise ValueError(f"{len(dups)} code(s) déjà présent(s)")
+            self.backend.insert_bons(c, entries)
+
+    def update(self, code: str, updates: Dict[str, Any]) -> None:
+        changes = _normalize_bon_values({k: updates[k] for k in BON_COLUMNS if k in updates})
+        with self.backend.tx() as c:
+            row = c.execute("SELECT id FROM bons WHERE code = ? ORDER BY id LIMIT 1", (str(code),)).fetchone()
+            if row is None:
+                raise KeyError("Code introuvable")
+            if changes:
+                old = dict(zip(BON_COLUMNS, c.execute(self._select + " WHERE id = ?", (row[0],)).fetchone()))
+                new = {**old, **changes}
+                sets = ", ".join(f"{_q(k)} = ?" for k in changes)
+                c.execute(f"UPDATE bons SET {sets}, progress = ? WHERE id = ?",
+                          (*changes.values(), compute_progress(new), row[0]))
+                self.backend.bump_rollups(c, [old], -1)
+                self.backend.bump_rollups(c, [new], 1)
+
+    def delete(self, code: str) -> None:
+        with self.backend.tx() as c:
+            old = [dict(zip(BON_COLUMNS, r)) for r in
+                   c.execute(self._select + " WHERE code = ?", (str(code),)).fetchall()]
+            c.execute("DELETE FROM bons WHERE code = ?", (str(code),))
+            self.backend.bump_rollups(c, old, -1)
+
+    def _rows_for_codes(self, c: sqlite3.Connection, codes: List[str], first_only: bool) -> List[tuple]:
+        """[(id, ligne)] des bons de `codes` (première occurrence seulement si first_only), une lecture par bloc."""
+        out = []
+        for i in range(0, len(codes), 500):   # limite de paramètres SQLite
+            part = codes[i:i + 500]
+            marks = ", ".join("?" for _ in part)
+            where = (f"id IN (SELECT MIN(id) FROM bons WHERE code IN ({marks}) GROUP BY code)" if first_only
+                     else f"code IN ({marks})")
+            cur = c.execute("SELECT id, " + ", ".join(_q(k) for k in BON_COLUMNS) + f" FROM bons WHERE {where}", part)
+            out.extend((r[0], dict(zip(BON_COLUMNS, r[1:]))) for r in cur.fetchall())
+        return out
+
+    def update_many(self, codes: Iterable[str], updates: Dict[str, Any]) -> int:
+        codes = list(dict.fromkeys(str(x) for x in codes))
+        changes = _normalize_bon_values({k: updates[k] for k in BON_COLUMNS if k in updates})
+        with self.backend.tx() as c:
+            rows = self._rows_for_codes(c, codes, first_only=True)
+            if len(rows) != len(codes):
+                found = {r["code"] for _, r in rows}
+                missing = [x for x in codes if x not in found]
+                raise KeyError(f"Code(s) introuvable(s) : {', '.join(missing[:10])}")
+            if changes and rows:
+                old = [r for _, r in rows]
+                new = [{**r, **changes} for r in old]
+                progress = compute_progress_rows(new)
+                sets = ", ".join(f"{_q(k)} = ?" for k in changes)
+                c.executemany(f"UPDATE bons SET {sets}, progress = ? WHERE id = ?",
+                              ((*changes.values(), pct, rid) for (rid, _), pct in zip(rows, progress)))
+                self.backend.bump_rollups(c, old, -1)
+                self.backend.bump_rollups(c, new, 1)
+        return len(codes)
+
+    def delete_many(self, codes: Iterable[str]) -> int:
+        codes = list(dict.fromkeys(str(x) for x in codes))
+        with self.backend.tx() as c:
+            rows = self._rows_for_codes(c, codes, first_only=False)
+            c.executemany("DELETE FROM bons WHERE id = ?", ((rid,) for rid, _ in rows))
+            if rows:
+                self.backend.bump_rollups(c, [r for _, r in rows], -1)
+        return len(rows)
+
+class SqliteBackend:
+    """
+    Stockage SQLite (mode WAL) des bons, PDR et utilisateurs.
+    Chaque thread Streamlit a sa propre connexion ; les écritures passent par tx()
+    (BEGIN IMMEDIATE, ou SAVEPOINT si une transaction est déjà ouverte) et ne
+    touchent que les lignes concernées.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+        self.bons = SqliteBonStore(self)
+
+    def conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            c.create_function("py_lower", 1, lambda v: str(v).lower() if v is not None else "", deterministic=True)
+            c.create_function("py_fold", 1, fold_text, deterministic=True)
+            self._local.conn = c
+        return c
+
+    @contextmanager
+    def tx(self):
+        c = self.conn()
+        if c.in_transaction:
+            # dans un lot (batch) : seule cette mutation est annulée en cas d'erreur
+            c.execute("SAVEPOINT mutation")
+            try:
+                yield c
+            except BaseException:
+                c.execute("ROLLBACK TO mutation")
+                c.execute("RELEASE mutation")
+                raise
+            c.execute("RELEASE mutation")
+            return
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            yield c
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        c.execute("COMMIT")
+
+    @contextmanager
+    def batch(self):
+        """Lot de mutations validé par un seul COMMIT (verrou d'écriture SQLite)."""
+        with self.tx():
+            yield
+
+    def _init_schema(self) -> None:
+        cols = ", ".join(f"{_q(c)} TEXT NOT NULL DEFAULT ''" for c in BON_COLUMNS)
+        with self.tx() as c:
+            c.execute(f"CREATE TABLE IF NOT EXISTS bons (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols}, "
+                      "progress INTEGER NOT NULL DEFAULT 0)")
+            if "progress" not in {r[1] for r in c.execute("PRAGMA table_info(bons)")}:
+                # base créée avant la colonne d'avancement : ajout + calcul vectorisé
+                c.execute("ALTER TABLE bons ADD COLUMN progress INTEGER NOT NULL DEFAULT 0")
+                ids_rows = c.execute("SELECT id, " + ", ".join(_q(k) for k in BON_COLUMNS) + " FROM bons").fetchall()
+                if ids_rows:
+                    frame = pd.DataFrame([r[1:] for r in ids_rows], columns=BON_COLUMNS)
+                    c.executemany("UPDATE bons SET progress = ? WHERE id = ?",
+                                  zip(compute_progress_frame(frame).tolist(), (r[0] for r in ids_rows)))
+            for col in ("code", "date", "poste_de_charge", "technicien",
+                        "dpt_maintenance", "dpt_qualite", "dpt_production"):
+                c.execute(f"CREATE INDEX IF NOT EXISTS idx_bons_{col} ON bons({_q(col)})")
+            self.fts = self._init_search_index(c)
+            c.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            c.execute("CREATE TABLE IF NOT EXISTS rollups (dim TEXT NOT NULL, bucket TEXT NOT NULL, "
+                      "n INTEGER NOT NULL, PRIMARY KEY (dim, bucket))")
+            if not c.execute("SELECT 1 FROM rollups LIMIT 1").fetchone():
+                # rollups absents (base antérieure) : calcul initial depuis les bons
+                self.bump_rollups(c, [dict(zip(BON_COLUMNS, r)) for r in c.execute(
+                    "SELECT " + ", ".join(_q(k) for k in BON_COLUMNS) + " FROM bons").fetchall()], 1)
+            c.execute("CREATE TABLE IF NOT EXISTS pdr (code TEXT PRIMARY KEY, remplacement TEXT NOT NULL DEFAULT '', "
+                      "nom_composant TEXT NOT NULL DEFAULT '', quantite INTEGER NOT NULL DEFAULT 0)")
+            # registre des mouvements ; pdr.quantite en est le total cumulé, mis à jour dans la même transaction
+            c.execute("CREATE TABLE IF NOT EXISTS pdr_mouvements (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                      "ts TEXT NOT NULL, code TEXT NOT NULL, delta INTEGER NOT NULL, qte INTEGER NOT NULL, "
+                      "kind TEXT NOT NULL, bon TEXT NOT NULL DEFAULT '')")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_pdr_mouvements_code ON pdr_mouvements(code)")
+            c.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, username TEXT NOT NULL UNIQUE, "
+                      "password_hash TEXT NOT NULL, role TEXT NOT NULL)")
+
+    def is_empty(self) -> bool:
+        c = self.conn()
+        return not any(c.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone()
+                       for t in ("bons", "pdr", "pdr_mouvements", "users"))
+
+    def storage_info(self) -> Dict[str, Any]:
+        """Taille de la base et du WAL (octets)."""
+        return {"path": self.path, "bytes": _file_size(self.path), "wal_bytes": _file_size(self.path + "-wal")}
+
+    def compact(self) -> Dict[str, Any]:
+        """Checkpoint du WAL puis VACUUM (hors transaction) ; renvoie les tailles avant / après."""
+        before = self.storage_info()
+        c = self.conn()
+        c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        c.execute("VACUUM")
+        c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"before": before, "after": self.storage_info()}
+
+    def archive(self, month: str) -> Dict[str, int]:
+        raise ValueError("Archivage mensuel réservé au backend json (sqlite : requêtes par date indexées)")
+
+    @staticmethod
+    def insert_bons(c: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+        rows = [_normalize_bon_values(r) for r in rows]
+        if not rows:
+            return
+        progress = compute_progress_rows(rows)
+        sql = (f"INSERT INTO bons ({', '.join(_q(k) for k in BON_COLUMNS)}, progress) "
+               f"VALUES ({', '.join('?' for _ in BON_COLUMNS)}, ?)")
+        c.executemany(sql, ([("" if r.get(k) is None else r.get(k)) for k in BON_COLUMNS] + [pct]
+                            for r, pct in zip(rows, progress)))
+        SqliteBackend.bump_rollups(c, rows, 1)
+
+    @staticmethod
+    def _init_search_index(c: sqlite3.Connection) -> bool:
+        """
+        Table FTS5 (tokenizer trigram, contenu externe = bons) tenue à jour par triggers.
+        False si FTS5 / trigram n'est pas disponible (SQLite < 3.34) : recherche par instr().
+        """
+        cols = ", ".join(_q(f) for f in SEARCH_INDEX_FIELDS)
+        new_cols = ", ".join(f"new.{_q(f)}" for f in SEARCH_INDEX_FIELDS)
+        old_cols = ", ".join(f"old.{_q(f)}" for f in SEARCH_INDEX_FIELDS)
+        exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'bons_fts'").fetchone()
+        try:
+            c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS bons_fts USING fts5({cols}, "
+                      "content='bons', content_rowid='id', tokenize='trigram')")
+        except sqlite3.OperationalError:
+            return False
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS bons_fts_ai AFTER INSERT ON bons BEGIN "
+                  f"INSERT INTO bons_fts(rowid, {cols}) VALUES (new.id, {new_cols}); END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS bons_fts_ad AFTER DELETE ON bons BEGIN "
+                  f"INSERT INTO bons_fts(bons_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS bons_fts_au AFTER UPDATE OF {cols} ON bons BEGIN "
+                  f"INSERT INTO bons_fts(bons_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                  f"INSERT INTO bons_fts(rowid, {cols}) VALUES (new.id, {new_cols}); END")
+        if not exists:
+            c.execute("INSERT INTO bons_fts(bons_fts) VALUES ('rebuild')")   # base antérieure
+
+        # texte libre : mots sans accents (remove_diacritics 2), classement bm25()
+        cols = ", ".join(_q(f) for f in FULLTEXT_FIELDS)
+        new_cols = ", ".join(f"new.{_q(f)}" for f in FULLTEXT_FIELDS)
+        old_cols = ", ".join(f"old.{_q(f)}" for f in FULLTEXT_FIELDS)
+        exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'bons_text'").fetchone()
+        c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS bons_text USING fts5({cols}, "
+                  "content='bons', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS bons_text_ai AFTER INSERT ON bons BEGIN "
+                  f"INSERT INTO bons_text(rowid, {cols}) VALUES (new.id, {new_cols}); END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS bons_text_ad AFTER DELETE ON bons BEGIN "
+                  f"INSERT INTO bons_text(bons_text, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS bons_text_au AFTER UPDATE OF {cols} ON bons BEGIN "
+                  f"INSERT INTO bons_text(bons_text, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                  f"INSERT INTO bons_text(rowid, {cols}) VALUES (new.id, {new_cols}); END")
+        if not exists:
+            c.execute("INSERT INTO bons_text(bons_text) VALUES ('rebuild')")
+        return True
+
+    @staticmethod
+    def bump_rollups(c: sqlite3.Connection, rows: List[Dict[str, Any]], sign: int) -> None:
+        """
+        Répercute l'ajout (sign=1) ou le retrait (sign=-1) de lignes sur la table rollups
+        et incrémente la version des bons (meta.bons_version), dans la même transaction.
+        """
+        c.execute("INSERT INTO meta (key, value) VALUES ('bons_version', 1) "
+                  "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+        deltas = BonRollups()
+        for r in rows:
+            deltas.add(r)
+        params = [(dim, key, sign * n) for dim, counts in deltas.counts.items() for key, n in counts.items()]
+        if not params:
+            return
+        c.executemany("INSERT INTO rollups (dim, bucket, n) VALUES (?, ?, ?) "
+                      "ON CONFLICT(dim, bucket) DO UPDATE SET n = n + excluded.n", params)
+        if sign < 0:
+            c.execute("DELETE FROM rollups WHERE n <= 0")
+
+    def bon_add(self, entry: Dict[str, Any]) -> None:
+        """Ajout d'un bon + consommation de sa PDR dans une seule transaction."""
+        with self.tx() as c:
+            self.bons.add(entry)
+            code = str(entry.get("pdr_utilisee", "")).strip()
+            if code:
+                self.move_pdr(c, code, -1, "consommation", str(entry.get("code", "")))
+
+    def bons_import(self, entries: List[Dict[str, Any]], consume: Optional[Dict[str, int]] = None) -> None:
+        """Import en masse : bons + consommations PDR agrégées dans une seule transaction."""
+        with self.tx() as c:
+            self.bons.add_many(entries)
+            for code, n in (consume or {}).items():
+                self.move_pdr(c, code, -n, "consommation", "import")
+
+    # --- PDR ---
+    def pdr_all(self) -> List[Dict[str, Any]]:
+        cur = self.conn().execute("SELECT code, remplacement, nom_composant, quantite FROM pdr ORDER BY rowid")
+        return [dict(zip(PDR_COLUMNS, r)) for r in cur.fetchall()]
+
+    def pdr_get(self, code: str) -> Optional[Dict[str, Any]]:
+        r = self.conn().execute("SELECT code, remplacement, nom_composant, quantite FROM pdr WHERE code = ?",
+                                (str(code).strip(),)).fetchone()
+        return dict(zip(PDR_COLUMNS, r)) if r else None
+
+    def pdr_movements(self, code: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT id, ts, code, delta, qte, kind, bon FROM pdr_mouvements"
+        params: list = []
+        if code is not None:
+            sql += " WHERE code = ?"
+            params.append(str(code).strip())
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        cur = self.conn().execute(sql, params)
+        return [dict(zip(("id", "ts", "code", "delta", "qte", "kind", "bon"), r)) for r in cur.fetchall()]
+
+    @staticmethod
+    def move_pdr(c: sqlite3.Connection, code: str, delta: int, kind: str, bon: str = "") -> Optional[int]:
+        """Mouvement de stock (borné à 0) + total cumulé ; None si la PDR n'existe pas."""
+        if kind not in PDR_MOVEMENT_KINDS:
+            raise ValueError(f"Type de mouvement inconnu: {kind}")
+        r = c.execute("SELECT quantite FROM pdr WHERE code = ?", (code,)).fetchone()
+        if r is None:
+            return None
+        qte = max(0, r[0] + int(delta))
+        c.execute("UPDATE pdr SET quantite = ? WHERE code = ?", (qte, code))
+        c.execute("INSERT INTO pdr_mouvements (ts, code, delta, qte, kind, bon) VALUES (?, ?, ?, ?, ?, ?)",
+                  (datetime.now().isoformat(timespec="seconds"), code, qte - r[0], qte, kind, bon))
+        return qte
+
+    def pdr_replace_all(self, arr: List[Dict[str, Any]]) -> None:
+        with self.tx() as c:
+            c.execute("DELETE FROM pdr")
+            self.insert_pdr(c, arr)
+
+    @staticmethod
+    def insert_pdr(c: sqlite3.Connection, arr: List[Dict[str, Any]]) -> None:
+        c.executemany("INSERT OR REPLACE INTO pdr (code, remplacement, nom_composant, quantite) VALUES (?, ?, ?, ?)",
+                      ((str(p.get("code", "")).strip(), p.get("remplacement", ""), p.get("nom_composant", ""),
+                        int(p.get("quantite", 0) or 0)) for p in arr))
+
+    def pdr_upsert(self, rec: Dict[str, Any]) -> None:
+        with self.tx() as c:
+            c.execute("INSERT INTO pdr (code, remplacement, nom_composant, quantite) VALUES (?, ?, ?, 0) "
+                      "ON CONFLICT(code) DO UPDATE SET remplacement = excluded.remplacement, "
+                      "nom_composant = excluded.nom_composant",
+                      (rec["code"], rec["remplacement"], rec["nom_composant"]))
+            # l'écart avec la quantité saisie est enregistré comme un ajustement
+            current = c.execute("SELECT quantite FROM pdr WHERE code = ?", (rec["code"],)).fetchone()[0]
+            if int(rec["quantite"]) != current:
+                self.move_pdr(c, rec["code"], int(rec["quantite"]) - current, "ajustement")
+
+    def pdr_delete(self, code: str) -> None:
+        with self.tx() as c:
+            c.execute("DELETE FROM pdr WHERE code = ?", (str(code).strip(),))
+
+    def pdr_move(self, code: str, delta: int, kind: str) -> int:
+        with self.tx() as c:
+            qte = self.move_pdr(c, str(code).strip(), delta, kind)
+        if qte is None:
+            raise KeyError("PDR introuvable")
+        return qte
+
+    # --- Users ---
+    def users_all(self) -> List[Dict[str, Any]]:
+        cur = self.conn().execute("SELECT id, username, password_hash, role FROM users ORDER BY id")
+        return [dict(zip(("id", "username", "password_hash", "role"), r)) for r in cur.fetchall()]
+
+    def users_replace_all(self, arr: List[Dict[str, Any]]) -> None:
+        with self.tx() as c:
+            c.execute("DELETE FROM users")
+            self.insert_users(c, arr)
+
+    @staticmethod
+    def insert_users(c: sqlite3.Connection, arr: List[Dict[str, Any]]) -> None:
+        c.executemany("INSERT INTO users (id, username, password_hash, role) VALUES (?, ?, ?, ?)",
+                      ((u.get("id"), u.get("username", ""), u.get("password_hash", ""), u.get("role", ""))
+                       for u in arr))
+
+    def user_get(self, username: str) -> Optional[Dict[str, Any]]:
+        cur = self.conn().execute("SELECT id, username, password_hash, role FROM users WHERE username = ?", (username,))
+        r = cur.fetchone()
+        return dict(zip(("id", "username", "password_hash", "role"), r)) if r else None
+
+    def user_add(self, username: str, password_hash: str, role: str) -> None:
+        with self.tx() as c:
+            if c.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
+                raise ValueError("Utilisateur existe déjà")
+            c.execute("INSERT INTO users (id, username, password_hash, role) "
+                      "VALUES ((SELECT COALESCE(MAX(id), 0) + 1 FROM users), ?, ?, ?)",
+                      (username, password_hash, role))
+
+def migrate_json_to_sqlite(sqlite_path: str = None, files: Dict[str, str] = None,
+                           overwrite: bool = False) -> Dict[str, int]:
+    """
+    Migration one-shot des fichiers JSON (FILES) vers la base SQLite.
+    Refuse d'écraser une base non vide sauf overwrite=True. Retourne le nombre
+    de lignes importées par table.
+    """
+    files = files or FILES
+    backend = SqliteBackend(sqlite_path or SQLITE_PATH)
+    if not overwrite and not backend.is_empty():
+        raise ValueError("Base SQLite déjà initialisée (overwrite=True pour écraser)")
+    # snapshot + journal + mois archivés : passer par le BonStore pour n'oublier aucun bon ni mouvement de stock
+    store = BonStore(files["bon_travail"], files.get("bon_travail_journal"),
+                     ledger=PdrLedger(files["liste_pdr"], files.get("pdr_mouvements")),
+                     archive=_json_archive(files))
+    bons = store.all()
+    pdrs = store.read_ledger(lambda ledger: ledger.all())
+    movements = store.read_ledger(lambda ledger: ledger.movements())[::-1]
+    users = _read_json_file(files["users"]) or []
+    with backend.tx() as c:
+        for table in ("bons", "rollups", "pdr", "pdr_mouvements", "users"):
+            c.execute(f"DELETE FROM {table}")
+        backend.insert_bons(c, bons)
+        backend.insert_pdr(c, pdrs)
+        c.executemany("INSERT INTO pdr_mouvements (ts, code, delta, qte, kind, bon) VALUES (?, ?, ?, ?, ?, ?)",
+                      ((m["ts"], m["code"], m["delta"], m["qte"], m["kind"], m.get("bon", "")) for m in movements))
+        backend.insert_users(c, users)
+    return {"bons": len(bons), "pdr": len(pdrs), "pdr_mouvements": len(movements), "users": len(users)}
+
+# ---------------------------
+# Backend JSON (historique : un fichier par collection)
+# ---------------------------
+class JsonBackend:
+    """
+    Fichiers JSON de FILES ; les bons passent par le BonStore indexé.
+    Toutes les écritures se font sous un verrou inter-processus commun (.write.lock) ;
+    dans un lot, users.json n'est réécrit qu'une fois. Le stock PDR (PdrLedger) est
+    journalisé avec les bons ; les mois clos vont dans l'archive mensuelle (BonArchive).
+    """
+    name = "json"
+
+    def __init__(self, files: Dict[str, str]):
+        self.files = files
+        self.write_lock = FileLock(os.path.join(os.path.dirname(files["bon_travail"]), ".write.lock"))
+        self.bons = BonStore(files["bon_travail"], files.get("bon_travail_journal"), write_lock=self.write_lock,
+                             rollups_path=files.get("bon_travail_rollups"),
+                             ledger=PdrLedger(files["liste_pdr"], files.get("pdr_mouvements")),
+                             archive=_json_archive(files), columns_path=files.get("bon_travail_columns"))
+        self._pending: Optional[Dict[str, Any]] = None   # fichiers modifiés dans le lot en cours
+        self._batch_thread: Optional[int] = None
+
+    def _load(self, name: str) -> List[Dict[str, Any]]:
+        if self._pending is not None and threading.get_ident() == self._batch_thread and name in self._pending:
+            return self._pending[name]
+        return load_json(self.files[name]) or []
+
+    def _store(self, name: str, arr: List[Dict[str, Any]]) -> None:
+        if self._pending is not None and threading.get_ident() == self._batch_thread:
+            self._pending[name] = arr
+            return
+        with self.write_lock:
+            atomic_write(self.files[name], arr)
+
+    @contextmanager
+    def batch(self):
+        """Lot de mutations : un append au journal des bons, une réécriture par fichier modifié."""
+        with self.write_lock:
+            self.bons.begin_batch()
+            self._pending, self._batch_thread = {}, threading.get_ident()
+            ok = False
+            try:
+                yield
+                ok = True
+            finally:
+                pending, self._pending, self._batch_thread = self._pending, None, None
+                try:
+                    self.bons.end_batch(commit=ok)
+                finally:
+                    if ok:
+                        for name, arr in pending.items():
+                            atomic_write(self.files[name], arr)
+
+    def bon_add(self, entry: Dict[str, Any]) -> None:
+        """Ajout d'un bon + consommation de sa PDR : un seul enregistrement du journal."""
+        self.bons.add(entry, consume=str(entry.get("pdr_utilisee", "")).strip())
+
+    def bons_import(self, entries: List[Dict[str, Any]], consume: Optional[Dict[str, int]] = None) -> None:
+        self.bons.add_many(entries, consume)
+
+    # --- PDR ---
+    def pdr_all(self) -> List[Dict[str, Any]]:
+        return self.bons.read_ledger(lambda ledger: ledger.all())
+
+    def pdr_get(self, code: str) -> Optional[Dict[str, Any]]:
+        return self.bons.read_ledger(lambda ledger: ledger.get(code))
+
+    def pdr_movements(self, code: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.bons.read_ledger(lambda ledger: ledger.movements(code, limit))
+
+    def pdr_replace_all(self, arr: List[Dict[str, Any]]) -> None:
+        self.bons.commit_ledger(lambda ledger: PdrLedger.reset_record(arr))
+
+    def pdr_upsert(self, rec: Dict[str, Any]) -> None:
+        self.bons.commit_ledger(lambda ledger: ledger.upsert_record(rec))
+
+    def pdr_delete(self, code: str) -> None:
+        self.bons.commit_ledger(lambda ledger: {"op": "pdr_delete", "code": str(code).strip()})
+
+    def pdr_move(self, code: str, delta: int, kind: str) -> int:
+        def build(ledger: PdrLedger) -> Dict[str, Any]:
+            mv = ledger.movement(code, delta, kind)
+            if mv is None:
+                raise KeyError("PDR introuvable")
+            return {"op": "stock", "stock": [mv]}
+        return self.bons.commit_ledger(build)["stock"][0]["qte"]
+
+    # --- Maintenance ---
+    def storage_info(self) -> Dict[str, Any]:
+        """Taille du snapshot et état du journal des bons (enregistrements / octets en attente)."""
+        journal = self.bons.journal_stats()
+        info = {"path": self.files["bon_travail"], "bytes": _file_size(self.files["bon_travail"]),
+                "format": data_format(self.files["bon_travail"]),
+                "journal_records": journal["records"], "journal_bytes": journal["bytes"]}
+        archive = self.bons.archive_stats()
+        if archive:
+            info.update(archive_partitions=archive["partitions"], archive_bons=archive["bons"],
+                        archive_bytes=archive["bytes"])
+        return info
+
+    def compact(self) -> Dict[str, Any]:
+        """Replie le journal dans le snapshot (comme la compaction automatique) ; tailles avant / après."""
+        before = self.storage_info()
+        self.bons.compact()
+        return {"before": before, "after": self.storage_info()}
+
+    def archive(self, month: str) -> Dict[str, int]:
+        """Mois antérieurs à `month` (AAAA-MM) archivés en partitions gzip en lecture seule."""
+        return self.bons.archive_before(month)
+
+    # --- Users ---
+    def users_all(self) -> List[Dict[str, Any]]:
+        return self._load("users")
+
+    def users_replace_all(self, arr: List[Dict[str, Any]]) -> None:
+        self._store("users", arr)
+
+    def user_get(self, username: str) -> Optional[Dict[str, Any]]:
+        for u in self.users_all():
+            if u.get("username","") == username:
+                return u
+        return None
+
+    def user_add(self, username: str, password_hash: str, role: str) -> None:
+        with self.write_lock:
+            users = list(self.users_all())
+            if any(u.get("username","") == username for u in users):
+                raise ValueError("Utilisateur existe déjà")
+            new_id = (len(users) + 1) if users else 1
+            users.append({"id": new_id, "username": username, "password_hash": password_hash, "role": role})
+            self.users_replace_all(users)
+
+# ---------------------------
+# Écrivain unique + group commit (toutes les mutations du data layer)
+# ---------------------------
+class WriteCoordinator:
+    """
+    Exécute les mutations de toutes les sessions dans un seul thread écrivain.
+    Les mutations arrivées pendant la fenêtre de group commit sont validées
+    ensemble (backend.batch() : verrou inter-processus + une seule écriture).
+    La fenêtre n'est attendue que tant que le lot est plus petit que le précédent :
+    à charge constante, le commit part dès que les sessions servies au tour
+    d'avant ont resoumis, sans temps mort.
+    submit() renvoie le résultat de SA mutation ou lève SA propre exception ;
+    une mutation en échec n'empêche pas les autres du lot d'être validées.
+    """
+
+    def __init__(self, backend, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.backend = backend
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max_batch
+        self.stats = {"mutations": 0, "commits": 0, "failed": 0}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="bon-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[], Any]) -> Any:
+        if threading.current_thread() is self._thread:
+            return fn()   # mutation imbriquée : déjà dans le lot courant
+        fut: Future = Future()
+        self._queue.put((fn, fut))
+        return fut.result()
+
+    def _run(self) -> None:
+        expected = 1
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                # au-delà de la taille du lot précédent (les sessions qu'il a libérées), on
+                # n'attend plus : prendre ce qui est déjà arrivé sans laisser la fenêtre s'écouler
+                remaining = deadline - time.monotonic() if len(batch) < expected else 0
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            expected = len(batch)
+            self._execute(batch)
+
+    def _execute(self, batch: list) -> None:
+        outcomes = []
+        try:
+            with self.backend.batch():
+                for fn, fut in batch:
+                    try:
+                        outcomes.append((fut, True, fn()))
+                    except Exception as e:
+                        outcomes.append((fut, False, e))
+        except Exception as e:
+            # échec du commit lui-même : aucune mutation du lot n'est validée
+            for fut, ok, val in outcomes:
+                fut.set_exception(e if ok else val)
+            for _, fut in batch[len(outcomes):]:
+                fut.set_exception(e)
+            self.stats["failed"] += len(batch)
+            return
+        self.stats["commits"] += 1
+        for fut, ok, val in outcomes:
+            self.stats["mutations" if ok else "failed"] += 1
+            if ok:
+                fut.set_result(val)
+            else:
+                fut.set_exception(val)
+
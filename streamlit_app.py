@@ -1,57 +1,30 @@
 # app.py (Version Final - script corrigé)
-import os
-import json
+# Interface Streamlit ; données, stockage, export et import : package bon_travail
 import io
-import hashlib
-from datetime import datetime, date
-from typing import List, Dict, Any, Optional
+import os
+from collections import deque
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Optional, Callable
 
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
-from openpyxl.drawing.image import Image as XLImage
-#================================================================================================
-# ---------- Helpers : normalisation dates & sanitization ----------
-from datetime import datetime, date
-
-def _to_date_obj(val):
-    """
-    Retourne un datetime.date à partir de:
-      - datetime.date (retourné tel quel)
-      - datetime.datetime (on prend .date())
-      - str (formats courants : 'YYYY-MM-DD' ou 'YYYY/MM/DD')
-      - None / autre -> date.today()
-    """
-    if isinstance(val, date) and not isinstance(val, datetime):
-        return val
-    if isinstance(val, datetime):
-        return val.date()
-    if isinstance(val, str):
-        for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y"):
-            try:
-                return datetime.strptime(val, fmt).date()
-            except Exception:
-                pass
-    return date.today()
-
-def _sanitize_row_for_storage(row: dict) -> dict:
-    """
-    Transforme toute valeur date/datetime en string 'YYYY-MM-DD' pour éviter
-    erreurs de sérialisation JSON lors de l'écriture en fichier / base.
-    """
-    sanitized = {}
-    for k, v in row.items():
-        if isinstance(v, (datetime, date)):
-            sanitized[k] = v.strftime("%Y-%m-%d")
-        else:
-            sanitized[k] = v
-    return sanitized
 
-#================================================================================================
+from bon_travail.config import FILES, PROFILE_ENABLED, PROFILE_KEEP_RUNS, PROFILE_TRACEMALLOC
+from bon_travail.model import BON_COLUMNS, PDR_COLUMNS, _to_date_obj, hash_password
+from bon_travail.jsonio import read_options, write_options
+from bon_travail.profiling import PROFILER, profiled
+from bon_travail.query import BonQuery
+from bon_travail.downtime import DOWNTIME_DIMENSIONS, STAT_LABELS
+from bon_travail.api import (
+    read_bon_codes, run_query, count_bons, mean_progress, get_bon_by_code, bon_exists,
+    search_query, search_fulltext, read_rollup, iter_bons, bons_data_version, downtime_report,
+    add_bon, update_bon, delete_bon, update_bons, delete_bons,
+    read_pdr, read_pdr_movements, move_pdr, restock_pdr, upsert_pdr, delete_pdr_by_code,
+    read_users, get_user, create_user,
+)
+# graphiques (matplotlib), export (openpyxl) et import : importés par les pages qui
+# s'en servent, pas à chaque démarrage de session
 
 # ---------------------------
 # Configuration & thème
@@ -84,398 +57,111 @@ st.markdown(
 st.title("Work Order Management")
 
 # ---------------------------
-# Data files
-# ---------------------------
-DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-os.makedirs(DATA_DIR, exist_ok=True)
-
-FILES = {
-    "bon_travail": os.path.join(DATA_DIR, "bon_travail.json"),
-    "liste_pdr": os.path.join(DATA_DIR, "liste_pdr.json"),
-    "users": os.path.join(DATA_DIR, "users.json"),
-    "options_description_probleme": os.path.join(DATA_DIR, "options_description_probleme.json"),
-    "options_poste_de_charge": os.path.join(DATA_DIR, "options_poste_de_charge.json"),
-}
-
-# Initial values (copiées depuis ta Version Final)
-INITIAL_DESCRIPTIONS = [
-    'P.M.I.01-Panne au niveau du capos',"P.M.I.02-problème d'éjecteur de moule",'P.M.I.03-Blocage  moule',
-    'P.M.I.04-Problème de tiroir','P.M.I.05-Cassure vis sortie plaque carotte','P.M.I.06-Blocage de la plaque carotte',
-    'P.M.I.07-Vis de noyaux endommagé','P.M.I.08-Problème noyau',"P.M.I.09-Problème vis d'injection",'P.M.I.10-Réducteur',
-    'P.M.I.11-Roue dentée ','P.M.I.12-PB grenouillère','P.M.I.13-Vis de pied endommagé','P.M.I.14-Colonnes de guidage ',
-    "P.M.I.15-Fuite matiére au niveau de la buse d'injection",
-    'P.E.I.01-PB capteur ','P.E.I.02-PB galet (fin de course)','P.E.I.03-PB moteur électrique','P.E.I.04-Capteur linéaire',
-    'P.E.I.05-Armoire électrique ','P.E.I.06-Écran/tactile',"P.E.I.07-Machine s'allume pas","P.E.I.08-PB d'électrovanne",
-    'P.E.I.09-PB connecteur ','P.E.I.10-Système magnétique',
-    'P.H.I.01-PB flexible','P.H.I.02-PB raccord','P.H.I.03-PB vérin','P.H.I.04-PB distributeur','P.H.I.05-PB pompe',
-    'P.H.I.06-PB filtre','P.H.I.07-PB au niveau huile','P.H.I.08-PB fuite huile','P.H.I.09-PB préchauffage',
-    'P.H.I.10-PB lubrification du canalisation de grenouillère',
-    'P.P.I.01-PB de pression','P.P.I.02-Remplissage matière ','P.P.I.03-Alimentation matiére ',
-    'P.P.I.04-Flexible pneumatique','P.P.I.05-PB raccord',
-    'P.T.I.01-PB collier chauffante','P.T.I.02-PB de thermocouple','P.T.I.03-Zone de chauffage en arrêt',
-    'P.T.I.04-PB refroidisseur',"P.T.I.05-PB pression d'eau",'P.T.I.06-PB température sécheur',
-    'P.T.I.07-Variation de la température (trop élever/trop bas )'
-]
-
-INITIAL_POSTES = [
-    'ASL011','ASL021','ASL031','ASL041','ASL051','ASL061','ASL071',
-    'ASL012','ASL022','ASL032','ASL042','ASL052','ASL062','ASL072',
-    'ACL011','ACL021','ACL031','ACL041','ACL051','ACL061','ACL071','APCL011','APCL021','APCL031',
-    'CL350-01 HOUSING','CL350-02 HOUSING','CL350-03 BRAKET ','CL120-01 SUR MOULAGE (LEVIET)','CL120-02 SUR MOULAGE (LEVIET)',
-    'M. Shifter Ball', 'M. Knob clip-lever MA','M. Knob clip-lever MB6', 'M. Guides for trigger', 'M. Damper',
-    'M. MB6-HIGH HOUSING', 'M. MB6-LOW HOUSING','M. MA-HIGH HOUSING', 'M. MA-LOW HOUSING', 'M. BRAKET MA'
-]
-
-# ---------------------------
-# Fichiers utilitaires atomiques
+# Pareto : affichage (rendu PNG mis en cache : bon_travail.charts)
 # ---------------------------
-def atomic_write(path: str, obj: Any) -> None:
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
-
-def load_json(path: str) -> Any:
-    if not os.path.exists(path):
-        return None
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def ensure_data_files():
-    if load_json(FILES["bon_travail"]) is None:
-        atomic_write(FILES["bon_travail"], [])
-    if load_json(FILES["liste_pdr"]) is None:
-        atomic_write(FILES["liste_pdr"], [])
-    if load_json(FILES["users"]) is None:
-        atomic_write(FILES["users"], [])
-    if load_json(FILES["options_description_probleme"]) is None:
-        atomic_write(FILES["options_description_probleme"], INITIAL_DESCRIPTIONS.copy())
-    if load_json(FILES["options_poste_de_charge"]) is None:
-        atomic_write(FILES["options_poste_de_charge"], INITIAL_POSTES.copy())
-
-ensure_data_files()
-
-def read_options(name: str) -> List[str]:
-    path = FILES.get(name)
-    if path and os.path.exists(path):
-        return load_json(path) or []
-    return []
-
-def write_options(name: str, opts: List[str]):
-    path = FILES.get(name)
-    if path:
-        atomic_write(path, opts)
-
-
-# ---------------------------
-# Hash mot de passe
-# ---------------------------
-def hash_password(pwd: str) -> str:
-    return hashlib.sha256((pwd or "").encode("utf-8")).hexdigest()
-
-# ---------------------------
-# CRUD Bons (colonnes originales)
-# ---------------------------
-BON_COLUMNS = [
-    "code","date","arret_declare_par","poste_de_charge","heure_declaration","machine_arreter",
-    "heure_debut_intervention","heure_fin_intervention","technicien","description_probleme",
-    "action","pdr_utilisee","observation","resultat","condition_acceptation","dpt_maintenance","dpt_qualite","dpt_production"
-]
-
-def read_bons() -> List[Dict[str, Any]]:
-    arr = load_json(FILES["bon_travail"])
-    return arr or []
-
-def write_bons(arr: List[Dict[str, Any]]):
-    atomic_write(FILES["bon_travail"], arr)
-
-def get_bon_by_code(code: str) -> Optional[Dict[str, Any]]:
-    for r in read_bons():
-        if str(r.get("code","")) == str(code):
-            return r
-    return None
-
-def add_bon(bon: Dict[str, Any]) -> None:
-    bons = read_bons()
-    if get_bon_by_code(bon.get("code")) is not None:
-        raise ValueError("Code déjà présent")
-
-    # --- Normaliser avant stockage ---
-    entry = {k: bon.get(k, "") for k in BON_COLUMNS}
-    # Si une valeur est un objet date/datetime → convertir en string
-    for k, v in entry.items():
-        if isinstance(v, (datetime, date)):
-            entry[k] = v.strftime("%Y-%m-%d")
-
-    bons.append(entry)
-    write_bons(bons)
-
-    # décrémenter PDR si fourni (si PDR existe)
-    pdr_code = str(entry.get("pdr_utilisee","")).strip()
-    if pdr_code:
-        pdrs = read_pdr()
-        for i, p in enumerate(pdrs):
-            if str(p.get("code","")).strip() == pdr_code:
-                q = int(p.get("quantite",0) or 0)
-                p["quantite"] = max(0, q-1)
-                pdrs[i] = p
-                write_pdr(pdrs)
-                break
-
-def update_bon(code: str, updates: Dict[str, Any]) -> None:
-    bons = read_bons()
-    found = False
-    for i, r in enumerate(bons):
-        if str(r.get("code","")) == str(code):
-            for k in BON_COLUMNS:
-                if k in updates:
-                    val = updates[k]
-                    # Normaliser les dates avant stockage
-                    if isinstance(val, (datetime, date)):
-                        val = val.strftime("%Y-%m-%d")
-                    r[k] = val
-            bons[i] = r
-            found = True
-            break
-    if not found:
-        raise KeyError("Code introuvable")
-    write_bons(bons)
-
-def compute_progress(bon: Dict[str, Any]) -> int:
+@profiled("chart.plot_pareto")
+def plot_pareto(period_counts: Dict[str, int], period: str = "day", top_n_labels: int = 3,
+                version: Optional[tuple] = None):
     """
-    Retourne un pourcentage d'avancement (int 0..100) basé sur les colonnes:
-      dpt_production, dpt_maintenance, dpt_qualite (logique inchangée mais sécurisée).
-    - 100% si les 3 dpt == "Valider"
-    - Sinon, % = (nombre de champs non vides parmi BON_COLUMNS / len(BON_COLUMNS)) * 100
-    Toujours renvoie un int entre 0 et 100.
+    Pareto par période à partir des comptes déjà agrégés (read_rollup(period)).
+    Avec `version` (bons_data_version), le rendu est servi par le ChartCache.
     """
-    try:
-        # Si les 3 validations sont 'Valider' => 100%
-        if bon.get("dpt_production") == "Valider" and \
-           bon.get("dpt_maintenance") == "Valider" and \
-           bon.get("dpt_qualite") == "Valider":
-            return 100
-
-        # Comptage sécurisé des champs non vides
-        filled = sum(1 for k, v in bon.items() if v not in ("", None))
-        total_columns = len(BON_COLUMNS) if len(BON_COLUMNS) > 0 else 1
-        progress = int((filled / total_columns) * 100)
-
-        # Borner la valeur entre 0 et 100
-        return max(0, min(100, progress))
-    except Exception:
-        # En cas d'erreur imprévue, retourner 0 (sécurité)
-        return 0
-
-def delete_bon(code: str) -> None:
-    bons = read_bons()
-    bons = [r for r in bons if str(r.get("code","")) != str(code)]
-    write_bons(bons)
-
-# ---------------------------
-# PDR CRUD (garde les fonctions si tu veux la page)
-# ---------------------------
-PDR_COLUMNS = ["code","remplacement","nom_composant","quantite"]
-
-def read_pdr() -> List[Dict[str, Any]]:
-    arr = load_json(FILES["liste_pdr"])
-    return arr or []
-
-def write_pdr(arr: List[Dict[str, Any]]):
-    atomic_write(FILES["liste_pdr"], arr)
-
-def upsert_pdr(rec: Dict[str, Any]):
-    pdrs = read_pdr()
-    code = str(rec.get("code","")).strip()
-    if not code:
-        raise ValueError("Code PDR requis")
-    for i,p in enumerate(pdrs):
-        if str(p.get("code","")).strip() == code:
-            pdrs[i] = {"code": code, "remplacement": rec.get("remplacement",""), "nom_composant": rec.get("nom_composant",""), "quantite": int(rec.get("quantite",0))}
-            write_pdr(pdrs)
-            return
-    pdrs.append({"code": code, "remplacement": rec.get("remplacement",""), "nom_composant": rec.get("nom_composant",""), "quantite": int(rec.get("quantite",0))})
-    write_pdr(pdrs)
-
-def delete_pdr_by_code(code: str):
-    pdrs = read_pdr()
-    pdrs = [p for p in pdrs if str(p.get("code","")).strip() != str(code).strip()]
-    write_pdr(pdrs)
-
-# ---------------------------
-# Users helpers
-# ---------------------------
-def read_users() -> List[Dict[str, Any]]:
-    arr = load_json(FILES["users"])
-    return arr or []
-
-def write_users(arr: List[Dict[str, Any]]):
-    atomic_write(FILES["users"], arr)
-
-def get_user(username: str) -> Optional[Dict[str,Any]]:
-    for u in read_users():
-        if u.get("username","") == username:
-            return u
-    return None
-
-def create_user(username: str, password: str, role: str):
-    users = read_users()
-    if get_user(username):
-        raise ValueError("Utilisateur existe déjà")
-    new_id = (len(users) + 1) if users else 1
-    users.append({"id": new_id, "username": username, "password_hash": hash_password(password), "role": role})
-    write_users(users)
-
-
-
-# ---------------------------
-# plot_pareto (défini avant usage pour les periode)
-# ---------------------------
-def plot_pareto(df: pd.DataFrame, period: str = "day", top_n_labels: int = 3):
-    s = pd.to_datetime(df['date'], errors='coerce').dropna()
-    if s.empty:
+    if not period_counts:
         st.info("Aucune date valide pour tracer le Pareto.")
         return
-    if period == "day":
-        groups = s.dt.strftime("%Y-%m-%d")
-        xlabel = "Jour"
-    elif period == "week":
-        groups = s.dt.strftime("%Y-W%U")
-        xlabel = "Semaine"
+    from bon_travail.charts import get_chart_cache, render_pareto
+    render = lambda: render_pareto(period_counts, period, top_n_labels)
+    if version is None:
+        png, top = render()
     else:
-        groups = s.dt.strftime("%Y-%m")
-        xlabel = "Mois"
-
-    counts = groups.value_counts().sort_values(ascending=False)
-    total = counts.sum()
-    if total == 0:
+        png, top = get_chart_cache().get_or_render(("pareto", version, period, top_n_labels), render)
+    if not png:
         st.info("Pas assez de données.")
         return
-    cum_pct = 100 * counts.cumsum() / total
-
-    fig, ax1 = plt.subplots(figsize=(10,4))
-    fig.patch.set_facecolor("#f8fbff")
-    ax1.set_facecolor("#ffffff")
-
-    x = np.arange(len(counts))
-    cmap = plt.get_cmap("viridis")
-    colors = cmap(np.linspace(0.2, 0.8, len(counts)))
-    bars = ax1.bar(x, counts.values, color=colors, edgecolor="#2b2b2b", linewidth=0.2)
-    ax1.set_xticks(x)
-    ax1.set_xticklabels(counts.index.tolist(), rotation=45, ha='right', fontsize=9)
-    ax1.set_ylabel("Nombre d'interventions")
-    ax1.set_xlabel(xlabel)
-    ax1.set_title(f"Pareto ({period}) - total = {total}", fontsize=12, weight="bold")
-    ax1.grid(axis="y", alpha=0.12)
-
-    ax2 = ax1.twinx()
-    ax2.plot(x, cum_pct.values, color='#ff7f0e', marker='o', linewidth=2)
-    ax2.set_ylim(0, 110)
-    ax2.set_ylabel("Pourcentage cumulé (%)", color='#ff7f0e')
-    ax2.tick_params(axis='y', labelcolor='#ff7f0e')
-    ax2.axhline(80, color='grey', linestyle='--', alpha=0.6)
-
-    # annotate top
-    top = counts.head(top_n_labels)
-    for idx, (label, val) in enumerate(counts.items()):
-        if idx < top_n_labels:
-            pct = val/total*100
-            ax1.text(idx, val + max(counts.values)*0.02, f"{val} ({pct:.1f}%)", ha='center', fontsize=9, bbox=dict(boxstyle="round", alpha=0.18))
-
-    plt.tight_layout()
-    st.pyplot(fig)
+    st.image(png)
 
     st.markdown("**Périodes les plus impactées :**")
-    for i, (label, val) in enumerate(top.items(), start=1):
-        st.write(f"{i}. **{label}** — {val} interventions — {val/total*100:.1f}%")
-
+    for i, (label, val, pct) in enumerate(top, start=1):
+        st.write(f"{i}. **{label}** — {val} interventions — {pct:.1f}%")
 
-# ---------------------------
-# plot_paretoo (par type de problème avec filtre)
-# ---------------------------
-def plot_paretoo(df: pd.DataFrame, top_n_labels: int = 5):
-    if "description_probleme" not in df.columns:
-        st.warning("La colonne 'description_probleme' est absente des données.")
-        return
 
+@profiled("chart.plot_paretoo")
+def plot_paretoo(type_counts: Dict[str, int], top_n_labels: int = 5, version: Optional[tuple] = None):
+    """
+    Pareto par type de problème à partir de read_rollup("description_probleme").
+    Avec `version` (bons_data_version), le rendu est servi par le ChartCache.
+    """
     # --- Sélecteur de type de problème ---
-    types = df["description_probleme"].dropna().unique().tolist()
-    types = sorted([str(t) for t in types])
+    types = sorted(str(t) for t in type_counts)
     selected_type = st.selectbox("Filtrer par type de problème :", ["Tous"] + types)
 
-    # --- Filtrage ---
+    # --- Filtrage (lecture directe du bucket) ---
     if selected_type != "Tous":
-        df = df[df["description_probleme"] == selected_type]
+        type_counts = {selected_type: type_counts.get(selected_type, 0)}
 
-    counts = df["description_probleme"].value_counts().sort_values(ascending=False)
-    total = counts.sum()
-    if total == 0:
+    from bon_travail.charts import get_chart_cache, render_paretoo
+    render = lambda: render_paretoo(type_counts, top_n_labels)
+    if version is None:
+        png, top = render()
+    else:
+        png, top = get_chart_cache().get_or_render(("paretoo", version, selected_type, top_n_labels), render)
+    if not png:
         st.info("Pas assez de données après filtrage.")
         return
-
-    cum_pct = 100 * counts.cumsum() / total
-
-    fig, ax1 = plt.subplots(figsize=(10,4))
-    fig.patch.set_facecolor("#f8fbff")
-    ax1.set_facecolor("#ffffff")
-
-    x = np.arange(len(counts))
-    cmap = plt.get_cmap("viridis")
-    colors = cmap(np.linspace(0.2, 0.8, len(counts)))
-    ax1.bar(x, counts.values, color=colors, edgecolor="#2b2b2b", linewidth=0.2)
-
-    ax1.set_xticks(x)
-    ax1.set_xticklabels(counts.index.tolist(), rotation=45, ha='right', fontsize=9)
-    ax1.set_ylabel("Nombre d'occurrences")
-    ax1.set_xlabel("Type de problème")
-    ax1.set_title(f"Pareto des problèmes - total = {total}", fontsize=12, weight="bold")
-    ax1.grid(axis="y", alpha=0.12)
-
-    ax2 = ax1.twinx()
-    ax2.plot(x, cum_pct.values, color='#ff7f0e', marker='o', linewidth=2)
-    ax2.set_ylim(0, 110)
-    ax2.set_ylabel("Pourcentage cumulé (%)", color='#ff7f0e')
-    ax2.tick_params(axis='y', labelcolor='#ff7f0e')
-    ax2.axhline(80, color='grey', linestyle='--', alpha=0.6)
-
-    # --- Annoter les top problèmes ---
-    top = counts.head(top_n_labels)
-    for idx, (label, val) in enumerate(counts.items()):
-        if idx < top_n_labels:
-            pct = val/total*100
-            ax1.text(idx, val + max(counts.values)*0.02,
-                     f"{val} ({pct:.1f}%)",
-                     ha='center', fontsize=9,
-                     bbox=dict(boxstyle="round", alpha=0.18))
-
-    plt.tight_layout()
-    st.pyplot(fig)
+    st.image(png)
 
     st.markdown("**Problèmes les plus récurrents :**")
-    for i, (label, val) in enumerate(top.items(), start=1):
-        st.write(f"{i}. **{label}** — {val} fois — {val/total*100:.1f}%")
+    for i, (label, val, pct) in enumerate(top, start=1):
+        st.write(f"{i}. **{label}** — {val} fois — {pct:.1f}%")
+
 
 
 
 # ---------------------------
-# Export Excel utilitaire (page d'export possible)
+# Temps d'arrêt & MTTR (calcul et cache : bon_travail.downtime)
 # ---------------------------
-def export_excel(bons: List[Dict[str,Any]]) -> bytes:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Bon de travail"
-    start_row = 1
-    for col_idx, h in enumerate(BON_COLUMNS, start=1):
-        ws.cell(row=start_row, column=col_idx).value = h
-        ws.cell(row=start_row, column=col_idx).font = Font(bold=True)
-    rownum = start_row + 1
-    for r in bons:
-        for col_idx, h in enumerate(BON_COLUMNS, start=1):
-            ws.cell(row=rownum, column=col_idx).value = r.get(h, "")
-        rownum += 1
-    bio = io.BytesIO()
-    wb.save(bio)
-    return bio.getvalue()
+# fenêtre -> nombre de jours jusqu'à aujourd'hui (None : tout l'historique)
+DOWNTIME_WINDOWS = {"30 derniers jours": 30, "90 derniers jours": 90, "12 derniers mois": 365,
+                    "Tout l'historique": None, "Période personnalisée": None}
+
+def _fmt_duration(value: Optional[float], unit: str) -> str:
+    return "—" if value is None else f"{value:.1f} {unit}"
+
+@profiled("dashboard.downtime")
+def show_downtime():
+    """Indicateurs du parc puis tableau par poste / famille de problème / technicien."""
+    c1, c2, c3 = st.columns([2, 2, 3])
+    dimension = c1.selectbox("Regrouper par :", list(DOWNTIME_DIMENSIONS), format_func=DOWNTIME_DIMENSIONS.get,
+                             key="downtime_dimension")
+    window = c2.selectbox("Fenêtre :", list(DOWNTIME_WINDOWS), index=1, key="downtime_window")
+    today = date.today()
+    date_from = date_to = ""
+    if DOWNTIME_WINDOWS[window]:
+        date_from, date_to = (today - timedelta(days=DOWNTIME_WINDOWS[window] - 1)).isoformat(), today.isoformat()
+    elif window == "Période personnalisée":
+        picked = c3.date_input("Du / au", value=(today - timedelta(days=29), today), key="downtime_range")
+        if len(picked) != 2:
+            st.info("Choisir la date de fin de la période.")
+            return
+        date_from, date_to = picked[0].isoformat(), picked[1].isoformat()
+
+    table, summary = downtime_report(dimension, date_from, date_to)
+    if not summary["bons"]:
+        st.info("Aucun bon sur cette période.")
+        return
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("MTTR", _fmt_duration(summary["mttr_min"], "min"))
+    k2.metric("Temps de réponse moyen", _fmt_duration(summary["reponse_moy_min"], "min"))
+    k3.metric("Temps d'arrêt total", _fmt_duration(summary["arret_total_h"], "h"))
+    k4.metric("MTBF", _fmt_duration(summary["mtbf_h"], "h"))
+    table.index.name = DOWNTIME_DIMENSIONS[dimension]
+    st.dataframe(table.rename(columns=STAT_LABELS).round(1), height=320)
+    st.caption(f"{summary['bons']} bons, {summary['arrets']} arrêts machine, {summary['postes']} postes. "
+               "MTTR : durée moyenne début → fin d'intervention ; temps d'arrêt : déclaration → fin "
+               "(machine arrêtée) ; MTBF : temps de marche / arrêts.")
+    if summary["heures_invalides"]:
+        st.caption(f"{summary['heures_invalides']} bon(s) avec une heure illisible ou incohérente : "
+                   "durées concernées ignorées.")
 
 # ---------------------------
 # Helpers session: charger / clear valeur formulaire (page-scoped)
@@ -507,13 +193,38 @@ def clear_form_session(page_name: str):
     for k in BON_COLUMNS:
         st.session_state[f"{page_name}_form_{k}"] = ""
 
+# ---------------------------
+# Début du relevé de ce rerun (panneau Diagnostic)
+# ---------------------------
+if PROFILE_ENABLED:
+    PROFILER.begin_run(st.session_state.get("user") or "")
+
 # ---------------------------
 # Header - logo si disponible
 # ---------------------------
-logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logo REGAL-PNG.png")
-if os.path.exists(logo_path):
+@st.cache_resource
+def load_image_asset(name: str, width: int) -> Optional[bytes]:
+    """
+    Image du répertoire de l'application, lue et ramenée à `width` px une seule fois
+    par processus (PNG en mémoire) : st.image n'a plus à relire ni redimensionner
+    le fichier à chaque rerun. None si le fichier est absent ou illisible.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
     try:
-        st.image(logo_path, width=200)
+        from PIL import Image
+        with Image.open(path) as img:
+            if img.width > width:
+                img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+            buf = io.BytesIO()
+            img.save(buf, format="PNG")
+    except OSError:
+        return None
+    return buf.getvalue()
+
+logo = load_image_asset("logo REGAL-PNG.png", 200)
+if logo:
+    try:
+        st.image(logo, width=200)
     except Exception:
         pass
 
@@ -603,7 +314,8 @@ if not users:
 # ---------------------------
 # Sidebar menu (Pages)
 # ---------------------------
-menu = st.sidebar.radio("Pages", ["Dashboard","Production","Maintenance","Qualité"])
+menu = st.sidebar.radio("Pages", ["Dashboard","Production","Maintenance","Qualité","Pièces (PDR)","Export Excel","Import"],
+                        key="menu")
 
 # ---------------------------
 # Permissions helper
@@ -614,26 +326,109 @@ def allowed(page: str) -> bool:
         return True
     if role == "production" and page == "Production":
         return True
-    if role == "maintenance" and page == "Maintenance":
+    if role == "maintenance" and page in ("Maintenance", "Pièces (PDR)"):
         return True
     if role == "qualite" and page == "Qualité":
         return True
     return False
 
+# Champs modifiables depuis chaque page (formulaire et actions groupées)
+EDITABLE_FIELDS = {
+    "Production": {
+        "code","date", "heure_declaration", "description_probleme", "arret_declare_par",
+        "poste_de_charge", "machine_arreter", "resultat", "condition_acceptation", "dpt_production"
+    },
+    "Maintenance": {
+        "heure_debut_intervention", "heure_fin_intervention", "technicien","action","pdr_utilisee", "observation", "dpt_maintenance"
+    },
+    "Qualité": {
+        "dpt_qualite"
+    },
+}
+# Département validé depuis chaque page
+PAGE_DPT_FIELD = {"Production": "dpt_production", "Maintenance": "dpt_maintenance", "Qualité": "dpt_qualite"}
+
+def editable_fields(page_name: str) -> set:
+    name = page_name.lower()
+    if name.startswith("production"):
+        return EDITABLE_FIELDS["Production"]
+    if name.startswith("maintenance"):
+        return EDITABLE_FIELDS["Maintenance"]
+    if name.startswith("qualit"):
+        return EDITABLE_FIELDS["Qualité"]
+    return set()
+
+def bulk_update_bons(page_name: str, codes: List[str], updates: Dict[str, Any]) -> int:
+    """Action groupée depuis une page : allowed() et champs modifiables de la page vérifiés."""
+    if not allowed(page_name):
+        raise PermissionError("Vous n'avez pas la permission pour cette page.")
+    forbidden = sorted(set(updates) - editable_fields(page_name))
+    if forbidden:
+        raise PermissionError(f"Champ(s) non modifiable(s) depuis {page_name} : {', '.join(forbidden)}")
+    return update_bons(codes, updates)
+
+def bulk_delete_bons(page_name: str, codes: List[str]) -> int:
+    if not allowed(page_name):
+        raise PermissionError("Vous n'avez pas la permission pour cette page.")
+    return delete_bons(codes)
+
+# ---------------------------
+# Tableaux paginés (tri et découpage côté store)
+# ---------------------------
+PAGE_SIZES = [25, 50, 100, 200]
+
+def paged_bons_table(key: str, columns: List[str], style: Optional[Callable[[pd.DataFrame], Any]] = None,
+                     height: int = 300, selectable: bool = False) -> pd.DataFrame:
+    """
+    Tableau des bons paginé : seule la page visible est lue, sérialisée et stylée.
+    La colonne "Progression (%)" de `columns` est servie par l'avancement du store.
+    Avec `selectable`, une colonne à cocher "Sélection" précède les colonnes (actions groupées).
+    Retourne le DataFrame de la page affichée.
+    """
+    sort_labels = {c: c for c in columns}
+    sort_labels.pop("Progression (%)", None)
+    if "Progression (%)" in columns:
+        sort_labels["Progression (%)"] = "progress"
+    c1, c2, c3, c4 = st.columns([2, 1, 1, 1])
+    sort_label = c1.selectbox("Trier par", list(sort_labels), index=list(sort_labels).index("date")
+                              if "date" in sort_labels else 0, key=f"{key}_sort")
+    descending = c2.radio("Ordre", ["Décroissant", "Croissant"], key=f"{key}_dir", horizontal=True) == "Décroissant"
+    page_size = c3.selectbox("Lignes / page", PAGE_SIZES, index=1, key=f"{key}_size")
+    total = count_bons()
+    n_pages = max(1, -(-total // page_size))
+    page_no = c4.number_input(f"Page (/{n_pages})", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page")
+
+    # total déjà compté pour la pagination : la page seule est lue
+    q = BonQuery().order(sort_labels[sort_label], descending).offset((int(page_no) - 1) * page_size).limit(page_size)
+    bons, progress, _ = run_query(q, with_progress=True)
+    with PROFILER.section("table.dataframe"):
+        df = pd.DataFrame(bons, columns=BON_COLUMNS)
+        df["Progression (%)"] = progress
+        df = df[columns]
+    st.caption(f"{len(df)} bons affichés sur {total}")
+    if selectable:
+        df.insert(0, "Sélection", False)
+        # clé liée à la page et aux données : la sélection ne glisse pas sur d'autres lignes
+        editor_key = f"{key}_editor_{sort_label}_{descending}_{page_size}_{page_no}_{bons_data_version()[1]}"
+        with PROFILER.section("table.render"):
+            return st.data_editor(df, height=height, hide_index=True, key=editor_key,
+                                  disabled=[c for c in df.columns if c != "Sélection"])
+    # Styler + sérialisation Arrow vers le navigateur
+    with PROFILER.section("table.render"):
+        st.dataframe(df.style.apply(style, axis=None) if style is not None else df, height=height)
+    return df
+
 def page_dashboard():
     st.markdown(
         '<div class="app-header" style="background: linear-gradient(90deg, #2b6ea3, #6ea0c8);">'
-        "<h3 style='margin:6px 0'>Tableau de bord — Pareto & résumé</h3></div>",
+        "<h3 style='margin:6px 0'>Tableau de bord — Pareto, temps d'arrêt & résumé</h3></div>",
         unsafe_allow_html=True,
     )
 
-    bons = read_bons()
-    if not bons:
+    if count_bons() == 0:
         st.info("Aucun bon enregistré.")
         return
 
-    df = pd.DataFrame(bons)
-
     # Colonnes affichées dans le tableau résumé
     display_cols = ["code", "date", "dpt_production", "dpt_maintenance", "dpt_qualite"]
 
@@ -645,6 +440,9 @@ def page_dashboard():
     # Analyse Pareto
     # ---------------------------
     st.markdown("### Analyse Pareto")
+    # version lue avant les rollups : une écriture concurrente ne peut pas associer
+    # des comptes périmés à une version plus récente dans le cache des graphiques
+    data_version = bons_data_version()
     col_p1, col_p2 = st.columns(2)
 
     with col_p1:
@@ -652,29 +450,37 @@ def page_dashboard():
         # Sélecteur de période
         period = st.selectbox("Filtrer par période :", ["day", "week", "month"], key="pareto_period")
         try:
-            plot_pareto(df, period=period, top_n_labels=topn)
+            plot_pareto(read_rollup(period), period=period, top_n_labels=topn, version=data_version)
         except Exception as e:
             st.warning(f"Erreur dans plot_pareto : {e}")
 
     with col_p2:
         st.markdown("**Pareto par type de problème**")
         try:
-            plot_paretoo(df, top_n_labels=topn)
+            plot_paretoo(read_rollup("description_probleme"), top_n_labels=topn, version=data_version)
         except Exception as e:
             st.warning(f"Erreur dans plot_paretoo : {e}")
 
+    # ---------------------------
+    # Temps d'arrêt & MTTR
+    # ---------------------------
+    st.markdown("### Temps d'arrêt & MTTR")
+    try:
+        show_downtime()
+    except Exception as e:
+        st.warning(f"Erreur dans l'analyse des temps d'arrêt : {e}")
+
     # ---------------------------
     # Aperçu des bons
     # ---------------------------
     st.markdown("---")
     st.subheader("Aperçu (derniers bons d’intervention)")
-    st.dataframe(df.sort_values(by="date", ascending=False)[display_cols], height=320)
+    paged_bons_table("dash_apercu", display_cols, height=320)
 
     # ---------------------------
     # État d’avancement coloré
     # ---------------------------
-    # Calcul progression
-    df["Progression (%)"] = df.apply(compute_progress, axis=1)
+    # Progression maintenue par le store (pas de recalcul ligne à ligne ici)
 
     # Palette de 8 couleurs distinctes (progression par tranche)
     palette = [
@@ -688,22 +494,18 @@ def page_dashboard():
         "#2c3e50",  # 88-100% gris/bleu foncé
     ]
 
-    def color_row(row):
-        val = row["Progression (%)"]
-        # découpage en 8 tranches
-        idx = min(val // 13, 7)  # 0-12, 13-25, ..., 88-100
-        color = palette[idx]
-        return [f"background-color: {color}; color: white;" for _ in row]
+    row_styles = np.array([f"background-color: {color}; color: white;" for color in palette])
+
+    def color_rows(frame: pd.DataFrame) -> pd.DataFrame:
+        # découpage en 8 tranches : 0-12, 13-25, ..., 88-100 (calcul vectorisé)
+        idx = np.minimum(frame["Progression (%)"].to_numpy() // 13, 7)
+        styles = np.repeat(row_styles[idx][:, None], frame.shape[1], axis=1)
+        return pd.DataFrame(styles, index=frame.index, columns=frame.columns)
 
     st.markdown("### État d'avancement des bons")
-    st.progress(int(df["Progression (%)"].mean()))  # moyenne globale
+    st.progress(int(mean_progress()))  # moyenne globale
 
-    styled_df = (
-        df[["code", "date", "dpt_production", "dpt_maintenance", "dpt_qualite", "Progression (%)"]]
-        .sort_values(by="date", ascending=False)
-        .style.apply(color_row, axis=1)
-    )
-    st.dataframe(styled_df, height=300)
+    paged_bons_table("dash_avancement", display_cols + ["Progression (%)"], style=color_rows)
 
 
 # ---------------------------
@@ -720,9 +522,8 @@ def page_bons(page_name: str):
         st.warning("Vous n'avez pas la permission pour cette page.")
         return
 
-    bons = read_bons()
-    df = pd.DataFrame(bons) if bons else pd.DataFrame(columns=BON_COLUMNS)
-    codes = df["code"].astype(str).tolist() if not df.empty else []
+    # seuls les bons modifiables (mois archivés exclus) : pas de lecture de l'historique
+    codes = read_bon_codes()
 
     # Charger / Nouveau
     st.subheader("Charger / Nouveau")
@@ -740,26 +541,8 @@ def page_bons(page_name: str):
 
 
 
-    # Définition des champs éditables par fenêtre
-    production_allowed = {
-        "code","date", "heure_declaration", "description_probleme", "arret_declare_par",
-        "poste_de_charge", "machine_arreter", "resultat", "condition_acceptation", "dpt_production"
-    }
-    maintenance_allowed = {
-        "heure_debut_intervention", "heure_fin_intervention", "technicien","action","pdr_utilisee", "observation", "dpt_maintenance"
-    }
-    qualite_allowed = {
-        "dpt_qualite"
-    }
-
-    if page_name.lower().startswith("production"):
-        editable_set = production_allowed
-    elif page_name.lower().startswith("maintenance"):
-        editable_set = maintenance_allowed
-    elif page_name.lower().startswith("qualit") or page_name.lower().startswith("qualité"):
-        editable_set = qualite_allowed
-    else:
-        editable_set = set()
+    # Champs éditables par fenêtre
+    editable_set = editable_fields(page_name)
 
     # Initialiser session keys pour ce page si manquants
     for k in BON_COLUMNS:
@@ -949,7 +732,7 @@ def page_bons(page_name: str):
                     if code_v == "":
                         st.error("Le champ Code est requis pour ajouter ou mettre à jour un bon.")
                     else:
-                        if any(c.get("code","") == code_v for c in read_bons()):
+                        if bon_exists(code_v):
                             update_bon(code_v, row)
                             st.success("Bon mis à jour.")
                         else:
@@ -1035,22 +818,17 @@ def page_bons(page_name: str):
     st.subheader("Recherche & Liste")
     search_by_key = f"{page_name}_search_by"
     term_key = f"{page_name}_term"
-    search_by = st.selectbox("Rechercher par", ["Code","Date","Poste de charge","Dpt"], key=search_by_key)
-    term = st.text_input("Terme de recherche", key=term_key)
+    search_by = st.selectbox("Rechercher par", ["Code","Date","Poste de charge","Dpt","Texte libre"], key=search_by_key)
+    term = st.text_input("Terme de recherche", key=term_key,
+                         help="Date : 2026-01-15, 2026-01 (mois) ou 2026-01-01..2026-01-31 (intervalle) ; "
+                              "Texte libre : mots cherchés dans action, observation, condition d'acceptation, arrêt déclaré par")
     if st.button("Rechercher", key=f"btn_search_{page_name}"):
-        res = []
-        for r in read_bons():
-            col = ""
-            if search_by == "Code":
-                col = r.get("code","")
-            elif search_by == "Date":
-                col = r.get("date","")
-            elif search_by == "Poste de charge":
-                col = r.get("poste_de_charge","")
-            else:
-                col = r.get("dpt_production","") + r.get("dpt_maintenance","") + r.get("dpt_qualite","")
-            if term.lower() in str(col).lower():
-                res.append(r)
+        if search_by == "Texte libre":
+            hits = search_fulltext(term, k=50)
+            res = [dict(bon, score=round(score, 2)) for bon, score in hits]
+        else:
+            res, _, plan = run_query(search_query(search_by, term))
+            st.caption(f"Index : {plan['index']} — {plan['returned']} résultat(s) en {plan['ms']:.2f} ms")
         if not res:
             st.info("Aucun enregistrement trouvé.")
         else:
@@ -1058,11 +836,35 @@ def page_bons(page_name: str):
 
     # Tous les bons
     st.subheader("Tous les bons")
-    all_df = pd.DataFrame(read_bons())
-    if not all_df.empty:
-        st.dataframe(all_df.sort_values(by="date", ascending=False), height=300)
+    if count_bons():
+        all_df = paged_bons_table(f"{page_name}_all", BON_COLUMNS, selectable=True)
+
+        # Actions groupées sur les lignes cochées : une seule écriture pour N bons
+        selected = all_df.loc[all_df["Sélection"], "code"].astype(str).tolist()
+        st.caption(f"{len(selected)} bon(s) sélectionné(s)")
+        dpt_field = PAGE_DPT_FIELD.get(page_name)
+        b1, b2, b3 = st.columns([2, 1, 1])
+        if dpt_field in editable_set:
+            statut = b1.selectbox(f"{dpt_field} des bons sélectionnés", ["Valider", "Non Valider", ""],
+                                  key=f"{page_name}_bulk_statut")
+            if b2.button("Appliquer", key=f"{page_name}_bulk_apply", disabled=not selected):
+                try:
+                    n = bulk_update_bons(page_name, selected, {dpt_field: statut})
+                    st.success(f"{n} bon(s) mis à jour.")
+                    st.rerun()
+                except (KeyError, PermissionError) as e:
+                    st.error(str(e.args[0]) if e.args else str(e))
+        confirm = b3.checkbox("Confirmer la suppression", key=f"{page_name}_bulk_confirm")
+        if b3.button("Supprimer la sélection", key=f"{page_name}_bulk_delete", disabled=not (selected and confirm)):
+            try:
+                n = bulk_delete_bons(page_name, selected)
+                st.success(f"{n} bon(s) supprimé(s).")
+                st.rerun()
+            except PermissionError as e:
+                st.error(str(e))
+
         sel_key = f"{page_name}_sel_code"
-        sel = st.selectbox("Sélectionner un code", options=[""] + all_df["code"].astype(str).tolist(), key=sel_key)
+        sel = st.selectbox("Sélectionner un code", options=[""] + codes, key=sel_key)
         if sel:
             if st.button("Afficher JSON", key=f"showjson_{page_name}"):
                 st.json(get_bon_by_code(sel))
@@ -1078,6 +880,9 @@ def page_bons(page_name: str):
 # ---------------------------
 def page_pdr():
     st.header("Pièces - PDR (liste_pdr)")
+    if not allowed("Pièces (PDR)"):
+        st.warning("Vous n'avez pas la permission pour cette page.")
+        return
     pdrs = read_pdr()
     df = pd.DataFrame(pdrs) if pdrs else pd.DataFrame(columns=PDR_COLUMNS)
     st.dataframe(df, height=250)
@@ -1099,39 +904,171 @@ def page_pdr():
         st.success("PDR supprimée.")
         st.rerun()
 
+    st.subheader("Mouvements de stock")
+    with st.form("form_pdr_mouvement"):
+        mv_code = st.text_input("Code PDR", key="pdr_mv_code")
+        mv_kind = st.selectbox("Type", ["consommation", "reappro", "ajustement"], key="pdr_mv_kind")
+        mv_delta = st.number_input("Quantité (consommée / reçue ; +/- pour un ajustement)", value=1, step=1,
+                                   key="pdr_mv_delta")
+        if st.form_submit_button("Enregistrer le mouvement"):
+            try:
+                if mv_kind == "reappro":
+                    qte = restock_pdr(mv_code, int(mv_delta))
+                elif mv_kind == "consommation":
+                    qte = move_pdr(mv_code, -abs(int(mv_delta)), "consommation")
+                else:
+                    qte = move_pdr(mv_code, int(mv_delta))
+                st.success(f"Stock de {mv_code.strip()} : {qte}")
+                st.rerun()
+            except (KeyError, ValueError) as e:
+                st.error(str(e.args[0]) if e.args else str(e))
+    mouvements = read_pdr_movements(limit=200)
+    if mouvements:
+        st.dataframe(pd.DataFrame(mouvements, columns=["ts", "code", "kind", "delta", "qte", "bon"]), height=250)
+    else:
+        st.info("Aucun mouvement de stock.")
+
 
 # ---------------------------
 # Page Export Excel
 # ---------------------------
 def page_export():
     st.header("Export Excel")
-    bons = read_bons()
-    if not bons:
+    if not allowed("Export Excel"):
+        st.warning("Vous n'avez pas la permission pour cette page.")
+        return
+    if count_bons() == 0:
         st.info("Aucun bon à exporter.")
         return
+
+    # --- Filtres (appliqués pendant le flux, aucune liste complète en mémoire) ---
+    c1, c2 = st.columns(2)
+    use_dates = c1.checkbox("Filtrer par date", key="export_use_dates")
+    date_from = c1.date_input("Du", key="export_date_from", disabled=not use_dates)
+    date_to = c2.date_input("Au", key="export_date_to", disabled=not use_dates)
+    postes = st.multiselect("Poste de charge", read_options("options_poste_de_charge"), key="export_postes")
+    statuts = ["Tous", "Pas encore validé", "(vide)", "Valider", "Non Valider"]
+    d1, d2, d3 = st.columns(3)
+    dpt_filters = {
+        "dpt_production": d1.selectbox("Dpt Production", statuts, key="export_dpt_production"),
+        "dpt_maintenance": d2.selectbox("Dpt Maintenance", statuts, key="export_dpt_maintenance"),
+        "dpt_qualite": d3.selectbox("Dpt Qualité", statuts, key="export_dpt_qualite"),
+    }
+    with_charts = st.checkbox("Ajouter une feuille avec les graphiques Pareto", key="export_with_charts")
+
+    q = BonQuery()
+    for field, statut in dpt_filters.items():
+        if statut == "Pas encore validé":
+            q.not_validated(field)
+        elif statut != "Tous":
+            q.eq(field, "" if statut == "(vide)" else statut)
+    if postes:
+        q.in_("poste_de_charge", postes)
+    if use_dates:
+        q.date_between(str(date_from), str(date_to))
+    st.caption(f"Requête : {q.describe()}")
+
     if st.button("Générer & télécharger Excel", key="btn_gen_export"):
         try:
-            excel_bytes = export_excel(bons)
+            from bon_travail.export import export_excel
+            rows = iter_bons(q)
+            excel_bytes = export_excel(rows, with_charts=with_charts)
             st.download_button("Télécharger bon_travail_export.xlsx", data=excel_bytes, file_name="bon_travail_export.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
         except Exception as e:
             st.error(str(e))
 
+# ---------------------------
+# Page Import (Excel / CSV)
+# ---------------------------
+def page_import():
+    st.header("Import de bons (Excel / CSV)")
+    if not allowed("Import"):
+        st.warning("Vous n'avez pas la permission pour cette page.")
+        return
+    from bon_travail.importer import IMPORT_DATE_FORMATS, import_bons
+    st.caption("Colonnes reconnues : " + ", ".join(BON_COLUMNS)
+               + " (casse, accents et espaces des en-têtes ignorés). Dates : "
+               + ", ".join(f.replace("%", "") for f in IMPORT_DATE_FORMATS) + ".")
+    up = st.file_uploader("Fichier (.xlsx, .csv)", type=["xlsx", "xlsm", "csv"], key="import_file")
+    if up is None:
+        return
+    c1, c2 = st.columns(2)
+    check = c1.button("Vérifier", key="btn_import_check")
+    run = c2.button("Importer les lignes valides", key="btn_import_run")
+    if not (check or run):
+        return
+    try:
+        report = import_bons(up.getvalue(), up.name, dry_run=not run)
+    except Exception as e:
+        st.error(str(e))
+        return
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Lignes lues", report["lignes"])
+    m2.metric("Lignes valides", report["valides"])
+    m3.metric("Lignes en erreur", len(report["erreurs"]))
+    if run:
+        st.success(f"{report['importes']} bon(s) importé(s).")
+        if report["pdr"]:
+            st.caption("PDR consommées : " + ", ".join(f"{k} (-{n})" for k, n in report["pdr"].items()))
+        if report["pdr_inconnues"]:
+            st.caption("PDR inconnues (stock inchangé) : " + ", ".join(report["pdr_inconnues"]))
+    if not report["erreurs"].empty:
+        st.dataframe(report["erreurs"], height=300)
+        st.download_button("Télécharger le rapport d'erreurs (CSV)",
+                           data=report["erreurs"].to_csv(index=False).encode("utf-8-sig"),
+                           file_name="import_erreurs.csv", mime="text/csv")
+
+# ---------------------------
+# Panneau Diagnostic (managers) : sections des derniers reruns
+# ---------------------------
+def render_profile_panel():
+    runs = list(st.session_state.get("profile_runs") or [])
+    with st.sidebar.expander("Diagnostic (profilage)"):
+        if not runs:
+            st.caption("Aucun relevé pour cette session.")
+            return
+        runs.reverse()   # plus récent en premier
+        st.dataframe(pd.DataFrame([{"heure": r["ts"][11:], "page": r["page"], "total (ms)": r["total_ms"]}
+                                   for r in runs]), height=180, hide_index=True)
+        i = st.selectbox("Rerun", range(len(runs)), key="profile_run_idx",
+                         format_func=lambda k: f"{runs[k]['ts'][11:]} — {runs[k]['page']} ({runs[k]['total_ms']:.0f} ms)")
+        sections = pd.DataFrame(runs[i]["sections"], columns=["name", "depth", "calls", "ms", "kb"])
+        sections["name"] = sections["depth"].map(lambda d: "· " * d) + sections["name"]
+        cols = ["name", "calls", "ms"] + (["kb"] if runs[i].get("tracemalloc") else [])
+        st.dataframe(sections[cols].rename(columns={"name": "section", "calls": "appels", "kb": "alloc (Ko)"}),
+                     height=260, hide_index=True)
+        st.caption(f"Relevés complets (JSONL) : {FILES['profile']}"
+                   + ("" if PROFILE_TRACEMALLOC else " — allocations : BON_TRAVAIL_PROFILE_TRACEMALLOC=1"))
+
 # ---------------------------
 # Router - affichage des pages
 # ---------------------------
-if menu == "Dashboard":
-    page_dashboard()
-elif menu == "Production":
-    page_bons("Production")
-elif menu == "Maintenance":
-    page_bons("Maintenance")
-elif menu == "Qualité":
-    page_bons("Qualité")
-elif menu == "Pièces (PDR)":
-    page_pdr()
-elif menu == "Export Excel":
-    page_export()
+try:
+    with PROFILER.section(f"page.{menu}"):
+        if menu == "Dashboard":
+            page_dashboard()
+        elif menu == "Production":
+            page_bons("Production")
+        elif menu == "Maintenance":
+            page_bons("Maintenance")
+        elif menu == "Qualité":
+            page_bons("Qualité")
+        elif menu == "Pièces (PDR)":
+            page_pdr()
+        elif menu == "Export Excel":
+            page_export()
+        elif menu == "Import":
+            page_import()
+finally:
+    # aussi sur st.rerun() / st.stop() : le rerun interrompu est relevé
+    profile_run = PROFILER.end_run(menu)
+    if profile_run is not None:
+        st.session_state.setdefault("profile_runs", deque(maxlen=PROFILE_KEEP_RUNS)).append(profile_run)
+
+if st.session_state.get("role") == "manager":
+    render_profile_panel()
 
 # Footer
 st.sidebar.markdown("---")
 st.sidebar.caption("⚠️ Données stockées localement sur l'instance Streamlit et sur le disque du PC poste (Othman)")
+
@@ -0,0 +1,41 @@
+"""
+Budget de démarrage à froid des pages légères (voir benchmarks/cold_start.py).
+
+    python -m pytest tests/test_cold_start.py
+
+Chaque cas de LIGHT_CASES est lancé dans un processus neuf, sur un répertoire de
+données rempli de ROWS bons : aucun module de HEAVY_MODULES (matplotlib,
+openpyxl) ne doit être chargé, le rendu ne doit lever aucune exception et les
+médianes doivent tenir dans BUDGETS, sans passer par `cold_start.py --check`.
+"""
+import os
+import statistics
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import cold_start  # noqa: E402
+
+ROWS = 10_000
+REPEAT = 3
+
+
+@pytest.fixture(scope="module", params=["json", "sqlite"])
+def env(request):
+    data_dir = tempfile.mkdtemp(prefix="bon_cold_test_")
+    cold_start._seed(data_dir, request.param, ROWS)
+    return cold_start._env(data_dir, request.param)
+
+
+@pytest.mark.parametrize("name", cold_start.LIGHT_CASES)
+def test_light_case_cold_start(env, name):
+    argv = dict(cold_start._cases())[name]
+    wall, render, heavy, problems = cold_start.measure(name, argv, env, REPEAT)
+    assert heavy == [], f"{name} : {', '.join(heavy)} chargé(s)"
+    assert problems == []
+    assert statistics.median(wall) <= cold_start.BUDGETS[name]
+    if render:
+        assert statistics.median(render) <= cold_start.BUDGETS[f"{name}.render"]